@@ -1,8 +1,313 @@
 # agent.py
+import os
 import re
-from typing import List, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional
 
-async def select_vehicle_via_llm(user_message: str, vehicles: List[Dict[str, Any]]) -> Dict[str, Any]:
+# Resolvers kept in memory, one per distinct vehicle list (least recently used are evicted).
+VEHICLE_RESOLVER_CACHE_SIZE = int(os.getenv("VEHICLE_RESOLVER_CACHE_SIZE", "2048"))
+
+SELECTED_ID_RE = re.compile(r"selected_vehicle_id[:=\s]*([a-zA-Z0-9_]+)")
+YEAR_RE = re.compile(r"\b(19\d{2}|20\d{2})\b")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+NEWER_TERMS = [
+    "newer", "new one", "latest", "new model", "new car",
+    "second one", "the newer car", "the latest car", "the latest one",
+    "more recent", "recent model"
+]
+OLDER_TERMS = [
+    "older", "old one", "previous", "the older car",
+    "first one", "the old one", "earlier model", "older model"
+]
+NEWER_RE = re.compile("|".join(re.escape(t) for t in NEWER_TERMS))
+OLDER_RE = re.compile("|".join(re.escape(t) for t in OLDER_TERMS))
+
+# Position in the customer's vehicle list, checked in this order. "first" and
+# "second" match anywhere in the message ("firstly", "secondhand"), as they
+# always have; the later ones only as whole words and only when neither of
+# those matched.
+BASE_ORDINALS = [
+    (0, ("first", "1st")),
+    (1, ("second", "2nd")),
+]
+ORDINALS = [
+    (2, ("third", "3rd")),
+    (3, ("fourth", "4th")),
+    (4, ("fifth", "5th")),
+    (5, ("sixth", "6th")),
+    (6, ("seventh", "7th")),
+    (7, ("eighth", "8th")),
+    (8, ("ninth", "9th")),
+    (9, ("tenth", "10th")),
+    (-1, ("last one", "last car", "last vehicle")),
+]
+ORDINAL_RE = re.compile(r"\b(" + "|".join(re.escape(w) for _, words in ORDINALS for w in words) + r")\b")
+ORDINAL_INDEX = {w: index for index, words in ORDINALS for w in words}
+
+# Shortest VIN tail a customer is expected to quote ("the one ending 234821").
+VIN_SUFFIX_LEN = 6
+
+
+def get_year_int(v) -> int:
+    try:
+        return int(v.get("year", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+# ----------------------------------------------------------------------
+# MULTI-PATTERN MATCHER
+# ----------------------------------------------------------------------
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton: every pattern occurring in a text, in one pass
+    over the text, however many patterns there are. Each pattern carries a
+    payload (here: vehicle positions).
+    """
+
+    def __init__(self, patterns: Dict[str, Iterable[int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[tuple]] = [[]]
+
+        for pattern, payload in patterns.items():
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((pattern, tuple(payload)))
+
+        # Breadth-first: a node's failure link points to its longest proper
+        # suffix that is also a prefix of some pattern.
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target
+                if self._out[target]:
+                    self._out[child] = self._out[child] + self._out[target]
+
+    def __len__(self):
+        return len(self._goto) - 1
+
+    def finditer(self, text: str):
+        """(end offset, pattern, payload) for every occurrence."""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for pattern, payload in self._out[node]:
+                yield i + 1, pattern, payload
+
+
+# ----------------------------------------------------------------------
+# RESOLVER
+# ----------------------------------------------------------------------
+class VehicleResolver:
+    """
+    Everything `select_vehicle_via_llm` needs about one vehicle list,
+    precomputed once, so a turn costs one pass over the message instead of
+    one pass per vehicle:
+      - ID matcher (vehicle IDs are matched anywhere in the message)
+      - VINs and VIN tails, looked up by whole word
+      - keyword matcher over brands and model tokens (the inverted index
+        from keyword to vehicles)
+      - year -> vehicle positions, newest and oldest vehicle
+    """
+
+    def __init__(self, vehicles: List[Dict[str, Any]]):
+        self.vehicles = vehicles
+        self.by_id = {str(v["vehicleId"]).lower(): i for i, v in reversed(list(enumerate(vehicles)))}
+
+        ids: Dict[str, list] = {}
+        keywords: Dict[str, list] = {}
+        self.vins: Dict[str, int] = {}
+        self.tails: Dict[str, set] = {}
+        self.years: Dict[int, List[int]] = {}
+
+        for i, v in enumerate(vehicles):
+            ids.setdefault(str(v["vehicleId"]).lower(), []).append(i)
+
+            vin = str(v.get("vin") or "").strip().lower()
+            if len(vin) > VIN_SUFFIX_LEN:
+                self.vins.setdefault(vin, i)
+                self.tails.setdefault(vin[-VIN_SUFFIX_LEN:], set()).add(i)
+
+            brand = str(v.get("brand") or "").lower()
+            if brand:
+                keywords.setdefault(brand, []).append(i)
+            for token in WORD_RE.findall(str(v.get("model") or "").lower()):
+                if len(token) > 1:
+                    keywords.setdefault(token, []).append(i)
+
+            year = get_year_int(v)
+            self.years.setdefault(year, []).append(i)
+
+        self.ids = KeywordMatcher(ids)
+        self.keywords = KeywordMatcher(keywords)
+
+        valid_years = [y for y in self.years if y > 0]
+        self.newest = self.years[max(valid_years)][0] if valid_years else None
+        self.oldest = self.years[min(valid_years)][0] if valid_years else None
+
+    def _pick(self, i: int) -> Dict[str, Any]:
+        return {"vehicleId": self.vehicles[i]["vehicleId"]}
+
+    def resolve(self, user_message: str) -> Dict[str, Any]:
+        vehicles = self.vehicles
+        msg = (user_message or "").strip().lower()
+
+        # If user said nothing → ask again
+        if not msg:
+            return {"needClarification": True, "options": vehicles}
+
+        # ----------------------------------------------------
+        # 1) DIRECT selected_vehicle_id:XXXX
+        # ----------------------------------------------------
+        m = SELECTED_ID_RE.search(msg)
+        if m and m.group(1) in self.by_id:
+            return self._pick(self.by_id[m.group(1)])
+
+        # ----------------------------------------------------
+        # 2) Raw vehicle ID in user message
+        # ----------------------------------------------------
+        found = [i for _, _, positions in self.ids.finditer(msg) for i in positions]
+        if found:
+            return self._pick(min(found))
+
+        # ----------------------------------------------------
+        # 3) Year-based resolution ("2026 one", "2025 car")
+        # ----------------------------------------------------
+        years_in_text = YEAR_RE.findall(msg)
+        if years_in_text:
+            candidates = self.years.get(int(years_in_text[-1]), [])
+            if len(candidates) == 1:
+                return self._pick(candidates[0])
+
+        # ----------------------------------------------------
+        # 4) NEWER / OLDER logic
+        # ----------------------------------------------------
+        if self.newest is not None and NEWER_RE.search(msg):
+            return self._pick(self.newest)
+
+        if self.oldest is not None and OLDER_RE.search(msg):
+            return self._pick(self.oldest)
+
+        # ----------------------------------------------------
+        # 5) Brand / model keyword matching (“mg7”, “octavia”, “q7”)
+        # ----------------------------------------------------
+        brand_candidates = {i for _, _, positions in self.keywords.finditer(msg) for i in positions}
+        if len(brand_candidates) == 1:
+            return self._pick(brand_candidates.pop())
+
+        # ----------------------------------------------------
+        # 6) Ordinals ("first car", "second car")
+        # ----------------------------------------------------
+        if len(vehicles) >= 2:
+            for index, words in BASE_ORDINALS:
+                if any(w in msg for w in words):
+                    return self._pick(index)
+
+        # ----------------------------------------------------
+        # 7) Full VIN, then a unique VIN tail ("ending 234821")
+        # ----------------------------------------------------
+        words = WORD_RE.findall(msg)
+        for word in words:
+            if word in self.vins:
+                return self._pick(self.vins[word])
+
+        tail_hits = set().union(*(self.tails.get(word, ()) for word in words))
+        if len(tail_hits) == 1:
+            return self._pick(tail_hits.pop())
+
+        # ----------------------------------------------------
+        # 8) Later ordinals ("third one", "tenth car", "last one")
+        # ----------------------------------------------------
+        if len(vehicles) >= 2:
+            mentioned = {ORDINAL_INDEX[w] for w in ORDINAL_RE.findall(msg)}
+            for index, _ in ORDINALS:
+                if index in mentioned and index < len(vehicles):
+                    return self._pick(index)
+
+        # ----------------------------------------------------
+        # 9) If nothing worked → ask them again
+        # ----------------------------------------------------
+        return {"needClarification": True, "options": vehicles}
+
+
+class VehicleResolverCache:
+    """
+    One resolver per vehicle list, LRU-bounded. Lists are cached by identity:
+    the customer vehicle cache hands every turn of a customer the same
+    (read-only) list until it is refreshed, and a refreshed list gets a
+    fresh resolver. The entry keeps its list alive, so an id is never reused
+    while it is cached.
+    """
+
+    def __init__(self, max_entries: int = VEHICLE_RESOLVER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[int, VehicleResolver]" = OrderedDict()
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def get(self, vehicles: List[Dict[str, Any]]) -> VehicleResolver:
+        key = id(vehicles)
+        with self._lock:
+            resolver = self._data.get(key)
+            if resolver is not None and resolver.vehicles is vehicles:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return resolver
+
+        resolver = VehicleResolver(vehicles)
+        with self._lock:
+            self.builds += 1
+            self._data[key] = resolver
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return resolver
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.builds
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "builds": self.builds,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+resolver_cache = VehicleResolverCache()
+
+
+async def select_vehicle_via_llm(
+    user_message: str, vehicles: List[Dict[str, Any]], resolver: Optional[VehicleResolver] = None
+) -> Dict[str, Any]:
     """
     Deterministic vehicle selector.
     Handles:
@@ -10,126 +315,16 @@ async def select_vehicle_via_llm(user_message: str, vehicles: List[Dict[str, Any
       - "the newer one", "the older one"
       - "the latest", "the previous model"
       - "the Skoda", "the MG", "the Audi"
-      - "the first one", "the second one"
+      - "the first one", "the second one", ... "the tenth one", "the last one"
       - raw ID: "selected_vehicle_id:60039" or "60039"
+      - VIN, or its last 6 characters
+
+    Uses the cached resolver for `vehicles` unless one is passed in.
 
     Returns:
         {"vehicleId": "<id>"}       - when confident
         {"needClarification": True} - when ambiguous
     """
-
-    # Normalize the input
-    msg = (user_message or "").strip().lower()
-
-    # If user said nothing → ask again
-    if not msg:
-        return {"needClarification": True, "options": vehicles}
-
-    # Helper to safely get integer year from vehicle data
-    def get_year_int(v):
-        try:
-            return int(v.get("year", 0))
-        except:
-            return 0
-
-    # ----------------------------------------------------
-    # 1) DIRECT selected_vehicle_id:XXXX
-    # ----------------------------------------------------
-    m = re.search(r"selected_vehicle_id[:=\s]*([a-zA-Z0-9_]+)", msg)
-    if m:
-        chosen = m.group(1)
-        for v in vehicles:
-            if str(v["vehicleId"]).lower() == chosen.lower():
-                return {"vehicleId": v["vehicleId"]}
-
-    # ----------------------------------------------------
-    # 2) Raw vehicle ID in user message
-    # ----------------------------------------------------
-    for v in vehicles:
-        if str(v["vehicleId"]).lower() in msg:
-            return {"vehicleId": v["vehicleId"]}
-
-    # ----------------------------------------------------
-    # 3) Year-based resolution ("2026 one", "2025 car")
-    # ----------------------------------------------------
-    years_in_text = re.findall(r"\b(19\d{2}|20\d{2})\b", msg)
-    if years_in_text:
-        try:
-            target_year = int(years_in_text[-1])
-            # Compare strictly as integers
-            candidates = [v for v in vehicles if get_year_int(v) == target_year]
-            
-            if len(candidates) == 1:
-                return {"vehicleId": candidates[0]["vehicleId"]}
-        except:
-            pass
-
-    # ----------------------------------------------------
-    # 4) NEWER / OLDER logic
-    # ----------------------------------------------------
-    # Get list of valid years
-    valid_years = [get_year_int(v) for v in vehicles if get_year_int(v) > 0]
-    
-    newest_year = max(valid_years) if valid_years else None
-    oldest_year = min(valid_years) if valid_years else None
-
-    newer_terms = [
-        "newer", "new one", "latest", "new model", "new car",
-        "second one", "the newer car", "the latest car", "the latest one",
-        "more recent", "recent model"
-    ]
-    older_terms = [
-        "older", "old one", "previous", "the older car",
-        "first one", "the old one", "earlier model", "older model"
-    ]
-
-    if any(term in msg for term in newer_terms) and newest_year is not None:
-        for v in vehicles:
-            if get_year_int(v) == newest_year:
-                return {"vehicleId": v["vehicleId"]}
-
-    if any(term in msg for term in older_terms) and oldest_year is not None:
-        for v in vehicles:
-            if get_year_int(v) == oldest_year:
-                return {"vehicleId": v["vehicleId"]}
-
-    # ----------------------------------------------------
-    # 5) Brand / model keyword matching
-    # ----------------------------------------------------
-    brand_candidates = []
-
-    for v in vehicles:
-        brand = str(v.get("brand") or "").lower()
-        model = str(v.get("model") or "").lower()
-
-        match = False
-
-        # brand match
-        if brand and brand in msg:
-            match = True
-
-        # token-level model match (“mg7”, “octavia”, “q7”)
-        for token in re.findall(r"[a-z0-9]+", model):
-            if len(token) > 1 and token in msg:
-                match = True
-                break
-
-        if match:
-            brand_candidates.append(v)
-
-    if len(brand_candidates) == 1:
-        return {"vehicleId": brand_candidates[0]["vehicleId"]}
-
-    # ----------------------------------------------------
-    # 6) Ordinals ("first car", "second car")
-    # ----------------------------------------------------
-    if len(vehicles) >= 2:
-        if "first" in msg or "1st" in msg:
-            return {"vehicleId": vehicles[0]["vehicleId"]}
-        if "second" in msg or "2nd" in msg:
-            return {"vehicleId": vehicles[1]["vehicleId"]}
-
-    # ----------------------------------------------------
-    # 7) If nothing worked → ask them again
-    # ----------------------------------------------------
-    return {"needClarification": True, "options": vehicles}
+    if resolver is None:
+        resolver = resolver_cache.get(vehicles)
+    return resolver.resolve(user_message)
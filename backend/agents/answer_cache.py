@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+
+from rag.embedding_cache import normalize_query
+from utils.ttl_cache import AsyncTTLCache
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") not in ("0", "false", "False")
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+# Cached answers are generated with these slots instead of customer details,
+# so one answer can be shared between customers and personalized afterwards.
+FIRST_NAME_SLOT = "[[FIRST_NAME]]"
+PROMO_CODE_SLOT = "[[PROMO_CODE]]"
+
+answer_cache = AsyncTTLCache(
+    ttl=ANSWER_CACHE_TTL_SECONDS,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    name="answers",
+)
+
+
+def answer_cache_key(
+    vehicle_key: str | None,
+    vehicle_name: str,
+    question: str,
+    language: str,
+    prevent_greeting: bool,
+    chunk_ids: list[str],
+) -> str:
+    """
+    Key for a first-turn, image-less answer.
+    The retrieved chunk IDs are part of the key, so re-ingesting a manual
+    naturally stops old answers from matching.
+    """
+    chunks_hash = hashlib.sha1("\x00".join(sorted(chunk_ids)).encode("utf-8")).hexdigest()
+    raw = json.dumps(
+        [vehicle_key or "", vehicle_name, normalize_query(question), language, prevent_greeting, chunks_hash],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def personalize(answer: str, first_name: str, promo_code: str) -> str:
+    return answer.replace(FIRST_NAME_SLOT, first_name).replace(PROMO_CODE_SLOT, promo_code)
@@ -1,12 +1,39 @@
 import os
-from openai import OpenAI
-from rag.manual_search import search_manual
+import time
+from rag.manual_search import search_manual_async
+from rag.context_compression import (
+    CONTEXT_CANDIDATES, CONTEXT_COMPRESSION_ENABLED, compress_context, format_context,
+)
+from agents.manual_catalog import ManualCatalog
+from utils.stream_text import StreamReplacer
+from agents.answer_cache import (
+    ANSWER_CACHE_ENABLED, FIRST_NAME_SLOT, PROMO_CODE_SLOT,
+    answer_cache, answer_cache_key, personalize,
+)
+from agents.prompt_builder import build_system_prompt
+from utils import metrics
+from utils.metrics import span
+
+# Created on first use (normally by the startup warm-up), so importing the
+# agent neither loads the SDK nor needs an API key.
+client = None
+
+
+def get_openai_client():
+    global client
+    if client is None:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return client
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Root path for manuals
 MANUAL_ROOT = os.path.join("backend", "manuals", "ali-and-sons")
 
+# Brand -> manual index, built once and refreshed when the folders change.
+manual_catalog = ManualCatalog(MANUAL_ROOT)
+
 # ---------------------------------------------------------
 # COST SAVING: Chit-Chat Detection
 # ---------------------------------------------------------
@@ -17,51 +44,33 @@ CHIT_CHAT_PHRASES = [
 ]
 
 def find_best_manual_key(brand: str, model: str, year: int | str | None):
-    if not brand: return None
-    brand_clean = str(brand).lower().strip()
-    model_clean = str(model or "").lower().strip()
-    year_str = str(year or "").strip()
-    
-    if not os.path.exists(MANUAL_ROOT): return None
-    found_brand_folder = None
-    for folder_name in os.listdir(MANUAL_ROOT):
-        if folder_name.lower() == brand_clean:
-            found_brand_folder = os.path.join(MANUAL_ROOT, folder_name)
-            break
-    if not found_brand_folder: return None
-
-    pdf_files = [f.replace(".pdf", "") for f in os.listdir(found_brand_folder) if f.lower().endswith(".pdf")]
-    
-    best_match = None
-    best_score = 0
-
-    for key in pdf_files:
-        key_l = key.lower()
-        score = 0
-        if model_clean and model_clean in key_l: score += 5
-        if year_str and year_str in key_l: score += 3
-        if model_clean.replace(" ", "") in key_l.replace(" ", ""): score += 2
-        if score > best_score:
-            best_score = score
-            best_match = key
-    return best_match if best_score > 0 else None
+    return manual_catalog.resolve(brand, model, year)
 
 
 # =====================================================================
 # MAIN AGENT
 # =====================================================================
-async def run_car_agent_rag(
+async def build_agent_request(
     message: str,
     vehicle_data: dict,
     image_base64: str | None = None,
     language: str = "en",
+    image_mime: str = "image/jpeg",
     first_name: str = "Customer",
     session_id: str = "",
     chat_history: list = [],
     prevent_greeting: bool = False,
     promo_code: str = "VIP-GUEST",
+    cacheable: bool = False,
     **kwargs,
-) -> str:
+) -> dict:
+    """
+    Runs retrieval and builds the completion request shared by the blocking
+    and streaming paths: {"model", "messages", "cache_key", "fill"}.
+
+    With `cacheable=True`, first-turn image-less requests are built with
+    name/promo slots and get a `cache_key`; `fill` personalizes the answer.
+    """
 
     # 1. Setup Vehicle Info
     brand = vehicle_data.get("brand", "Unknown")
@@ -82,24 +91,46 @@ async def run_car_agent_rag(
 
     # 4. Perform RAG Search
     manual_chunks = []
-    vehicle_key = find_best_manual_key(brand, model, year)
+    with span("manual_key"):
+        vehicle_key = find_best_manual_key(brand, model, year)
 
     if should_search and vehicle_key and len(search_query) > 2:
         try:
-            manual_chunks = search_manual(
-                brand=str(brand).lower(),
-                vehicle_key=vehicle_key,
-                question=search_query,
-                top_k=5, 
-            )
+            with span("retrieval"):
+                manual_chunks = await search_manual_async(
+                    brand=str(brand).lower(),
+                    vehicle_key=vehicle_key,
+                    question=search_query,
+                    top_k=CONTEXT_CANDIDATES if CONTEXT_COMPRESSION_ENABLED else 5,
+                )
         except:
             manual_chunks = []
 
+    # 4a. Merge overlaps, drop near-duplicates, rerank and fit the token budget
+    if manual_chunks and CONTEXT_COMPRESSION_ENABLED:
+        with span("context_compression"):
+            manual_chunks = compress_context(manual_chunks)
+
     if manual_chunks:
-        rag_context = "\n\n".join(f"[Page {ch.get('page', '?')}] {ch.get('text', '')}" for ch in manual_chunks)
+        rag_context = format_context(manual_chunks)
     else:
         rag_context = f"No specific manual section found. Use general knowledge about {brand} vehicles."
 
+    # 4b. Answer Cache (first turn, no image): keep customer details out of the prompt
+    cache_key = None
+    if cacheable and not chat_history and not image_base64:
+        cache_key = answer_cache_key(
+            vehicle_key=vehicle_key,
+            vehicle_name=full_vehicle_name,
+            question=search_query,
+            language=language,
+            prevent_greeting=prevent_greeting,
+            chunk_ids=[str(ch.get("id", "")) for ch in manual_chunks],
+        )
+    fill = {"first_name": first_name, "promo_code": promo_code}
+    if cache_key:
+        first_name, promo_code = FIRST_NAME_SLOT, PROMO_CODE_SLOT
+
     # 5. Format Chat History
     formatted_history = ""
     if chat_history:
@@ -114,72 +145,24 @@ async def run_car_agent_rag(
     else:
         greeting_rule = f"Start by explicitly welcoming {first_name} and mentioning their {full_vehicle_name}."
 
-    # 7. System Prompt - SMART TRIAGE & PREVENTATIVE UPSELL
-    system_prompt = f"""
-You are an expert **Certified {brand} Service Advisor** at Ali & Sons.
-You are NOT a generic AI. You are a specialist for the **{full_vehicle_name}**.
-
-**YOUR SUPERPOWER:**
-You possess a detailed mental map of the **{full_vehicle_name}**'s interior cockpit. 
-When guiding the user, do not just list steps. **Visualize the driver's seat** and guide their hand to the exact location of the buttons.
-{rag_context}
-
-{formatted_history}
-
-=========================================
-PHASE 1: INTELLIGENT TRIAGE (CLASSIFY FIRST)
-=========================================
-Before answering, determine the severity:
-
-1. **LEVEL 1 (Settings & Simple Consumables):** 
-   - Examples: Bluetooth, Phone pairing, Wipers, Audio settings, Mirror folding, Tire pressure refill.
-   - *Strategy:* Be patient. Guide them through **up to 5 steps**.
-
-2. **LEVEL 2 (Moderate Mechanical):** 
-   - Examples: AC blowing warm, Battery dead, Squeaky brakes, Vibrations, Fuse replacement.
-   - *Strategy:* Be cautious. Suggest **MAXIMUM 3 basic checks** (e.g. Fuses, Fluid levels).
-   - If those 3 checks fail, **STOP immediately** and push for booking.
-
-3. **LEVEL 3 (Critical/Dangerous):** 
-   - Examples: Smoke, Burning smell, Transmission slipping, Major leaks, Flashing Engine Light, Airbags.
-   - *Strategy:* **IMMEDIATE STOP.** Do not offer DIY fixes. Explain the danger (Safety First) and demand a booking.
-
-=========================================
-PHASE 2: THE "GIVE UP" LOGIC
-=========================================
-- Look at the chat history. Have you reached the step limit for the Severity Level above?
-- If YES (or if user replied "no" multiple times):
-  - Stop guessing.
-  - **SAY:** "We have checked the basics. Since the issue persists, this indicates a complex internal fault with the {full_vehicle_name} that requires specialized diagnostics."
-  - **OFFER:** "To help, I've generated a Priority Voucher **{promo_code}** for getting a preferential rates diagnostics at Ali & Sons."
-  - **TRIGGER:** Append [ACTION:BOOK]
-
-=========================================
-PHASE 3: THE "PREVENTATIVE" UPSELL (If Solved)
-=========================================
-- If the user says "It worked", "Fixed", or "Thanks":
-  - **Do NOT just say goodbye.**
-  - **SAY:** "Great job! However, since this issue occurred, it might be a symptom of a larger wear-and-tear issue. To ensure your {brand} stays in peak condition, I recommend a quick health check at Ali & Sons."
-  - **TRIGGER:** Append [ACTION:BOOK] (This is optional but recommended).
-
-=========================================
-GENERAL RULES
-=========================================
-- **Brand Authority:** Always mention "Ali & Sons specialized {brand} tools" if the issue is complex.
-- **Booking Protocol:** Never ask for dates/times. Just say "Please use the button below." and append [ACTION:BOOK].
-- **Style:** One step at a time. Ask "Did that work?".
-
-5. **Greeting Rule**: {greeting_rule}
-
-User Query: "{search_query}"
-"""
+    # 7. System Prompt - static policy first, request details last (prefix caching)
+    system_prompt = build_system_prompt(
+        brand=brand,
+        vehicle_name=full_vehicle_name,
+        promo_code=promo_code,
+        greeting_rule=greeting_rule,
+        rag_context=rag_context,
+        formatted_history=formatted_history,
+        search_query=search_query,
+        placeholders=cache_key is not None,
+    )
 
     # 8. Model Selection
     if image_base64:
         selected_model = "gpt-4o"
         user_content = [
             {"type": "text", "text": message or "Analyze this image."},
-            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}},
+            {"type": "image_url", "image_url": {"url": f"data:{image_mime};base64,{image_base64}"}},
         ]
     else:
         selected_model = "gpt-4o-mini"
@@ -190,11 +173,129 @@ User Query: "{search_query}"
         {"role": "user", "content": user_content},
     ]
 
-    response = client.chat.completions.create(
-        model=selected_model,
-        messages=messages,
+    return {
+        "model": selected_model,
+        "messages": messages,
+        "cache_key": cache_key,
+        "fill": fill,
+        "prompt_cache_key": f"car-agent-{str(brand).lower()}",
+    }
+
+
+class PromptCacheStats:
+    """Prompt tokens vs. tokens served from the provider's prompt cache."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage, model: str):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.cached_tokens += cached
+        print(f"🧾 {model}: {usage.prompt_tokens} prompt tokens, {cached} cached")
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+        }
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+async def _complete(request: dict) -> str:
+    started = time.perf_counter()
+    with span("llm"):
+        response = await get_openai_client().chat.completions.create(
+            model=request["model"],
+            messages=request["messages"],
+            max_tokens=450,
+            temperature=0.3,
+            prompt_cache_key=request["prompt_cache_key"],
+        )
+    prompt_cache_stats.record(response.usage, request["model"])
+    metrics.record_llm(request["model"], time.perf_counter() - started, response.usage)
+
+    return response.choices[0].message.content
+
+
+async def run_car_agent_rag(use_answer_cache: bool = True, **kwargs) -> str:
+    """
+    Returns the full answer. First-turn, image-less answers are shared through
+    `answer_cache` (identical in-flight requests collapse into one completion);
+    pass `use_answer_cache=False` to bypass it.
+    """
+    request = await build_agent_request(cacheable=use_answer_cache and ANSWER_CACHE_ENABLED, **kwargs)
+
+    if request["cache_key"] is None:
+        return await _complete(request)
+
+    answer = await answer_cache.get_or_load(request["cache_key"], lambda: _complete(request))
+    return personalize(answer, **request["fill"])
+
+
+async def stream_car_agent_rag(use_answer_cache: bool = True, **kwargs):
+    """
+    Same as `run_car_agent_rag`, but yields the answer text as it is generated.
+    A cached answer is yielded in one piece; a cacheable miss is streamed with
+    the slots filled on the fly and then stored for the next customer.
+    """
+    request = await build_agent_request(cacheable=use_answer_cache and ANSWER_CACHE_ENABLED, **kwargs)
+    cache_key = request["cache_key"]
+
+    if cache_key is not None:
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            answer_cache.hits += 1
+            yield personalize(cached, **request["fill"])
+            return
+        answer_cache.misses += 1
+
+    fill = request["fill"]
+    slots = StreamReplacer({FIRST_NAME_SLOT: fill["first_name"], PROMO_CODE_SLOT: fill["promo_code"]})
+    parts = []
+    usage = None
+
+    started = time.perf_counter()
+    stream = await get_openai_client().chat.completions.create(
+        model=request["model"],
+        messages=request["messages"],
         max_tokens=450,
         temperature=0.3,
+        prompt_cache_key=request["prompt_cache_key"],
+        stream=True,
+        stream_options={"include_usage": True},
     )
 
-    return response.choices[0].message.content
+    async for chunk in stream:
+        if not chunk.choices:
+            # The final chunk carries usage only.
+            usage = getattr(chunk, "usage", None)
+            prompt_cache_stats.record(usage, request["model"])
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if not parts:
+                metrics.record_stage("llm_first_token", time.perf_counter() - started)
+            parts.append(delta)
+            text = slots.feed(delta) if cache_key else delta
+            if text:
+                yield text
+
+    metrics.record_stage("llm", time.perf_counter() - started)
+    metrics.record_llm(request["model"], time.perf_counter() - started, usage)
+
+    if cache_key is not None:
+        tail = slots.flush()
+        if tail:
+            yield tail
+        answer_cache.set(cache_key, "".join(parts))
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+# How often (seconds) the catalog checks the manual folders for changes.
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "30"))
+MAX_MEMO_ENTRIES = 10000
+
+
+class ManualCatalog:
+    """
+    In-memory index of the manual PDFs: brand -> [(manual key, normalized forms)].
+
+    Built once, then:
+      - brand lookup is a dict hit instead of two `os.listdir` calls,
+      - (brand, model, year) resolutions are memoized,
+      - folder mtimes are re-checked at most every CATALOG_CHECK_INTERVAL
+        seconds and the index is rebuilt when a manual is added or removed.
+    """
+
+    def __init__(self, root: str, check_interval: float = CATALOG_CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        self._brands: dict[str, list[tuple[str, str, str]]] = {}
+        self._memo: dict[tuple[str, str, str], str | None] = {}
+        self._signature: tuple = ()
+        self._checked_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    # ------------------------------------------------------------------
+    # BUILD / INVALIDATE
+    # ------------------------------------------------------------------
+    def _scan_signature(self) -> tuple:
+        """Cheap change detector: mtimes of the root and brand folders."""
+        if not os.path.isdir(self.root):
+            return ()
+        sig = [("", os.stat(self.root).st_mtime_ns)]
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_dir():
+                    sig.append((entry.name, entry.stat().st_mtime_ns))
+        return tuple(sorted(sig))
+
+    def reload(self):
+        brands: dict[str, list[tuple[str, str, str]]] = {}
+        if os.path.isdir(self.root):
+            for folder_name in os.listdir(self.root):
+                folder = os.path.join(self.root, folder_name)
+                if not os.path.isdir(folder):
+                    continue
+                entries = []
+                for f in os.listdir(folder):
+                    if not f.lower().endswith(".pdf"):
+                        continue
+                    key = f.replace(".pdf", "")
+                    key_l = key.lower()
+                    entries.append((key, key_l, key_l.replace(" ", "")))
+                # First folder wins on case-insensitive name clashes, as before.
+                brands.setdefault(folder_name.lower(), entries)
+
+        with self._lock:
+            self._brands = brands
+            self._memo = {}
+            self._signature = self._scan_signature()
+            self._checked_at = time.monotonic()
+            self._loaded = True
+            self.reloads += 1
+
+    def _ensure_fresh(self):
+        if not self._loaded:
+            self.reload()
+            return
+
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._scan_signature() != self._signature:
+            self.reload()
+
+    # ------------------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------------------
+    def brands(self) -> list[str]:
+        self._ensure_fresh()
+        return list(self._brands)
+
+    def manuals_for(self, brand: str) -> list[str]:
+        self._ensure_fresh()
+        return [key for key, _, _ in self._brands.get(str(brand).lower().strip(), [])]
+
+    def resolve(self, brand: str, model: str, year) -> str | None:
+        if not brand: return None
+        self._ensure_fresh()
+
+        brand_clean = str(brand).lower().strip()
+        model_clean = str(model or "").lower().strip()
+        year_str = str(year or "").strip()
+
+        memo_key = (brand_clean, model_clean, year_str)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+
+        entries = self._brands.get(brand_clean)
+        best_match = None
+        best_score = 0
+        model_compact = model_clean.replace(" ", "")
+
+        for key, key_l, key_compact in entries or []:
+            score = 0
+            if model_clean and model_clean in key_l: score += 5
+            if year_str and year_str in key_l: score += 3
+            if model_compact in key_compact: score += 2
+            if score > best_score:
+                best_score = score
+                best_match = key
+
+        result = best_match if best_score > 0 else None
+        if len(self._memo) >= MAX_MEMO_ENTRIES:
+            self._memo.clear()
+        self._memo[memo_key] = result
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "brands": len(self._brands),
+            "manuals": sum(len(v) for v in self._brands.values()),
+            "memoized": len(self._memo),
+            "reloads": self.reloads,
+        }
@@ -0,0 +1,133 @@
+"""
+Query latency of the two vector store layouts as a brand's manual count grows.
+
+Builds throwaway Chroma stores with synthetic vectors (no embedding calls):
+    brand   one collection, `where={"source": key}` on every query
+    manual  one collection per manual, no filter
+and times `query` for each layout, plus the old per-query `get_collection`
+lookup against the cached handle. Also counts brand-layout queries that
+returned fewer than --top-k hits.
+
+Run from the repo root:
+    python backend/benchmarks/collection_layout.py --manuals 1,4,16,64 --chunks 300
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag.vector_collections import manual_collection_name
+
+BRAND_COLLECTION = "porsche_manuals"
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return round(1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+
+def build(client, manuals: int, chunks: int, dim: int, rng):
+    """Same vectors in both layouts: {key: vectors}."""
+    brand = client.create_collection(BRAND_COLLECTION, embedding_function=None)
+    data = {}
+    for m in range(manuals):
+        key = f"Porsche_Manual_{m:03d}"
+        # Each manual gets its own topic direction, like real manuals do.
+        center = rng.normal(size=dim)
+        vectors = (center + rng.normal(scale=0.8, size=(chunks, dim))).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        data[key] = vectors
+        ids = [f"{key}_{i}" for i in range(chunks)]
+        metadatas = [{"source": key, "page": i} for i in range(chunks)]
+        documents = [f"{key} chunk {i}" for i in range(chunks)]
+        for start in range(0, chunks, 1000):
+            stop = start + 1000
+            brand.add(ids=ids[start:stop], embeddings=vectors[start:stop], metadatas=metadatas[start:stop],
+                      documents=documents[start:stop])
+            client.get_or_create_collection(manual_collection_name(BRAND_COLLECTION, key), embedding_function=None).add(
+                ids=ids[start:stop], embeddings=vectors[start:stop], metadatas=metadatas[start:stop],
+                documents=documents[start:stop],
+            )
+    return data
+
+
+def run_level(manuals: int, chunks: int, dim: int, queries: int, top_k: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    path = tempfile.mkdtemp(prefix="layout-bench-")
+    try:
+        client = chromadb.PersistentClient(path=path)
+        data = build(client, manuals, chunks, dim, rng)
+        keys = list(data)
+        brand = client.get_collection(BRAND_COLLECTION)
+        handles = {key: client.get_collection(manual_collection_name(BRAND_COLLECTION, key)) for key in keys}
+
+        plan = []
+        for q in range(queries):
+            key = keys[q % len(keys)]
+            near = data[key][rng.integers(chunks)]
+            query = near + rng.normal(scale=0.05, size=dim).astype(np.float32)
+            plan.append((key, query / np.linalg.norm(query)))
+
+        timings = {"brand": [], "brand_uncached": [], "manual": []}
+        short = 0
+        for key, query in plan:
+            started = time.perf_counter()
+            result = brand.query(query_embeddings=[query], n_results=top_k, where={"source": key})
+            timings["brand"].append(time.perf_counter() - started)
+            short += len(result["ids"][0]) < top_k
+
+            started = time.perf_counter()
+            client.get_collection(BRAND_COLLECTION).query(query_embeddings=[query], n_results=top_k, where={"source": key})
+            timings["brand_uncached"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            handles[key].query(query_embeddings=[query], n_results=top_k)
+            timings["manual"].append(time.perf_counter() - started)
+
+        return {
+            "manuals": manuals,
+            "vectors": manuals * chunks,
+            **{
+                f"{layout}_ms": {"p50": percentile_ms(s, 0.5), "p95": percentile_ms(s, 0.95)}
+                for layout, s in timings.items()
+            },
+            "brand_short_results": short,
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--manuals", default="1,4,16,64", help="Comma-separated manual counts per brand")
+    parser.add_argument("--chunks", type=int, default=300, help="Chunks per manual")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = []
+    for manuals in (int(m) for m in args.manuals.split(",") if m):
+        level = run_level(manuals, args.chunks, args.dim, args.queries, args.top_k, args.seed)
+        print(
+            f"{manuals:>4} manuals ({level['vectors']:>6} vectors): "
+            f"brand p50 {level['brand_ms']['p50']:>6} ms, "
+            f"brand+get_collection p50 {level['brand_uncached_ms']['p50']:>6} ms, "
+            f"per-manual p50 {level['manual_ms']['p50']:>6} ms, "
+            f"short brand results {level['brand_short_results']}",
+            file=sys.stderr,
+        )
+        results.append(level)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Compares the legacy word-window chunker with the structured chunker.
+
+Chunks one manual both ways, retrieves the top-k chunks for a set of sample
+questions with a simple lexical scorer (no embeddings / API key needed) and
+reports chunk counts, chunk sizes and the average rag_context tokens that
+would be sent to the model per answer, before and after context compression
+(rag/context_compression.py).
+
+Run from the repo root:
+    PYTHONPATH=backend python backend/benchmarks/compare_chunkers.py \
+        --pdf "backend/manuals/ali-and-sons/porsche/2011-Cayenne-Owners-Manual.pdf"
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_ROOT)
+sys.path.insert(0, os.path.join(BACKEND_ROOT, "data_ingestion", "manual_ingest"))
+
+from convert_pdf import extract_line_range, extract_page_range, page_count
+from pipeline import make_chunks
+from structured_chunker import CHUNK_MAX_TOKENS
+from rag.context_compression import compress_context, format_context
+from utils.tokens import count_tokens
+
+SAMPLE_QUESTIONS = [
+    "How do I check the engine oil level?",
+    "What is the correct tire pressure?",
+    "How do I change a flat tire?",
+    "Where is the fuse box located?",
+    "How do I reset the tire pressure monitoring system?",
+    "How do I jump start the car with a dead battery?",
+    "What does the brake warning light mean?",
+    "How do I pair my phone over Bluetooth?",
+    "How do I open the tailgate manually?",
+    "How often should the brake fluid be changed?",
+    "How do I adjust the seats and mirrors memory?",
+    "What should I do if the airbag warning light stays on?",
+]
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [w for w in WORD_RE.findall(text.lower()) if len(w) > 2]
+
+
+def top_k(chunks: list[dict], question: str, k: int) -> list[dict]:
+    """TF-IDF style lexical ranking; the same scorer is used for both chunkers."""
+    docs = [Counter(tokenize(c["text"])) for c in chunks]
+    df = Counter(term for doc in docs for term in doc)
+    terms = set(tokenize(question))
+    n = len(docs)
+
+    def score(doc: Counter) -> float:
+        length = sum(doc.values()) or 1
+        return sum(
+            (doc[t] / length) * math.log(1 + n / df[t]) for t in terms if t in doc
+        )
+
+    ranked = sorted(range(n), key=lambda i: score(docs[i]), reverse=True)
+    return [chunks[i] for i in ranked[:k]]
+
+
+def summarize(name: str, chunks: list[dict], questions: list[str], k: int) -> dict:
+    chunks = [{**c, "id": f"{name}_{i}", "source": name} for i, c in enumerate(chunks)]
+    sizes = [count_tokens(c["text"]) for c in chunks]
+    retrieved = [top_k(chunks, q, k) for q in questions]
+    context_tokens = [count_tokens(format_context(r)) for r in retrieved]
+    compressed_tokens = [count_tokens(format_context(compress_context(r))) for r in retrieved]
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "avg_chunk_tokens": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+        "max_chunk_tokens": max(sizes, default=0),
+        "avg_context_tokens": round(sum(context_tokens) / len(context_tokens), 1),
+        "avg_compressed_tokens": round(sum(compressed_tokens) / len(compressed_tokens), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    parser.add_argument("--questions", help="Optional file with one question per line")
+    args = parser.parse_args()
+
+    questions = SAMPLE_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    total = page_count(args.pdf)
+    words = make_chunks("words", extract_page_range(args.pdf, 0, total), 500, 50, args.max_tokens)
+    structured = make_chunks("structured", extract_line_range(args.pdf, 0, total), 500, 50, args.max_tokens)
+
+    results = [
+        summarize("words", words, questions, args.top_k),
+        summarize("structured", structured, questions, args.top_k),
+    ]
+    before, after = results[0]["avg_context_tokens"], results[1]["avg_context_tokens"]
+    print(json.dumps({
+        "pdf": os.path.basename(args.pdf),
+        "questions": len(questions),
+        "top_k": args.top_k,
+        "results": results,
+        "context_token_reduction": round(1 - after / before, 3) if before else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
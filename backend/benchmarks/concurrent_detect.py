@@ -0,0 +1,78 @@
+"""
+Concurrency check for /detect.
+
+Fires N concurrent /detect calls against a stubbed LLM that sleeps for
+LLM_LATENCY seconds. With a non-blocking request path the batch finishes in
+roughly one LLM latency; a blocking call would take about N latencies.
+
+Run from the repo root:
+    PYTHONPATH=backend python backend/benchmarks/concurrent_detect.py --requests 20 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+
+import main
+from agents import car_agent
+
+
+class SlowCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content="Please check the fuse box.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+async def fake_customer_data(customerId: str, **kwargs):
+    return {
+        "customerId": customerId.zfill(10),
+        "customerName": "Bench User",
+        "vehicles": [{"vehicleId": "1", "brand": "Bench", "model": "Car", "year": "2024", "vin": ""}],
+    }
+
+
+async def run(n: int, latency: float) -> float:
+    main.get_customer_data = fake_customer_data
+    car_agent.client = SimpleNamespace(chat=SimpleNamespace(completions=SlowCompletions(latency)))
+    # Identical questions would otherwise collapse into one completion.
+    car_agent.ANSWER_CACHE_ENABLED = False
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def one(i: int):
+            r = await http.post("/detect", data={"customerId": str(i), "message": "My AC is blowing warm air"})
+            r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n)))
+        return time.perf_counter() - start
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(args.requests, args.latency))
+    print(f"{args.requests} concurrent /detect calls, LLM latency {args.latency:.2f}s -> {elapsed:.2f}s total")
+
+    # Allow generous overhead, but a serialized path would need N x latency.
+    if elapsed > args.latency * 2:
+        print("❌ Requests were serialized: the event loop is being blocked.")
+        sys.exit(1)
+    print("✅ Requests ran concurrently.")
+
+
+if __name__ == "__main__":
+    main_cli()
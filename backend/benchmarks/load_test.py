@@ -0,0 +1,383 @@
+"""
+End-to-end load test for /detect with local stand-ins for every upstream.
+
+Starts stub_openai.py (chat + embeddings) and stub_customer_api.py (login +
+customer vehicles) as subprocesses, seeds a throwaway vector store, and drives
+`main.app` in-process with conversation scripts at rising concurrency:
+
+    single_vehicle   question -> follow-up
+    multi_vehicle    question -> clarification -> "the 2011 one" -> answer
+    image            photo of a warning light (multi-MB JPEG upload)
+
+For each concurrency level it reports RPS, p50/p95/p99 latency per turn kind
+and a per-stage breakdown (customer API, vehicle selection, retrieval, LLM,
+image preprocessing, session store) as JSON. A saved report can be used as a
+baseline: the run fails when p95 or RPS regress beyond the tolerance.
+
+Run from the repo root:
+    python backend/benchmarks/load_test.py --concurrency 1,5,10,25 --duration 10 \\
+        --output bench.json --baseline backend/benchmarks/baselines/load_test.json
+    python backend/benchmarks/load_test.py --save-baseline backend/benchmarks/baselines/load_test.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+BACKEND_ROOT = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+
+QUESTIONS = [
+    "How do I check the engine oil level?",
+    "What is the correct tire pressure?",
+    "My AC is blowing warm air",
+    "How do I pair my phone over Bluetooth?",
+    "The tire pressure warning light is on",
+    "How do I open the tailgate manually?",
+    "Where is the fuse box located?",
+    "How do I reset the service interval?",
+    "The battery seems dead, what should I check?",
+    "How do I turn PSM off?",
+]
+SEED_TOPICS = [
+    "engine oil level", "tire pressure", "air conditioning", "Bluetooth phone pairing",
+    "tire pressure monitoring", "tailgate", "fuse box", "service interval", "battery", "PSM stability control",
+]
+
+
+# ----------------------------------------------------------------------
+# STUB SERVERS
+# ----------------------------------------------------------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(script: str, port: int, args: list[str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, script), "--port", str(port), *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stub/stats", timeout=0.5).raise_for_status()
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{script} did not start on port {port}")
+
+
+# ----------------------------------------------------------------------
+# STAGE TIMING
+# ----------------------------------------------------------------------
+class StageTimer:
+    """Wraps app functions and records how long each stage takes."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+
+    def reset(self):
+        self.samples = {}
+
+    def _add(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap_async(self, owner, name: str, stage: str):
+        fn = getattr(owner, name)
+
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self._add(stage, time.perf_counter() - start)
+
+        setattr(owner, name, timed)
+
+    def wrap_sync(self, owner, name: str, stage: str):
+        fn = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._add(stage, time.perf_counter() - start)
+
+        setattr(owner, name, timed)
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(1000 * ordered[-1], 2),
+    }
+
+
+# ----------------------------------------------------------------------
+# CONVERSATION SCRIPTS
+# ----------------------------------------------------------------------
+def make_photo() -> bytes:
+    """A multi-megabyte phone-sized JPEG."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(7)
+    pixels = (rng.random((3000, 4000, 3)) * 40 + np.linspace(40, 200, 4000)[None, :, None]).astype("uint8")
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+def script_turns(kind: str, question: str) -> list[tuple[str, str, bool]]:
+    """(turn label, message, with_image) steps of one conversation."""
+    if kind == "single_vehicle":
+        return [("question", question, False), ("followup", "No, that didn't work.", False)]
+    if kind == "multi_vehicle":
+        return [("clarification", question, False), ("selection", "the 2011 one", False)]
+    return [("image", "What does this warning light mean?", True)]
+
+
+SCRIPT_MIX = ["single_vehicle", "single_vehicle", "multi_vehicle", "single_vehicle", "image"]
+
+
+async def run_user(http, user: int, deadline: float, photo: bytes, results: list):
+    iteration = 0
+    while time.perf_counter() < deadline:
+        kind = SCRIPT_MIX[(user + iteration) % len(SCRIPT_MIX)]
+        # The stub gives IDs ending in 7-9 three vehicles, others one.
+        last_digit = "8" if kind == "multi_vehicle" else "1"
+        customer_id = f"{user:04d}{iteration % 1000:04d}{last_digit}"
+        question = QUESTIONS[(user * 7 + iteration) % len(QUESTIONS)]
+        session_id = None
+
+        for label, message, with_image in script_turns(kind, question):
+            data = {"customerId": customer_id, "message": message, "language": "en"}
+            if session_id:
+                data["session_id"] = session_id
+            files = {"image": ("dash.jpg", photo, "image/jpeg")} if with_image else None
+
+            start = time.perf_counter()
+            try:
+                r = await http.post("/detect", data=data, files=files)
+                ok = r.status_code == 200
+                body = r.json() if ok else {}
+            except Exception:
+                ok, body = False, {}
+            results.append((label, time.perf_counter() - start, ok))
+            if not ok:
+                break
+            session_id = body.get("session_id", session_id)
+        iteration += 1
+
+
+async def run_level(app, timer: StageTimer, concurrency: int, duration: float, photo: bytes) -> dict:
+    timer.reset()
+    results: list[tuple[str, float, bool]] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(run_user(http, u, deadline, photo, results) for u in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    by_turn: dict[str, list[float]] = {}
+    for label, seconds, ok in results:
+        if ok:
+            by_turn.setdefault(label, []).append(seconds)
+    errors = sum(1 for _, _, ok in results if not ok)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency": percentiles([s for _, s, ok in results if ok]),
+        "by_turn": {label: percentiles(s) for label, s in sorted(by_turn.items())},
+        "stages": {stage: percentiles(s) for stage, s in sorted(timer.samples.items())},
+    }
+
+
+# ----------------------------------------------------------------------
+# APP UNDER TEST
+# ----------------------------------------------------------------------
+def seed_vector_store(vehicle_key: str, chunks_per_topic: int):
+    """Synthetic Cayenne manual chunks, embedded through the stub."""
+    sys.path.insert(0, os.path.join(BACKEND_ROOT, "data_ingestion", "manual_ingest"))
+    from embed_store import add_chunks_to_db
+
+    chunks = [
+        f"{topic.title()}\nStep {i + 1}: check the {topic} as described on the multi-purpose display. "
+        f"Refer to section {i + 1} for the {topic} procedure and the warning messages it can show."
+        for topic in SEED_TOPICS
+        for i in range(chunks_per_topic)
+    ]
+    add_chunks_to_db("porsche_manuals", vehicle_key, chunks)
+
+
+def load_app(args, openai_port: int, customer_port: int):
+    """Imports main.py inside a throwaway working directory wired to the stubs."""
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    os.makedirs(os.path.join(workdir, "backend"))
+    os.symlink(os.path.join(BACKEND_ROOT, "manuals"), os.path.join(workdir, "backend", "manuals"))
+    os.chdir(workdir)
+
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "CUSTOMER_API_BASE": f"http://127.0.0.1:{customer_port}",
+        "AUTH_DOMAIN": "bench",
+        "AUTH_USER": "bench",
+        "AUTH_PASS": "bench",
+        "ANSWER_CACHE_ENABLED": "0" if args.no_answer_cache else "1",
+    })
+    sys.path.insert(0, BACKEND_ROOT)
+
+    import main
+    from agents import car_agent
+
+    vehicle_key = car_agent.find_best_manual_key("Porsche", "Cayenne", "2011")
+    if vehicle_key:
+        seed_vector_store(vehicle_key, args.seed_chunks)
+
+    timer = StageTimer()
+    timer.wrap_async(main, "get_customer_data", "customer_api")
+    timer.wrap_async(main, "select_vehicle_via_llm", "vehicle_select")
+    timer.wrap_async(car_agent, "search_manual_async", "retrieval")
+    timer.wrap_async(car_agent, "_complete", "llm")
+    timer.wrap_sync(main.image_processor, "process", "image")
+    timer.wrap_async(main.session_store, "load", "session_load")
+    timer.wrap_async(main.session_store, "save", "session_save")
+    return main, timer
+
+
+# ----------------------------------------------------------------------
+# BASELINES
+# ----------------------------------------------------------------------
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of p95 latency, RPS or error count per concurrency level."""
+    problems = []
+    base_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in report["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if not base:
+            continue
+        c = level["concurrency"]
+        p95, base_p95 = level["latency"].get("p95_ms"), base["latency"].get("p95_ms")
+        if p95 and base_p95 and p95 > base_p95 * (1 + tolerance):
+            problems.append(f"c={c}: p95 {p95} ms vs baseline {base_p95} ms")
+        if level["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"c={c}: {level['rps']} rps vs baseline {base['rps']} rps")
+        if level["errors"] > base["errors"]:
+            problems.append(f"c={c}: {level['errors']} errors vs baseline {base['errors']}")
+    return problems
+
+
+async def run(args) -> dict:
+    openai_port, customer_port = free_port(), free_port()
+    stubs = [
+        start_stub("stub_openai.py", openai_port, [
+            "--latency", str(args.embedding_latency),
+            "--chat-latency", str(args.llm_latency),
+            "--error-rate", str(args.error_rate),
+            "--error-status", "500",
+        ]),
+        start_stub("stub_customer_api.py", customer_port, [
+            "--latency", str(args.customer_latency),
+            "--error-rate", str(args.error_rate),
+        ]),
+    ]
+    try:
+        main, timer = load_app(args, openai_port, customer_port)
+        photo = make_photo()
+        levels = []
+        async with main.lifespan(main.app):
+            for concurrency in args.concurrency:
+                level = await run_level(main.app, timer, concurrency, args.duration, photo)
+                print(
+                    f"c={concurrency:>3}: {level['rps']:>7} rps, p50 {level['latency'].get('p50_ms')} ms, "
+                    f"p95 {level['latency'].get('p95_ms')} ms, p99 {level['latency'].get('p99_ms')} ms, "
+                    f"{level['errors']} errors",
+                    file=sys.stderr,
+                )
+                levels.append(level)
+        return {
+            "config": {
+                "duration_s": args.duration,
+                "llm_latency_s": args.llm_latency,
+                "embedding_latency_s": args.embedding_latency,
+                "customer_latency_s": args.customer_latency,
+                "error_rate": args.error_rate,
+                "answer_cache": not args.no_answer_cache,
+                "photo_bytes": len(photo),
+            },
+            "levels": levels,
+        }
+    finally:
+        for proc in stubs:
+            proc.terminate()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,5,10,25", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--customer-latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Injected upstream error rate")
+    parser.add_argument("--seed-chunks", type=int, default=10, help="Synthetic chunks per topic")
+    parser.add_argument("--no-answer-cache", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--save-baseline", help="Write the JSON report as a baseline")
+    parser.add_argument("--baseline", help="Compare against this baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression (0.25 = 25%%)")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c]
+
+    cwd = os.getcwd()
+    report = asyncio.run(run(args))
+    os.chdir(cwd)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        if problems:
+            print("❌ Regressions against baseline:", file=sys.stderr)
+            for problem in problems:
+                print(f"   - {problem}", file=sys.stderr)
+            sys.exit(1)
+        print("✅ Within baseline tolerance.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,84 @@
+"""
+Offline check that the car agent's system prompt keeps a stable prefix.
+
+Builds agent requests for several customers, vehicles, questions and
+conversation states (manual search stubbed, no API calls) and verifies that
+every prompt for a brand starts with that brand's precompiled prefix, i.e.
+nothing request-specific leaked into the cacheable part. Exits with status 1
+on a violation.
+
+Also reports the prefix shared by all prompts, across brands. OpenAI only
+caches prompts from 1024 tokens and the current policy is shorter, so that
+number is reported, not enforced.
+
+Run from the repo root:
+    OPENAI_API_KEY=stub PYTHONPATH=backend python backend/benchmarks/prompt_prefix_check.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from agents import car_agent
+from agents.prompt_builder import brand_prefix, prefix_tokens
+from utils.tokens import count_tokens
+
+VEHICLES = [
+    {"vehicleId": "1", "brand": "Porsche", "model": "Cayenne", "year": "2011"},
+    {"vehicleId": "2", "brand": "Porsche", "model": "911", "year": "2023"},
+    {"vehicleId": "3", "brand": "Xpeng", "model": "X9", "year": "2024"},
+]
+CUSTOMERS = [("Sara", "AS-12345-VIP"), ("Omar", "AS-67890-VIP")]
+QUESTIONS = ["How do I check the engine oil level?", "My tire pressure light is on", "hello"]
+HISTORIES = [[], [{"role": "user", "content": "My AC is warm"}, {"role": "assistant", "content": "Check the fuse."}]]
+MIN_CACHEABLE_TOKENS = 1024
+
+
+async def fake_search(brand, vehicle_key, question, top_k=5):
+    return [{"id": f"{vehicle_key}-{i}", "text": f"{question} (manual excerpt {i})", "page": i + 1} for i in range(3)]
+
+
+async def main() -> int:
+    car_agent.search_manual_async = fake_search
+    prompts: dict[str, list[str]] = {}
+    for vehicle in VEHICLES:
+        for first_name, promo in CUSTOMERS:
+            for question in QUESTIONS:
+                for history in HISTORIES:
+                    for cacheable in (False, True):
+                        request = await car_agent.build_agent_request(
+                            message=question,
+                            vehicle_data=vehicle,
+                            first_name=first_name,
+                            promo_code=promo,
+                            chat_history=history,
+                            prevent_greeting=bool(history),
+                            cacheable=cacheable,
+                        )
+                        prompts.setdefault(vehicle["brand"], []).append(request["messages"][0]["content"])
+
+    failed = False
+    for brand, texts in prompts.items():
+        stable = all(text.startswith(brand_prefix(brand)) for text in texts)
+        shared = os.path.commonprefix(texts)
+        avg_tokens = sum(count_tokens(t) for t in texts) / len(texts)
+        print(
+            f"{'✅' if stable else '❌'} {brand}: {len(texts)} prompts, "
+            f"precompiled prefix {prefix_tokens(brand)} tokens, "
+            f"shared prefix {count_tokens(shared)} tokens of ~{avg_tokens:.0f} per prompt"
+        )
+        failed |= not stable
+
+    shared_all = os.path.commonprefix([text for texts in prompts.values() for text in texts])
+    shared_tokens = count_tokens(shared_all)
+    cacheable = shared_tokens >= MIN_CACHEABLE_TOKENS
+    print(
+        f"{'✅' if cacheable else '⚠️'} Shared by all {sum(map(len, prompts.values()))} prompts: "
+        f"{shared_tokens} tokens (the provider caches from {MIN_CACHEABLE_TOKENS})"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,165 @@
+"""
+Cold-start cost of the API: import time, time until /healthz and /readyz
+answer, and the latency of the first manual search after the app is ready.
+
+Every run is a fresh interpreter (`--child`), started in a throwaway working
+directory with a seeded vector store, stub upstreams (stub_openai.py,
+stub_customer_api.py) and a manual usage file that makes the seeded manual
+the most searched one. Runs alternate between the default warm-up and
+WARMUP_MANUALS=0, so the first-search numbers show what preloading saves.
+The OS page cache stays warm between runs; the numbers are the in-process
+cost (opening Chroma, loading the HNSW segment and indexes), not disk I/O.
+
+Run from the repo root:
+    python backend/benchmarks/startup.py --runs 5 --seed-chunks 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+BACKEND_ROOT = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+VEHICLE = ("Porsche", "Cayenne", "2011")
+
+
+# ----------------------------------------------------------------------
+# CHILD: one cold start
+# ----------------------------------------------------------------------
+async def cold_start(question: str) -> dict:
+    started = time.perf_counter()
+    sys.path.insert(0, BACKEND_ROOT)
+    import main
+    from agents.car_agent import find_best_manual_key
+    from rag.manual_search import search_manual_async
+    import httpx
+
+    result = {"import_s": time.perf_counter() - started}
+
+    lifespan_started = time.perf_counter()
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as http:
+            (await http.get("/healthz")).raise_for_status()
+            result["healthz_s"] = time.perf_counter() - lifespan_started
+
+            while True:
+                r = await http.get("/readyz")
+                if r.status_code == 200:
+                    break
+                if not any(check["detail"] == "pending" for check in r.json()["checks"].values()):
+                    raise RuntimeError(f"App failed to become ready: {r.json()['checks']}")
+                await asyncio.sleep(0.005)
+            result["ready_s"] = time.perf_counter() - lifespan_started
+
+        key = find_best_manual_key(*VEHICLE)
+        for name in ("first_search_ms", "second_search_ms"):
+            t = time.perf_counter()
+            await search_manual_async(VEHICLE[0].lower(), key, f"{question} ({name})")
+            result[name] = 1000 * (time.perf_counter() - t)
+    return result
+
+
+# ----------------------------------------------------------------------
+# PARENT
+# ----------------------------------------------------------------------
+def prepare_workdir(openai_port: int, customer_port: int, seed_chunks: int) -> tuple[str, dict]:
+    from load_test import seed_vector_store
+
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    os.makedirs(os.path.join(workdir, "backend", "state"))
+    os.symlink(os.path.join(BACKEND_ROOT, "manuals"), os.path.join(workdir, "backend", "manuals"))
+    env = {
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "CUSTOMER_API_BASE": f"http://127.0.0.1:{customer_port}",
+        "AUTH_DOMAIN": "bench",
+        "AUTH_USER": "bench",
+        "AUTH_PASS": "bench",
+    }
+
+    cwd = os.getcwd()
+    os.environ.update(env)
+    os.chdir(workdir)
+    try:
+        sys.path.insert(0, BACKEND_ROOT)
+        from agents.car_agent import find_best_manual_key
+
+        key = find_best_manual_key(*VEHICLE)
+        if not key:
+            raise RuntimeError("No manual found for the benchmark vehicle")
+        seed_vector_store(key, seed_chunks)
+        with open(os.path.join("backend", "state", "manual_usage.json"), "w", encoding="utf-8") as f:
+            json.dump([{"collection": "porsche_manuals", "vehicle_key": key, "searches": 100}], f)
+    finally:
+        os.chdir(cwd)
+    return workdir, env
+
+
+def run_child(workdir: str, env: dict, warmup: bool, question: str) -> dict:
+    child_env = {**os.environ, **env, "WARMUP_MANUALS": "10" if warmup else "0"}
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--question", question],
+        cwd=workdir, env=child_env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs: list[dict]) -> dict:
+    return {
+        name: round(statistics.median(r[name] for r in runs), 4 if name.endswith("_s") else 2)
+        for name in runs[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per mode")
+    parser.add_argument("--seed-chunks", type=int, default=40, help="Chunks per topic in the seeded manual")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--question", default="How do I check the engine oil level?")
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(cold_start(args.question))
+        print(json.dumps(result))
+        return
+
+    from load_test import free_port, start_stub
+
+    openai_port, customer_port = free_port(), free_port()
+    stubs = [
+        start_stub("stub_openai.py", openai_port, []),
+        start_stub("stub_customer_api.py", customer_port, []),
+    ]
+    try:
+        workdir, env = prepare_workdir(openai_port, customer_port, args.seed_chunks)
+        modes = {"warmup": [], "no_warmup": []}
+        for i in range(args.runs):
+            for mode, runs in modes.items():
+                # A new question per run, so the embedding cache does not hide the embedding call.
+                question = f"What does the tire pressure warning mean? #{i}-{mode}"
+                runs.append(run_child(workdir, env, mode == "warmup", question))
+    finally:
+        for proc in stubs:
+            proc.terminate()
+
+    report = {"runs": args.runs, **{mode: summarize(runs) for mode, runs in modes.items()}}
+    for mode in modes:
+        r = report[mode]
+        print(
+            f"{mode:>10}: import {r['import_s']:.2f}s, healthz {1000 * r['healthz_s']:.0f} ms, "
+            f"ready {r['ready_s']:.2f}s, first search {r['first_search_ms']} ms, "
+            f"second search {r['second_search_ms']} ms",
+            file=sys.stderr,
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
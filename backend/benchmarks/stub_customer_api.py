@@ -0,0 +1,142 @@
+"""
+Local stand-in for the Quantum customer API, for load tests.
+
+Serves POST /api/auth/login (JWT with an `exp` claim) and
+GET /api/Quantum/customervehicles with deterministic customers: IDs ending
+in 7, 8 or 9 own three vehicles (the multi-vehicle clarification flow),
+every other ID owns one. Latency and error injection as in stub_openai.py.
+
+Run:
+    python backend/benchmarks/stub_customer_api.py --port 9200 --latency 0.05
+    CUSTOMER_API_BASE=http://127.0.0.1:9200 uvicorn main:app ...
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+STUB_CONFIG = {
+    "latency": 0.0,
+    "error_rate": 0.0,
+    "error_status": 500,
+    "token_ttl": 900,
+}
+
+stats = {"logins": 0, "customer_requests": 0, "unauthorized": 0, "injected_errors": 0}
+
+CAYENNE = {
+    "Vehicle_ID": "60001",
+    "Vehicle_Brand": "Porsche",
+    "Vehicle_Model_Description": "Cayenne",
+    "Vehicle_Model_Year": "2011",
+    "Vehicle_Chassis_Number": "WP1ZZZ92ZBLA00001",
+}
+GARAGE = [
+    CAYENNE,
+    {
+        "Vehicle_ID": "60002",
+        "Vehicle_Brand": "Porsche",
+        "Vehicle_Model_Description": "911 Carrera",
+        "Vehicle_Model_Year": "2023",
+        "Vehicle_Chassis_Number": "WP0ZZZ99ZPS00002",
+    },
+    {
+        "Vehicle_ID": "60003",
+        "Vehicle_Brand": "Xpeng",
+        "Vehicle_Model_Description": "X9",
+        "Vehicle_Model_Year": "2024",
+        "Vehicle_Chassis_Number": "LXPX9ZZZ0RS00003",
+    },
+]
+
+app = FastAPI()
+_tokens: set[str] = set()
+
+
+def is_multi_vehicle(customer_id: str) -> bool:
+    return customer_id[-1:] in ("7", "8", "9")
+
+
+def make_token(ttl: int) -> str:
+    def part(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    header = part({"alg": "none", "typ": "JWT"})
+    payload = part({"sub": "stub", "exp": int(time.time()) + ttl, "jti": random.getrandbits(64)})
+    return f"{header}.{payload}.stub"
+
+
+async def _inject():
+    if STUB_CONFIG["latency"]:
+        await asyncio.sleep(STUB_CONFIG["latency"])
+    if STUB_CONFIG["error_rate"] and random.random() < STUB_CONFIG["error_rate"]:
+        stats["injected_errors"] += 1
+        status = STUB_CONFIG["error_status"]
+        return JSONResponse(status_code=status, content={"message": f"Injected {status}"})
+    return None
+
+
+@app.post("/api/auth/login")
+async def login(request: Request):
+    error = await _inject()
+    if error is not None:
+        return error
+    await request.json()
+    stats["logins"] += 1
+    token = make_token(STUB_CONFIG["token_ttl"])
+    _tokens.add(token)
+    return {"accessToken": token, "expiresIn": STUB_CONFIG["token_ttl"]}
+
+
+@app.get("/api/Quantum/customervehicles")
+async def customer_vehicles(request: Request, customerId: str):
+    error = await _inject()
+    if error is not None:
+        return error
+
+    token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if token not in _tokens:
+        stats["unauthorized"] += 1
+        return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+
+    stats["customer_requests"] += 1
+    return {
+        "customerId": customerId,
+        "customerName": f"Bench Customer{customerId[-4:]}",
+        "vehicles": GARAGE if is_multi_vehicle(customerId) else [CAYENNE],
+    }
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return stats
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--token-ttl", type=int, default=900)
+    args = parser.parse_args()
+
+    STUB_CONFIG.update(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        token_ttl=args.token_ttl,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
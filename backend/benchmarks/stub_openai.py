@@ -0,0 +1,213 @@
+"""
+Local stand-in for the OpenAI API, for ingestion and load tests.
+
+Serves POST /v1/embeddings with deterministic vectors (same text -> same
+vector) and POST /v1/chat/completions (plain and streamed), with
+configurable latency and error injection (429 / 500). Chat usage reports
+`cached_tokens` the way the real prompt cache does: the longest previously
+seen prompt prefix, from 1024 tokens in 128-token steps.
+
+Run:
+    python backend/benchmarks/stub_openai.py --port 9100 --latency 0.05 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub python backend/data_ingestion/manual_ingest/ingest_all.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_CONFIG = {
+    "latency": 0.0,
+    "chat_latency": 0.0,
+    "chat_chunks": 20,
+    "chunk_delay": 0.0,
+    "error_rate": 0.0,
+    "error_status": 429,
+    "dimensions": 1536,
+}
+
+stats = {
+    "embedding_requests": 0,
+    "embedded_inputs": 0,
+    "chat_requests": 0,
+    "prompt_tokens": 0,
+    "cached_tokens": 0,
+    "injected_errors": 0,
+}
+
+CHAT_ANSWER = (
+    "Okay, let's check that. First, open the fuse box on the left side of the dashboard "
+    "and look at the fuse for this system. Did that work?"
+)
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+_seen_prefixes: set[str] = set()
+
+app = FastAPI()
+
+
+def fake_embedding(text: str, dimensions: int) -> list[float]:
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+    return vec.tolist()
+
+
+async def _inject(latency: float):
+    """Sleeps for `latency`; returns an error response when injected."""
+    if latency:
+        await asyncio.sleep(latency)
+    if STUB_CONFIG["error_rate"] and random.random() < STUB_CONFIG["error_rate"]:
+        stats["injected_errors"] += 1
+        status = STUB_CONFIG["error_status"]
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": f"Injected {status}", "type": "stub_error"}},
+            headers={"retry-after-ms": "10"},
+        )
+    return None
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    error = await _inject(STUB_CONFIG["latency"])
+    if error is not None:
+        return error
+
+    body = await request.json()
+    inputs = body["input"]
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    stats["embedding_requests"] += 1
+    stats["embedded_inputs"] += len(inputs)
+
+    dimensions = body.get("dimensions") or STUB_CONFIG["dimensions"]
+    tokens = sum(max(1, len(str(t)) // 4) for t in inputs)
+    return {
+        "object": "list",
+        "model": body.get("model", "text-embedding-3-small"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(str(t), dimensions)}
+            for i, t in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+def _prompt_text(messages: list[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = "".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(f"{message.get('role')}:{content}")
+    return "\n".join(parts)
+
+
+def _usage(messages: list[dict], completion: str) -> dict:
+    """Token usage with ~4 characters per token and emulated prefix caching."""
+    text = _prompt_text(messages)
+    prompt_tokens = max(1, len(text) // 4)
+    cached = 0
+    for tokens in range(CACHE_MIN_TOKENS, prompt_tokens + 1, CACHE_STEP_TOKENS):
+        key = hashlib.sha1(text[: tokens * 4].encode("utf-8")).hexdigest()
+        if key in _seen_prefixes:
+            cached = tokens
+        else:
+            _seen_prefixes.add(key)
+    completion_tokens = max(1, len(completion) // 4)
+    stats["prompt_tokens"] += prompt_tokens
+    stats["cached_tokens"] += cached
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached},
+    }
+
+
+async def _stream_chat(completion_id: str, model: str, body: dict):
+    words = CHAT_ANSWER.split(" ")
+    size = max(1, len(words) // max(1, STUB_CONFIG["chat_chunks"]))
+    base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    for i in range(0, len(words), size):
+        piece = " ".join(words[i:i + size]) + ("" if i + size >= len(words) else " ")
+        delta = {"content": piece} if i else {"role": "assistant", "content": piece}
+        chunk = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        if STUB_CONFIG["chunk_delay"]:
+            await asyncio.sleep(STUB_CONFIG["chunk_delay"])
+    yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+    if (body.get("stream_options") or {}).get("include_usage"):
+        usage = _usage(body["messages"], CHAT_ANSWER)
+        yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    error = await _inject(STUB_CONFIG["chat_latency"])
+    if error is not None:
+        return error
+
+    body = await request.json()
+    stats["chat_requests"] += 1
+    model = body.get("model", "gpt-4o-mini")
+    completion_id = f"chatcmpl-stub{stats['chat_requests']}"
+
+    if body.get("stream"):
+        return StreamingResponse(_stream_chat(completion_id, model, body), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": CHAT_ANSWER},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(body["messages"], CHAT_ANSWER),
+    }
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return stats
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every embeddings response")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="Seconds before a chat answer starts")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chat chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    args = parser.parse_args()
+
+    STUB_CONFIG.update(
+        latency=args.latency,
+        chat_latency=args.chat_latency,
+        chunk_delay=args.chunk_delay,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        dimensions=args.dimensions,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Chroma (HNSW) vs the memory-mapped exact index (rag/vector_index.py) for one manual.
+
+Builds both from the same synthetic, clustered vectors (no embedding calls)
+and reports per-query latency, recall@k against brute-force float32 search,
+time to open the store and answer the first query, and size on disk, for
+the float32, float16 and int8 index variants.
+
+Run from the repo root:
+    python backend/benchmarks/vector_backends.py --chunks 3000 --dim 1536 --queries 300
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag import vector_index
+from rag.vector_index import DTYPES, VectorIndex, normalize
+
+VEHICLE_KEY = "Porsche_Cayenne_Bench"
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return round(1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+
+def dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def make_data(chunks: int, dim: int, queries: int, seed: int):
+    """Chunks grouped into topics (sections), queries close to random chunks."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(1, chunks // 40), dim))
+    vectors = normalize(topics[rng.integers(len(topics), size=chunks)] + rng.normal(scale=0.6, size=(chunks, dim)))
+    picks = vectors[rng.integers(chunks, size=queries)]
+    qs = normalize(picks + rng.normal(scale=0.04, size=(queries, dim)))
+    return vectors, qs
+
+
+def timed_queries(search, queries) -> tuple[list[float], list[list[int]]]:
+    seconds, results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        results.append(search(q))
+        seconds.append(time.perf_counter() - started)
+    return seconds, results
+
+
+def recall(results: list[list[int]], truth: list[list[int]]) -> float:
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return round(hits / sum(len(t) for t in truth), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    vectors, queries = make_data(args.chunks, args.dim, args.queries, args.seed)
+    ids = [f"{VEHICLE_KEY}_{i}" for i in range(args.chunks)]
+    documents = [f"chunk {i}" for i in range(args.chunks)]
+    metadatas = [{"source": VEHICLE_KEY, "page": i} for i in range(args.chunks)]
+    truth = [list(np.argsort(-(vectors @ q))[:args.top_k]) for q in queries]
+
+    root = tempfile.mkdtemp(prefix="vector-bench-")
+    report = {"chunks": args.chunks, "dim": args.dim, "top_k": args.top_k, "backends": {}}
+    try:
+        # --- Chroma ---
+        chroma_dir = os.path.join(root, "chroma")
+        client = chromadb.PersistentClient(path=chroma_dir)
+        col = client.create_collection("porsche_manuals", embedding_function=None)
+        for start in range(0, args.chunks, 1000):
+            stop = start + 1000
+            col.add(ids=ids[start:stop], embeddings=vectors[start:stop], documents=documents[start:stop],
+                    metadatas=metadatas[start:stop])
+        del client, col
+
+        started = time.perf_counter()
+        client = chromadb.PersistentClient(path=chroma_dir)
+        col = client.get_collection("porsche_manuals")
+        col.query(query_embeddings=[queries[0]], n_results=args.top_k, where={"source": VEHICLE_KEY})
+        open_ms = 1000 * (time.perf_counter() - started)
+
+        def chroma_search(q):
+            result = col.query(query_embeddings=[q], n_results=args.top_k, where={"source": VEHICLE_KEY})
+            return [int(cid.rsplit("_", 1)[1]) for cid in result["ids"][0]]
+
+        seconds, results = timed_queries(chroma_search, queries)
+        report["backends"]["chroma"] = {
+            "p50_ms": percentile_ms(seconds, 0.5),
+            "p95_ms": percentile_ms(seconds, 0.95),
+            "recall": recall(results, truth),
+            "open_first_query_ms": round(open_ms, 1),
+            "disk_bytes": dir_bytes(chroma_dir),
+        }
+
+        # --- NumPy exact index ---
+        for dtype in DTYPES:
+            vector_index.VECTOR_INDEX_DIR = os.path.join(root, f"npy-{dtype}")
+            path = vector_index.build_index("porsche_manuals", VEHICLE_KEY, ids, vectors, dtype=dtype)
+
+            started = time.perf_counter()
+            index = VectorIndex(path)
+            index.search(queries[0], args.top_k)
+            open_ms = 1000 * (time.perf_counter() - started)
+
+            seconds, results = timed_queries(lambda q: [p for p, _ in index.search(q, args.top_k)], queries)
+            report["backends"][f"numpy_{dtype}"] = {
+                "p50_ms": percentile_ms(seconds, 0.5),
+                "p95_ms": percentile_ms(seconds, 0.95),
+                "recall": recall(results, truth),
+                "open_first_query_ms": round(open_ms, 1),
+                "disk_bytes": os.path.getsize(os.path.join(path, "vectors.npy")),
+            }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    for name, r in report["backends"].items():
+        print(
+            f"{name:>14}: p50 {r['p50_ms']:>7} ms, p95 {r['p95_ms']:>7} ms, recall@{args.top_k} {r['recall']:.4f}, "
+            f"open+first query {r['open_first_query_ms']:>7} ms, {r['disk_bytes'] / 1e6:.1f} MB",
+            file=sys.stderr,
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
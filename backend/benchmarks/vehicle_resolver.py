@@ -0,0 +1,180 @@
+"""
+Vehicle selection cost per turn for large fleet accounts.
+
+Compares the previous selector (every regex compiled, every vehicle scanned
+and every model name tokenized on each message, reproduced below as
+`linear_select`) with the precomputed `VehicleResolver` from agent.py, on
+synthetic fleets. Reports resolver build time, per-message latency for a
+cold resolver (built on the turn) and a cached one, and how many messages
+resolve to the same vehicle with both (they differ only where the resolver
+understands more: ordinals past "second", VINs and VIN tails, which it only
+tries where the previous selector asked for clarification).
+
+Run from the repo root:
+    python backend/benchmarks/vehicle_resolver.py --fleets 10,100,1000 --messages 500
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from agent import VehicleResolver
+
+MODELS = {
+    "Skoda": ["Octavia", "Kodiaq RS", "Superb Combi", "Enyaq iV 80"],
+    "Audi": ["Q7 55 TFSI", "A4 Avant", "e-tron GT", "Q3 Sportback"],
+    "MG": ["MG7", "ZS EV", "HS Plug-in Hybrid"],
+    "Porsche": ["Cayenne", "911 Carrera S", "Taycan 4S", "Macan GTS"],
+    "Volkswagen": ["Golf GTI", "ID.4 Pro", "Touareg", "Passat Variant"],
+}
+VIN_CHARS = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+TEMPLATES = [
+    "the {year} one", "my {model} has a warning light", "the {brand} please", "vehicle {id} needs service",
+    "the newer one", "the older car", "selected_vehicle_id:{id}", "the second one", "the third one",
+    "tire pressure warning on the highway", "the one with VIN {vin}", "VIN ending {vin_tail}",
+    "the {brand} from {year}", "hello", "how do I reset the oil service reminder?",
+]
+
+
+def linear_select(user_message: str, vehicles: list) -> dict:
+    """The selector before the resolver, step for step."""
+    msg = (user_message or "").strip().lower()
+    if not msg:
+        return {"needClarification": True, "options": vehicles}
+
+    def get_year_int(v):
+        try:
+            return int(v.get("year", 0))
+        except Exception:
+            return 0
+
+    m = re.search(r"selected_vehicle_id[:=\s]*([a-zA-Z0-9_]+)", msg)
+    if m:
+        for v in vehicles:
+            if str(v["vehicleId"]).lower() == m.group(1).lower():
+                return {"vehicleId": v["vehicleId"]}
+    for v in vehicles:
+        if str(v["vehicleId"]).lower() in msg:
+            return {"vehicleId": v["vehicleId"]}
+    years_in_text = re.findall(r"\b(19\d{2}|20\d{2})\b", msg)
+    if years_in_text:
+        candidates = [v for v in vehicles if get_year_int(v) == int(years_in_text[-1])]
+        if len(candidates) == 1:
+            return {"vehicleId": candidates[0]["vehicleId"]}
+    valid_years = [get_year_int(v) for v in vehicles if get_year_int(v) > 0]
+    newer_terms = ["newer", "new one", "latest", "new model", "new car", "second one", "the newer car",
+                   "the latest car", "the latest one", "more recent", "recent model"]
+    older_terms = ["older", "old one", "previous", "the older car", "first one", "the old one",
+                   "earlier model", "older model"]
+    if any(t in msg for t in newer_terms) and valid_years:
+        return {"vehicleId": next(v for v in vehicles if get_year_int(v) == max(valid_years))["vehicleId"]}
+    if any(t in msg for t in older_terms) and valid_years:
+        return {"vehicleId": next(v for v in vehicles if get_year_int(v) == min(valid_years))["vehicleId"]}
+    brand_candidates = []
+    for v in vehicles:
+        brand = str(v.get("brand") or "").lower()
+        model = str(v.get("model") or "").lower()
+        if (brand and brand in msg) or any(len(t) > 1 and t in msg for t in re.findall(r"[a-z0-9]+", model)):
+            brand_candidates.append(v)
+    if len(brand_candidates) == 1:
+        return {"vehicleId": brand_candidates[0]["vehicleId"]}
+    if len(vehicles) >= 2:
+        if "first" in msg or "1st" in msg:
+            return {"vehicleId": vehicles[0]["vehicleId"]}
+        if "second" in msg or "2nd" in msg:
+            return {"vehicleId": vehicles[1]["vehicleId"]}
+    return {"needClarification": True, "options": vehicles}
+
+
+def make_fleet(size: int, rng: random.Random) -> list[dict]:
+    fleet = []
+    for i in range(size):
+        brand = rng.choice(list(MODELS))
+        fleet.append({
+            "vehicleId": str(600000 + i * 37),
+            "brand": brand,
+            "model": rng.choice(MODELS[brand]),
+            "year": str(rng.randint(2008, 2026)) if rng.random() > 0.02 else "",
+            "vin": "".join(rng.choice(VIN_CHARS) for _ in range(17)),
+        })
+    return fleet
+
+
+def make_messages(fleet: list[dict], count: int, rng: random.Random) -> list[str]:
+    messages = []
+    for _ in range(count):
+        v = rng.choice(fleet)
+        messages.append(rng.choice(TEMPLATES).format(
+            year=v["year"] or "2020", model=v["model"], brand=v["brand"], id=v["vehicleId"], vin=v["vin"],
+            vin_tail=v["vin"][-6:],
+        ))
+    return messages
+
+
+def percentile_us(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return round(1e6 * ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+def timed(fn, messages) -> tuple[list[float], list[dict]]:
+    seconds, results = [], []
+    for message in messages:
+        started = time.perf_counter()
+        results.append(fn(message))
+        seconds.append(time.perf_counter() - started)
+    return seconds, results
+
+
+def run_fleet(size: int, messages: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    fleet = make_fleet(size, rng)
+    plan = make_messages(fleet, messages, rng)
+
+    started = time.perf_counter()
+    resolver = VehicleResolver(fleet)
+    build_ms = 1000 * (time.perf_counter() - started)
+
+    linear_s, linear_results = timed(lambda m: linear_select(m, fleet), plan)
+    cold_s, _ = timed(lambda m: VehicleResolver(fleet).resolve(m), plan[: max(1, messages // 10)])
+    cached_s, cached_results = timed(resolver.resolve, plan)
+
+    agree = sum(a.get("vehicleId") == b.get("vehicleId") for a, b in zip(linear_results, cached_results))
+    return {
+        "vehicles": size,
+        "build_ms": round(build_ms, 2),
+        "linear_us": {"p50": percentile_us(linear_s, 0.5), "p95": percentile_us(linear_s, 0.95)},
+        "cold_resolver_us": {"p50": percentile_us(cold_s, 0.5), "p95": percentile_us(cold_s, 0.95)},
+        "cached_resolver_us": {"p50": percentile_us(cached_s, 0.5), "p95": percentile_us(cached_s, 0.95)},
+        "same_vehicle": agree,
+        "messages": len(plan),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleets", default="10,100,1000", help="Comma-separated fleet sizes")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.fleets.split(",") if s):
+        r = run_fleet(size, args.messages, args.seed)
+        print(
+            f"{size:>5} vehicles: build {r['build_ms']:>7} ms, "
+            f"linear p50 {r['linear_us']['p50']:>8} us, "
+            f"cold resolver p50 {r['cold_resolver_us']['p50']:>8} us, "
+            f"cached resolver p50 {r['cached_resolver_us']['p50']:>6} us, "
+            f"same vehicle {r['same_vehicle']}/{r['messages']}",
+            file=sys.stderr,
+        )
+        results.append(r)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from typing import Optional
+
+import httpx
+
+from utils.metrics import span
+from utils.ttl_cache import AsyncTTLCache
+
+# ------------------------------------------------------------------------------------
+# CONFIG
+# ------------------------------------------------------------------------------------
+HTTP_TIMEOUT_SECONDS = float(os.getenv("CUSTOMER_API_TIMEOUT", "15"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("CUSTOMER_API_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("CUSTOMER_API_MAX_KEEPALIVE", "20"))
+
+# Used when the login response carries no usable expiry (non-JWT token).
+DEFAULT_TOKEN_TTL_SECONDS = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", "900"))
+# Tokens are treated as stale this many seconds before they really expire.
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("AUTH_TOKEN_REFRESH_MARGIN", "60"))
+
+# Customer vehicle records rarely change mid-conversation.
+VEHICLE_CACHE_TTL_SECONDS = float(os.getenv("VEHICLE_CACHE_TTL_SECONDS", "300"))
+VEHICLE_CACHE_STALE_SECONDS = float(os.getenv("VEHICLE_CACHE_STALE_SECONDS", "1800"))
+VEHICLE_CACHE_MAX_ENTRIES = int(os.getenv("VEHICLE_CACHE_MAX_ENTRIES", "5000"))
+
+
+def get_api_base() -> str:
+    api_base = os.getenv("CUSTOMER_API_BASE")
+    if not api_base:
+        raise RuntimeError("CUSTOMER_API_BASE is not set")
+    return api_base.rstrip("/")
+
+
+def auth_url() -> str:
+    return f"{get_api_base()}/api/auth/login"
+
+
+def customer_url() -> str:
+    return f"{get_api_base()}/api/Quantum/customervehicles"
+
+
+def _clean(val) -> str:
+    return str(val).strip().replace('"', '').replace("'", "")
+
+
+def _token_expiry(token: str, login_data: dict, now: float) -> float:
+    """
+    Works out when a token expires.
+    Prefers the JWT `exp` claim, then an `expiresIn` field, then the default TTL.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        if claims.get("exp"):
+            return float(claims["exp"])
+    except Exception:
+        pass
+
+    expires_in = login_data.get("expiresIn") or login_data.get("expires_in")
+    try:
+        if expires_in:
+            return now + float(expires_in)
+    except (TypeError, ValueError):
+        pass
+
+    return now + DEFAULT_TOKEN_TTL_SECONDS
+
+
+# ------------------------------------------------------------------------------------
+# TOKEN MANAGER
+# ------------------------------------------------------------------------------------
+class TokenManager:
+    """
+    Caches the Quantum `accessToken` until shortly before it expires.
+
+    - Fresh token       -> returned straight from memory.
+    - Inside the margin -> current token returned, one background refresh started.
+    - Expired / missing -> callers wait on a single login (single-flight).
+    """
+
+    def __init__(self, http: httpx.AsyncClient, refresh_margin: int = TOKEN_REFRESH_MARGIN_SECONDS):
+        self._http = http
+        self._refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+        self.logins = 0
+
+    def _is_fresh(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at - self._refresh_margin
+
+    def _is_usable(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at
+
+    async def get_token(self) -> str:
+        now = time.time()
+        if self._is_fresh(now):
+            return self._token
+
+        if self._is_usable(now):
+            if self._background is None or self._background.done():
+                self._background = asyncio.create_task(self._refresh_quietly())
+            return self._token
+
+        return await self._refresh()
+
+    def invalidate(self, token: str):
+        """Drops `token` if it is still the cached one (e.g. after a 401)."""
+        if self._token == token:
+            self._token = None
+            self._expires_at = 0.0
+
+    async def _refresh(self) -> str:
+        async with self._lock:
+            # Another caller may have logged in while we waited for the lock.
+            if self._is_fresh(time.time()):
+                return self._token
+
+            payload = {
+                "strDomain": _clean(os.getenv("AUTH_DOMAIN")),
+                "strUsername": _clean(os.getenv("AUTH_USER")),
+                "strPassword": _clean(os.getenv("AUTH_PASS")),
+            }
+            r = await self._http.post(auth_url(), json=payload)
+            r.raise_for_status()
+            data = r.json()
+
+            self.logins += 1
+            self._token = data["accessToken"]
+            self._expires_at = _token_expiry(self._token, data, time.time())
+            return self._token
+
+    async def _refresh_quietly(self):
+        try:
+            await self._refresh()
+        except Exception as e:
+            # The current token is still valid; the next caller will retry.
+            print(f"⚠️ Background token refresh failed: {e}")
+
+    async def close(self):
+        if self._background and not self._background.done():
+            self._background.cancel()
+
+
+# ------------------------------------------------------------------------------------
+# SHARED CLIENT (created at app startup, closed at shutdown)
+# ------------------------------------------------------------------------------------
+_http_client: Optional[httpx.AsyncClient] = None
+_token_manager: Optional[TokenManager] = None
+
+
+async def start_client():
+    global _http_client, _token_manager
+    if _http_client is not None:
+        return
+
+    _http_client = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT_SECONDS,
+        verify=False,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        ),
+    )
+    _token_manager = TokenManager(_http_client)
+
+
+async def close_client():
+    global _http_client, _token_manager
+    if _token_manager is not None:
+        await _token_manager.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _token_manager = None
+
+
+async def _get_client() -> tuple[httpx.AsyncClient, TokenManager]:
+    # Scripts that never run the app lifespan still get a working client.
+    if _http_client is None:
+        await start_client()
+    return _http_client, _token_manager
+
+
+# ------------------------------------------------------------------------------------
+# CUSTOMER DATA
+# ------------------------------------------------------------------------------------
+def parse_customer_vehicles(data: dict) -> dict:
+    vehicles = []
+    for idx, v in enumerate(data.get("vehicles", [])):
+        raw_year = v.get("Vehicle_Model_Year", "")
+        if raw_year and str(raw_year).strip().lower() != "null":
+            year_val = str(raw_year).strip()
+        else:
+            year_val = ""
+
+        vehicles.append({
+            "vehicleId": v.get("Vehicle_ID") or f"TMP_{idx}",
+            "brand": v.get("Vehicle_Brand", ""),
+            "model": v.get("Vehicle_Model_Description", ""),
+            "year": year_val,
+            "vin": v.get("Vehicle_Chassis_Number", "")
+        })
+
+    return {
+        "customerId": data.get("customerId"),
+        "customerName": data.get("customerName"),
+        "vehicles": vehicles
+    }
+
+
+vehicle_cache = AsyncTTLCache(
+    ttl=VEHICLE_CACHE_TTL_SECONDS,
+    stale_ttl=VEHICLE_CACHE_STALE_SECONDS,
+    max_entries=VEHICLE_CACHE_MAX_ENTRIES,
+    name="customer_vehicles",
+)
+
+
+async def get_customer_data(customerId: str, use_cache: bool = True):
+    """
+    Returns {"customerId", "customerName", "vehicles"} for a customer.
+    Served from `vehicle_cache` (keyed by the zero-filled ID) when possible.
+    """
+    customerId = customerId.zfill(10)
+    if not use_cache:
+        data = await fetch_customer_data(customerId)
+        vehicle_cache.set(customerId, data)
+        return data
+
+    return await vehicle_cache.get_or_load(customerId, lambda: fetch_customer_data(customerId))
+
+
+async def fetch_customer_data(customerId: str):
+    http, tokens = await _get_client()
+    params = {"customerId": customerId.zfill(10)}
+
+    with span("auth"):
+        token = await tokens.get_token()
+    with span("customer_api"):
+        r = await http.get(customer_url(), headers={"Authorization": f"Bearer {token}"}, params=params)
+
+    # Token revoked or expired early upstream: log in again and retry once.
+    if r.status_code == 401:
+        tokens.invalidate(token)
+        token = await tokens.get_token()
+        r = await http.get(customer_url(), headers={"Authorization": f"Bearer {token}"}, params=params)
+
+    r.raise_for_status()
+    return parse_customer_vehicles(r.json())
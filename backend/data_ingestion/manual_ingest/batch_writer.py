@@ -0,0 +1,173 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rag.embedding_provider import count_embedding_tokens, embedding_limits
+
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "50000"))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+EMBED_BATCH_CONCURRENCY = int(os.getenv("EMBED_BATCH_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    # Connection resets / timeouts from the HTTP layer carry no status.
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def make_batches(items: list[dict], max_tokens: int, max_items: int) -> list[list[dict]]:
+    """
+    Greedy split into batches below `max_tokens` and `max_items`.
+    A single oversized item still gets a batch of its own.
+    """
+    batches, current, current_tokens = [], [], 0
+    for item in items:
+        if current and (current_tokens + item["tokens"] > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += item["tokens"]
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchedWriter:
+    """
+    Embeds and upserts chunks into a Chroma collection in token-bounded batches.
+
+    - Tokens are counted with the configured embedding model's tokenizer;
+      batches stay under both `max_batch_tokens` and the provider's request
+      limit, and chunks over its per-input limit are counted as `truncated`.
+    - Batches run `concurrency` at a time.
+    - 429 / 5xx / connection errors are retried with exponential backoff and jitter.
+    - Committed chunk IDs go to a checkpoint file, so a crashed run resumes
+      from the last committed batch instead of starting over.
+
+    The embedding function honours OPENAI_BASE_URL, so it can be pointed at a
+    local stub server (benchmarks/stub_openai.py).
+    """
+
+    def __init__(
+        self,
+        collection,
+        embedding_function,
+        max_batch_tokens: int = EMBED_BATCH_MAX_TOKENS,
+        max_batch_items: int = EMBED_BATCH_MAX_ITEMS,
+        concurrency: int = EMBED_BATCH_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        checkpoint_path: str | None = None,
+        count_tokens=count_embedding_tokens,
+        limits: dict | None = None,
+    ):
+        limits = limits or embedding_limits()
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.count_tokens = count_tokens
+        self.max_input_tokens = limits["max_input_tokens"]
+        if limits["max_batch_tokens"]:
+            max_batch_tokens = min(max_batch_tokens, limits["max_batch_tokens"])
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.checkpoint_path = checkpoint_path
+        self._lock = threading.Lock()
+        self._committed: set[str] = self._load_checkpoint()
+        self.stats = {
+            "chunks": 0, "tokens": 0, "batches": 0, "retries": 0, "resumed": 0, "truncated": 0, "seconds": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # CHECKPOINT
+    # ------------------------------------------------------------------
+    def _load_checkpoint(self) -> set[str]:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return set(json.load(f))
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sorted(self._committed), f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # ------------------------------------------------------------------
+    # WRITE
+    # ------------------------------------------------------------------
+    def _embed_with_retry(self, documents: list[str]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embedding_function(documents)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                with self._lock:
+                    self.stats["retries"] += 1
+                print(f"   ⏳ Embedding batch failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _write_batch(self, batch: list[dict]):
+        embeddings = self._embed_with_retry([item["document"] for item in batch])
+        self.collection.upsert(
+            ids=[item["id"] for item in batch],
+            embeddings=embeddings,
+            documents=[item["document"] for item in batch],
+            metadatas=[item["metadata"] for item in batch],
+        )
+        with self._lock:
+            self._committed.update(item["id"] for item in batch)
+            self.stats["batches"] += 1
+            self.stats["chunks"] += len(batch)
+            self.stats["tokens"] += sum(item["tokens"] for item in batch)
+            self._save_checkpoint()
+
+    def write(self, ids: list[str], documents: list[str], metadatas: list[dict]) -> dict:
+        start = time.perf_counter()
+
+        items = []
+        for cid, doc, meta in zip(ids, documents, metadatas):
+            if cid in self._committed:
+                self.stats["resumed"] += 1
+                continue
+            tokens = self.count_tokens(doc)
+            if tokens > self.max_input_tokens:
+                self.stats["truncated"] += 1
+            items.append({"id": cid, "document": doc, "metadata": meta, "tokens": tokens})
+        if self.stats["truncated"]:
+            print(
+                f"   ⚠️ {self.stats['truncated']} chunks exceed the embedding model's {self.max_input_tokens}-token "
+                "input limit and will be truncated; lower CHUNK_MAX_TOKENS"
+            )
+
+        batches = make_batches(items, self.max_batch_tokens, self.max_batch_items)
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as pool:
+                # list() re-raises the first failed batch; committed ones stay checkpointed.
+                list(pool.map(self._write_batch, batches))
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = round(elapsed, 3)
+        self.stats["chunks_per_s"] = round(self.stats["chunks"] / elapsed, 1) if elapsed else 0.0
+        self.stats["tokens_per_s"] = round(self.stats["tokens"] / elapsed, 1) if elapsed else 0.0
+        return self.stats
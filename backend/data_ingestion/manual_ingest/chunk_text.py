@@ -13,3 +13,31 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50):
         start = end - overlap
 
     return chunks
+
+
+def chunk_pages(pages: list[tuple[int, str]], chunk_size: int = 500, overlap: int = 50):
+    """
+    Same windows as `chunk_text` over the concatenated pages, but each chunk
+    also records the pages it spans:
+        [{"text": ..., "page": first_page, "page_end": last_page}, ...]
+    """
+    words = []
+    word_pages = []
+    for page_number, text in pages:
+        page_words = text.split()
+        words.extend(page_words)
+        word_pages.extend([page_number] * len(page_words))
+
+    chunks = []
+    start = 0
+
+    while start < len(words):
+        end = min(start + chunk_size, len(words))
+        chunks.append({
+            "text": " ".join(words[start:end]),
+            "page": word_pages[start],
+            "page_end": word_pages[end - 1],
+        })
+        start = start + chunk_size - overlap
+
+    return chunks
@@ -1,44 +1,119 @@
 import fitz  # PyMuPDF
 
+OCR_DPI = 200
+
+
+def page_text(page) -> str:
+    """
+    Text of one page. Falls back to OCR only when the page has no text layer;
+    the page is rendered (at OCR_DPI) only in that case.
+    """
+    text = page.get_text("text")
+    if text.strip():
+        return text
+
+    text = page.get_text("text", flags=fitz.TEXTFLAGS_TEXT)
+    if text.strip():
+        return text
+
+    try:
+        textpage = page.get_textpage_ocr(dpi=OCR_DPI, full=True)
+        return page.get_text("text", textpage=textpage)
+    except Exception:
+        # Tesseract not installed / no OCR language data
+        return ""
+
+
+def iter_pdf_pages(pdf_path: str, start: int = 0, stop: int | None = None):
+    """
+    Yields (page_number, text) for pages [start, stop), 1-based page numbers.
+    One page is held in memory at a time, so large manuals stay flat.
+    """
+    with fitz.open(pdf_path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for index in range(start, stop):
+            yield index + 1, page_text(doc[index])
+
+
+def select_pages(pages: list[tuple[int, str]]) -> list[tuple[int, str]]:
+    """
+    Skips near-empty pages (covers, blank pages) unless that would leave
+    almost nothing, e.g. for scanned manuals.
+    """
+    selected = [(n, t) for n, t in pages if t and len(t.strip()) > 50]
+    if sum(len(t.strip()) for _, t in selected) > 100:
+        return selected
+    return [(n, t) for n, t in pages if t]
+
+
 def pdf_to_text(pdf_path: str) -> str:
     """
     Extracts text from a PDF.
     If no meaningful text is found, automatically performs OCR on each page.
     """
+    pages = select_pages(list(iter_pdf_pages(pdf_path)))
+    return "".join(text + "\n" for _, text in pages)
+
+
+def page_lines(page) -> list[dict]:
+    """
+    Text lines of a page with the font details the structured chunker needs:
+        {"text", "size", "bold", "bullet", "x0", "y0", "y1"}
+    `bullet` marks lines that start with a one/two-character span in a font
+    other than the page's body font (icon fonts used for step markers).
+    Pages without a text layer come back as plain OCR lines with size 0.
+    """
+    raw = []
+    font_chars: dict[str, int] = {}
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:
+            continue
+        for line in block["lines"]:
+            spans = [sp for sp in line["spans"] if sp["text"].strip()]
+            if not spans:
+                continue
+            raw.append((line, spans))
+            for sp in spans:
+                font_chars[sp["font"]] = font_chars.get(sp["font"], 0) + len(sp["text"].strip())
+
+    if not raw:
+        return [
+            {"text": t.strip(), "size": 0.0, "bold": False, "bullet": False, "x0": 0.0, "y0": float(i), "y1": float(i)}
+            for i, t in enumerate(page_text(page).splitlines()) if t.strip()
+        ]
+
+    body_font = max(font_chars, key=font_chars.get)
+    lines = []
+    for line, spans in raw:
+        first = spans[0]
+        bullet = len(first["text"].strip()) <= 2 and first["font"] != body_font and len(spans) > 1
+        text_spans = spans[1:] if bullet else spans
+        lines.append({
+            "text": " ".join(sp["text"].strip() for sp in text_spans),
+            "size": max(sp["size"] for sp in text_spans),
+            "bold": all(sp["flags"] & 16 for sp in text_spans),
+            "bullet": bullet,
+            "x0": line["bbox"][0],
+            "y0": line["bbox"][1],
+            "y1": line["bbox"][3],
+        })
+    return lines
 
-    doc = fitz.open(pdf_path)
-    full_text = ""
-
-    # Pass 1 — normal extraction
-    for page in doc:
-        text = page.get_text("text")
-        if text and len(text.strip()) > 50:
-            full_text += text + "\n"
-    
-    # If normal extraction worked, return it
-    if len(full_text.strip()) > 100:
-        doc.close()
-        return full_text
-
-    # Otherwise: PASS 2 — perform OCR
-    print(f"🔄 OCR mode activated for: {pdf_path}")
-
-    ocr_text = ""
-    for page in doc:
-        text = page.get_text("text", flags=fitz.TEXTFLAGS_TEXT)
-        if text:
-            ocr_text += text + "\n"
-
-        # If still no text, fallback: convert to image + OCR
-        if not text.strip():
-            pix = page.get_pixmap(dpi=200)
-            img_bytes = pix.tobytes("png")
-            try:
-                # PyMuPDF now supports OCR via page.get_text("ocr")
-                ocr_page = page.get_text("ocr")
-                ocr_text += ocr_page + "\n"
-            except:
-                ocr_text += ""
-
-    doc.close()
-    return ocr_text
+
+def extract_line_range(pdf_path: str, start: int, stop: int) -> list[tuple[int, list[dict]]]:
+    """(page_number, page_lines) for pages [start, stop); runs in worker processes."""
+    with fitz.open(pdf_path) as doc:
+        return [(index + 1, page_lines(doc[index])) for index in range(start, min(stop, doc.page_count))]
+
+
+def page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> list[tuple[int, str]]:
+    """
+    Extracts pages [start, stop) as (page_number, text) pairs, 1-based.
+    Runs in worker processes, so each call opens its own document.
+    """
+    return list(iter_pdf_pages(pdf_path, start, stop))
@@ -1,42 +1,156 @@
 import chromadb
-from chromadb.utils import embedding_functions
+import hashlib
+import json
 import os
+import sys
+
+# Make the backend packages (rag/...) importable when run as a script.
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from rag.bm25_index import build_index
+from rag.index_files import write_chunks
+from rag import vector_index
+from rag.vector_collections import collection_metadata, physical_collection, source_filter
+from rag.embedding_provider import ensure_collection_model, make_embedding_function, model_id
+from batch_writer import BatchedWriter
 
 # Where to store the Chroma database on disk
 DB_DIR = os.path.join("backend", "vector_db")
 os.makedirs(DB_DIR, exist_ok=True)
+CHECKPOINT_DIR = os.path.join(DB_DIR, "ingest_checkpoints")
 
 # Use a persistent client so data is saved between runs
 client = chromadb.PersistentClient(path=DB_DIR)
 
-# OpenAI embedding function
-embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    model_name="text-embedding-3-small",
-)
+# Configured embedding provider (EMBEDDING_PROVIDER), behind the shared
+# embedding cache so re-ingesting unchanged chunks does not embed them again.
+embedding_function = make_embedding_function()
 
-def get_or_create_collection(name: str):
+def get_or_create_collection(name: str, metadata: dict | None = None):
     """
-    Get or create a collection for a brand's manuals.
+    Get or create a collection for a brand's manuals (or, with
+    VECTOR_STORE_LAYOUT=manual, for one manual).
+    Raises EmbeddingModelMismatch if it was built with another embedding model.
     """
-    return client.get_or_create_collection(
+    col = client.get_or_create_collection(
         name=name,
         embedding_function=embedding_function,
+        metadata={**(metadata or {}), "embedding_model": model_id()},
+    )
+    ensure_collection_model(col, model_id())
+    return col
+
+def chunk_hash(text: str, meta: dict | None = None) -> str:
+    # Metadata (e.g. page numbers) is hashed too, so a metadata change re-upserts the chunk.
+    payload = text if not meta else text + "\x00" + json.dumps(meta, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_ids(vehicle_key: str, hashes: list[str]) -> list[str]:
+    """
+    Content-addressed chunk IDs: an unchanged chunk keeps its ID even when
+    text before it moves. Repeated identical chunks get a running suffix.
+    """
+    seen: dict[str, int] = {}
+    ids = []
+    for h in hashes:
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        ids.append(f"{vehicle_key}_{h[:16]}" + (f"-{n}" if n else ""))
+    return ids
+
+
+def existing_chunk_ids(collection_name: str, vehicle_key: str) -> set[str]:
+    try:
+        col = client.get_collection(
+            name=physical_collection(collection_name, vehicle_key), embedding_function=embedding_function
+        )
+    except Exception:
+        return set()
+    return set(col.get(where=source_filter(vehicle_key), include=[])["ids"])
+
+
+def plan_chunk_sync(
+    collection_name: str,
+    vehicle_key: str,
+    chunks: list[str],
+    known_ids: set[str] | None = None,
+    chunk_meta: list[dict] | None = None,
+):
+    """
+    Works out what has to change in the store for `chunks`.
+    `known_ids` (from the manifest) avoids reading the store; without it the
+    collection is asked which chunks it holds for this manual.
+    """
+    chunk_meta = chunk_meta or [None] * len(chunks)
+    hashes = [chunk_hash(c, m) for c, m in zip(chunks, chunk_meta)]
+    ids = chunk_ids(vehicle_key, hashes)
+    if known_ids is None:
+        known_ids = existing_chunk_ids(collection_name, vehicle_key)
+
+    new_ids = set(ids)
+    return {
+        "ids": ids,
+        "hashes": hashes,
+        "upsert": [i for i, cid in enumerate(ids) if cid not in known_ids],
+        "delete": sorted(known_ids - new_ids),
+    }
+
+
+def checkpoint_path(collection_name: str, vehicle_key: str) -> str:
+    safe_key = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in vehicle_key)
+    return os.path.join(CHECKPOINT_DIR, f"{collection_name}__{safe_key}.json")
+
+
+def apply_chunk_sync(
+    collection_name: str,
+    vehicle_key: str,
+    chunks: list[str],
+    plan: dict,
+    chunk_meta: list[dict] | None = None,
+) -> dict:
+    """
+    Applies a sync plan: new chunks go through the batched writer (token-bounded,
+    retried, checkpointed), then orphaned chunks are deleted and the manual's
+    BM25 index (and, with VECTOR_BACKEND=numpy, the exact vector index) is
+    rebuilt from the full chunk list.
+    `chunk_meta` adds per-chunk metadata such as page numbers.
+    Returns the writer's throughput stats.
+    """
+    chunk_meta = chunk_meta or [{}] * len(chunks)
+    metadatas = [
+        {**(chunk_meta[i] or {}), "source": vehicle_key, "chunk_hash": plan["hashes"][i]} for i in range(len(chunks))
+    ]
+    col = get_or_create_collection(
+        physical_collection(collection_name, vehicle_key), collection_metadata(collection_name, vehicle_key)
     )
+    writer = BatchedWriter(col, embedding_function, checkpoint_path=checkpoint_path(collection_name, vehicle_key))
+
+    stats = writer.write(
+        ids=[plan["ids"][i] for i in plan["upsert"]],
+        documents=[chunks[i] for i in plan["upsert"]],
+        metadatas=[metadatas[i] for i in plan["upsert"]],
+    )
+    if plan["delete"]:
+        col.delete(ids=plan["delete"])
+
+    writer.clear_checkpoint()
+    write_chunks(collection_name, vehicle_key, plan["ids"], chunks, metadatas)
+    build_index(collection_name, vehicle_key, plan["ids"], chunks)
+    if vector_index.VECTOR_BACKEND == "numpy":
+        vector_index.export_manual(col, collection_name, vehicle_key, ids=plan["ids"], model=model_id())
+    return stats
+
 
 def add_chunks_to_db(collection_name: str, vehicle_key: str, chunks: list[str]):
     """
     Store chunks for a specific vehicle model into ChromaDB.
     - collection_name: e.g. 'porsche_manuals'
     - vehicle_key: e.g. 'Porsche_911_QSG_MY2023'
+    Idempotent: unchanged chunks are skipped and orphaned ones removed.
     """
-    col = get_or_create_collection(collection_name)
-
-    ids = [f"{vehicle_key}_{i}" for i in range(len(chunks))]
-    metadatas = [{"source": vehicle_key} for _ in chunks]
-
-    col.add(
-        ids=ids,
-        metadatas=metadatas,
-        documents=chunks,
-    )
+    plan = plan_chunk_sync(collection_name, vehicle_key, chunks)
+    apply_chunk_sync(collection_name, vehicle_key, chunks, plan)
+    return plan
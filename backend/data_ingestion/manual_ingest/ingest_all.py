@@ -1,61 +1,69 @@
+import argparse
+import asyncio
+import json
 import os
-from convert_pdf import pdf_to_text
-from chunk_text import chunk_text
-from embed_store import add_chunks_to_db
+import time
+from pipeline import CHUNKERS, IngestPipeline, discover_manuals, print_report
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 MANUAL_ROOT = os.path.join(PROJECT_ROOT, "manuals", "ali-and-sons")
 
 
-def ingest_all_manuals():
+def ingest_all_manuals(
+    workers: int | None = None,
+    embed_concurrency: int = 2,
+    report_path: str | None = None,
+    dry_run: bool = False,
+    force: bool = False,
+    chunker: str = "structured",
+):
     print("📘 Starting ingestion of manuals...\n")
 
     if not os.path.exists(MANUAL_ROOT):
         print(f"❌ Manuals folder not found: {MANUAL_ROOT}")
         return
 
-    for brand in os.listdir(MANUAL_ROOT):
-        brand_folder = os.path.join(MANUAL_ROOT, brand)
-        if not os.path.isdir(brand_folder):
-            continue
+    manuals = discover_manuals(MANUAL_ROOT)
+    workers = workers or os.cpu_count() or 1
+    print(f"🔍 {len(manuals)} manuals, {workers} extraction workers, {embed_concurrency} embedding workers\n")
 
-        print(f"\n🔍 Brand: {brand}")
+    start = time.perf_counter()
+    pipeline = IngestPipeline(
+        workers=workers, embed_concurrency=embed_concurrency, dry_run=dry_run, force=force, chunker=chunker
+    )
+    report = asyncio.run(pipeline.run(manuals))
+    elapsed = time.perf_counter() - start
 
-        for filename in os.listdir(brand_folder):
-            if not filename.lower().endswith(".pdf"):
-                continue
+    print_report(report, elapsed)
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump({"elapsed_s": round(elapsed, 3), "manuals": report}, f, indent=2)
+        print(f"📝 Timing report written to {report_path}")
 
-            pdf_path = os.path.join(brand_folder, filename)
-            vehicle_key = filename.replace(".pdf", "")
-            collection_name = f"{brand.lower()}_manuals"
-
-            print(f"   📄 Ingesting: {filename}")
-
-            try:
-                # Extract including OCR if needed
-                text = pdf_to_text(pdf_path)
-
-                if not text or len(text.strip()) < 50:
-                    raise Exception("❌ PDF contains no readable text — even after OCR")
-
-                # Chunk safely
-                chunks = chunk_text(text, chunk_size=500, overlap=50)
-
-                if not chunks:
-                    raise Exception("❌ No chunks produced from PDF text")
-
-                add_chunks_to_db(collection_name, vehicle_key, chunks)
-
-                print(f"   ✅ Done: {filename} — added {len(chunks)} chunks to `{collection_name}`")
-
-            except Exception as e:
-                print(f"   ❌ Error processing {filename}: {e}")
-
-    print("\n🎉 Ingestion completed with text + OCR support!")
+    if dry_run:
+        print("\n🧪 Dry run: nothing was written.")
+    else:
+        print("\n🎉 Ingestion completed with text + OCR support!")
 
 
 # ---------------------------------------------------------
 # AUTO-RUN WHEN EXECUTED DIRECTLY
 # ---------------------------------------------------------
 if __name__ == "__main__":
-    ingest_all_manuals()
+    parser = argparse.ArgumentParser(description="Ingest all manuals into the vector DB.")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes (default: CPU count)")
+    parser.add_argument("--embed-concurrency", type=int, default=2, help="Manuals embedded/upserted at once")
+    parser.add_argument("--report", default=None, help="Write the per-manual timing report as JSON")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and re-check every manual")
+    parser.add_argument("--chunker", choices=CHUNKERS, default="structured", help="Chunking strategy")
+    args = parser.parse_args()
+
+    ingest_all_manuals(
+        workers=args.workers,
+        embed_concurrency=args.embed_concurrency,
+        report_path=args.report,
+        dry_run=args.dry_run,
+        force=args.force,
+        chunker=args.chunker,
+    )
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import time
+
+from embed_store import DB_DIR
+
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join(DB_DIR, "ingest_manifest.json"))
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    """
+    Records, per manual, what is in the vector DB:
+
+        "<collection>/<vehicle_key>": {
+            "file_sha256": ..., "chunker": {...},
+            "chunks": {chunk_id: chunk_sha256}, "ingested_at": ...
+        }
+
+    A manual whose file hash and chunker parameters match is skipped entirely.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("manuals", {})
+
+    @staticmethod
+    def key(collection_name: str, vehicle_key: str) -> str:
+        return f"{collection_name}/{vehicle_key}"
+
+    def get(self, collection_name: str, vehicle_key: str) -> dict | None:
+        return self.entries.get(self.key(collection_name, vehicle_key))
+
+    def is_unchanged(self, collection_name: str, vehicle_key: str, file_hash: str, chunker: dict) -> bool:
+        entry = self.get(collection_name, vehicle_key)
+        return bool(entry) and entry["file_sha256"] == file_hash and entry["chunker"] == chunker
+
+    def known_chunk_ids(self, collection_name: str, vehicle_key: str) -> set[str] | None:
+        entry = self.get(collection_name, vehicle_key)
+        return set(entry["chunks"]) if entry else None
+
+    def record(self, collection_name: str, vehicle_key: str, file_hash: str, chunker: dict, plan: dict):
+        self.entries[self.key(collection_name, vehicle_key)] = {
+            "file_sha256": file_hash,
+            "chunker": chunker,
+            "chunks": dict(zip(plan["ids"], plan["hashes"])),
+            "ingested_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
+    def save(self):
+        # Written after every manual; the rename keeps a crash from truncating it.
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "manuals": self.entries}, f, indent=1)
+        os.replace(tmp, self.path)
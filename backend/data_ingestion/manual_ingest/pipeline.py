@@ -0,0 +1,272 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from convert_pdf import extract_line_range, extract_page_range, page_count, select_pages
+from chunk_text import chunk_pages
+from structured_chunker import CHUNK_MAX_TOKENS, chunk_structured
+from embed_store import apply_chunk_sync, plan_chunk_sync
+from rag.bm25_index import has_index
+from rag import vector_index
+from manifest import Manifest, file_sha256
+
+# Pages handed to one extraction task.
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+_DONE = object()
+CHUNKERS = ("structured", "words")
+
+
+def make_chunks(chunker: str, pages: list, chunk_size: int, overlap: int, max_tokens: int) -> list[dict]:
+    """
+    Runs the selected chunker on extracted pages.
+    "words":      (page, text) pages -> 500-word windows (legacy)
+    "structured": (page, lines) pages -> section-aware, token-budgeted chunks
+    """
+    if chunker == "words":
+        return chunk_pages(select_pages(pages), chunk_size, overlap)
+
+    page_texts = [(n, "\n".join(line["text"] for line in lines)) for n, lines in pages]
+    keep = {n for n, _ in select_pages(page_texts)}
+    return chunk_structured([(n, lines) for n, lines in pages if n in keep], max_tokens)
+
+
+def discover_manuals(manual_root: str) -> list[dict]:
+    manuals = []
+    for brand in sorted(os.listdir(manual_root)):
+        brand_folder = os.path.join(manual_root, brand)
+        if not os.path.isdir(brand_folder):
+            continue
+        for filename in sorted(os.listdir(brand_folder)):
+            if not filename.lower().endswith(".pdf"):
+                continue
+            manuals.append({
+                "brand": brand,
+                "filename": filename,
+                "pdf_path": os.path.join(brand_folder, filename),
+                "vehicle_key": filename.replace(".pdf", ""),
+                "collection_name": f"{brand.lower()}_manuals",
+            })
+    return manuals
+
+
+class IngestPipeline:
+    """
+    Three-stage ingester:
+
+        extract (process pool, page ranges)  ->  chunk  ->  embed + upsert (bounded)
+
+    Bounded queues between the stages apply backpressure, so a slow embedding
+    stage pauses extraction instead of piling up page text in memory.
+
+    Re-runs are incremental: manuals whose file hash and chunker parameters
+    match the manifest are skipped, and for the rest only new chunks are
+    upserted and orphaned ones deleted. `dry_run` reports without writing.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        embed_concurrency: int = 2,
+        chunker: str = "structured",
+        chunk_size: int = 500,
+        overlap: int = 50,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        manifest: Manifest | None = None,
+        dry_run: bool = False,
+        force: bool = False,
+    ):
+        self.workers = max(1, workers)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.max_tokens = max_tokens
+        self.chunker_name = chunker
+        if chunker == "words":
+            self.chunker = {"name": "word_window_pages", "chunk_size": chunk_size, "overlap": overlap}
+        else:
+            self.chunker = {"name": "structured", "max_tokens": max_tokens}
+        self.manifest = manifest if manifest is not None else Manifest()
+        self.dry_run = dry_run
+        self.force = force
+        self.report: list[dict] = []
+
+    async def run(self, manuals: list[dict]) -> list[dict]:
+        extracted_q: asyncio.Queue = asyncio.Queue(maxsize=self.workers)
+        chunked_q: asyncio.Queue = asyncio.Queue(maxsize=self.embed_concurrency * 2)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            await asyncio.gather(
+                self._extract_stage(pool, manuals, extracted_q),
+                self._chunk_stage(extracted_q, chunked_q),
+                *(self._embed_stage(chunked_q) for _ in range(self.embed_concurrency)),
+            )
+        return self.report
+
+    # ------------------------------------------------------------------
+    # STAGES
+    # ------------------------------------------------------------------
+    async def _extract_stage(self, pool, manuals, out_q):
+        loop = asyncio.get_running_loop()
+        extract_fn = extract_page_range if self.chunker_name == "words" else extract_line_range
+        # Keep at most `workers` manuals in flight so every process stays busy.
+        in_flight = asyncio.Semaphore(self.workers)
+
+        async def extract(manual):
+            async with in_flight:
+                job = {**manual, "timings": {}, "started": time.perf_counter()}
+                t0 = time.perf_counter()
+                try:
+                    job["file_sha256"] = await asyncio.to_thread(file_sha256, manual["pdf_path"])
+                    if not self.force and self.manifest.is_unchanged(
+                        manual["collection_name"], manual["vehicle_key"], job["file_sha256"], self.chunker
+                    ) and has_index(manual["collection_name"], manual["vehicle_key"]) and (
+                        vector_index.VECTOR_BACKEND != "numpy"
+                        or vector_index.has_index(manual["collection_name"], manual["vehicle_key"])
+                    ):
+                        job["status"] = "unchanged"
+                        self._record(job)
+                        return
+
+                    total = await loop.run_in_executor(pool, page_count, manual["pdf_path"])
+                    ranges = [(s, min(s + PAGES_PER_TASK, total)) for s in range(0, total, PAGES_PER_TASK)]
+                    parts = await asyncio.gather(*(
+                        loop.run_in_executor(pool, extract_fn, manual["pdf_path"], s, e)
+                        for s, e in ranges
+                    ))
+                    job["pages"] = [p for part in parts for p in part]
+                except Exception as e:
+                    job["error"] = f"extract: {e}"
+                job["timings"]["extract_s"] = time.perf_counter() - t0
+                # Waiting here while the queue is full is the backpressure.
+                await out_q.put(job)
+
+        await asyncio.gather(*(extract(m) for m in manuals))
+        await out_q.put(_DONE)
+
+    async def _chunk_stage(self, in_q, out_q):
+        while True:
+            job = await in_q.get()
+            if job is _DONE:
+                for _ in range(self.embed_concurrency):
+                    await out_q.put(_DONE)
+                return
+
+            if "error" not in job:
+                t0 = time.perf_counter()
+                try:
+                    pages = job.pop("pages")
+                    job["page_count"] = len(pages)
+                    records = await asyncio.to_thread(
+                        make_chunks, self.chunker_name, pages, self.chunk_size, self.overlap, self.max_tokens
+                    )
+                    if sum(len(r["text"].strip()) for r in records) < 50:
+                        job["error"] = "PDF contains no readable text — even after OCR"
+                    else:
+                        job["chunks"] = [r["text"] for r in records]
+                        job["chunk_meta"] = [{k: v for k, v in r.items() if k != "text"} for r in records]
+                        if not job["chunks"]:
+                            job["error"] = "No chunks produced from PDF text"
+                        else:
+                            known = None if self.force else self.manifest.known_chunk_ids(
+                                job["collection_name"], job["vehicle_key"]
+                            )
+                            job["plan"] = await asyncio.to_thread(
+                                plan_chunk_sync, job["collection_name"], job["vehicle_key"], job["chunks"], known,
+                                job["chunk_meta"],
+                            )
+                except Exception as e:
+                    job["error"] = f"chunk: {e}"
+                job["timings"]["chunk_s"] = time.perf_counter() - t0
+
+            await out_q.put(job)
+
+    async def _embed_stage(self, in_q):
+        while True:
+            job = await in_q.get()
+            if job is _DONE:
+                return
+
+            if "error" not in job and not self.dry_run:
+                t0 = time.perf_counter()
+                try:
+                    job["write_stats"] = await asyncio.to_thread(
+                        apply_chunk_sync, job["collection_name"], job["vehicle_key"], job["chunks"], job["plan"],
+                        job["chunk_meta"],
+                    )
+                    self.manifest.record(
+                        job["collection_name"], job["vehicle_key"], job["file_sha256"], self.chunker, job["plan"]
+                    )
+                    self.manifest.save()
+                except Exception as e:
+                    job["error"] = f"embed: {e}"
+                job["timings"]["embed_s"] = time.perf_counter() - t0
+
+            self._record(job)
+
+    def _record(self, job):
+        plan = job.get("plan") or {"upsert": [], "delete": []}
+        if "plan" in job and not plan["upsert"] and not plan["delete"]:
+            job.setdefault("status", "unchanged")
+        entry = {
+            "manual": job["filename"],
+            "brand": job["brand"],
+            "collection": job["collection_name"],
+            "status": job.get("status", "updated"),
+            "pages": job.get("page_count", 0),
+            "chunks": len(job.get("chunks", [])),
+            "upserted": len(plan["upsert"]),
+            "deleted": len(plan["delete"]),
+            **{k: round(v, 3) for k, v in job["timings"].items()},
+            "total_s": round(time.perf_counter() - job["started"], 3),
+        }
+        if job.get("write_stats"):
+            ws = job["write_stats"]
+            entry.update({
+                "tokens": ws["tokens"],
+                "batches": ws["batches"],
+                "retries": ws["retries"],
+                "resumed": ws["resumed"],
+                "truncated": ws["truncated"],
+                "chunks_per_s": ws["chunks_per_s"],
+                "tokens_per_s": ws["tokens_per_s"],
+            })
+        prefix = "[dry-run] " if self.dry_run else ""
+        if "error" in job:
+            entry["status"] = "error"
+            entry["error"] = job["error"]
+            print(f"   ❌ Error processing {job['filename']}: {job['error']}")
+        elif entry["status"] == "unchanged":
+            print(f"   ⏭️  {prefix}Unchanged: {job['filename']}")
+        else:
+            print(
+                f"   ✅ {prefix}{job['filename']} — {entry['chunks']} chunks in `{job['collection_name']}`: "
+                f"{entry['upserted']} to upsert, {entry['deleted']} orphaned"
+            )
+        self.report.append(entry)
+
+
+def print_report(report: list[dict], elapsed: float):
+    print("\n⏱️  Per-manual timings (seconds)")
+    print(
+        f"   {'manual':<45} {'status':>9} {'extract':>8} {'chunk':>8} {'embed':>8} {'total':>8}"
+        f" {'chunks':>7} {'upsert':>7} {'delete':>7}"
+    )
+    for r in report:
+        print(
+            f"   {r['manual'][:45]:<45} {r['status']:>9} {r.get('extract_s', 0):>8.2f} {r.get('chunk_s', 0):>8.2f}"
+            f" {r.get('embed_s', 0):>8.2f} {r['total_s']:>8.2f} {r['chunks']:>7} {r['upserted']:>7} {r['deleted']:>7}"
+        )
+    written = [r for r in report if r.get("batches")]
+    if written:
+        print("\n📦 Embedding writes")
+        for r in written:
+            print(
+                f"   {r['manual'][:45]:<45} {r['batches']:>4} batches, {r['tokens']:>8} tokens,"
+                f" {r['chunks_per_s']:>7} chunks/s, {r['tokens_per_s']:>9} tokens/s,"
+                f" {r['retries']} retries, {r['resumed']} resumed, {r['truncated']} truncated"
+            )
+
+    total_chunks = sum(r["chunks"] for r in report)
+    skipped = sum(1 for r in report if r["status"] == "unchanged")
+    print(f"\n   {len(report)} manuals ({skipped} unchanged), {total_chunks} chunks in {elapsed:.1f}s")
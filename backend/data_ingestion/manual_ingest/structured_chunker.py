@@ -0,0 +1,282 @@
+import os
+import re
+import sys
+from collections import Counter
+
+# Make the backend packages (utils/...) importable when run as a script.
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from utils.tokens import count_tokens
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "300"))
+# Smaller leftovers (e.g. a heading with one line under it) are carried into the next chunk.
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "40"))
+TOKEN_MODEL = "gpt-4o-mini"
+
+HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_WORDS = 12
+WARNING_RE = re.compile(r"^\s*(warning|caution|danger|note|important|notice)\b", re.IGNORECASE)
+STEP_RE = re.compile(r"^\s*(\d{1,2}[.)]|[•▪●◦\-–])\s+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _norm_repeat(text: str) -> str:
+    return re.sub(r"\d+", "#", text.strip().lower())
+
+
+def body_font_size(pages: list[tuple[int, list[dict]]]) -> float:
+    """Character-weighted most common font size = body text."""
+    sizes = Counter()
+    for _, lines in pages:
+        for line in lines:
+            sizes[round(line["size"], 1)] += len(line["text"])
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+
+def running_lines(pages: list[tuple[int, list[dict]]], edge_lines: int = 2, min_pages: int = 3) -> set[str]:
+    """
+    Running headers/footers: text at the top or bottom of a page that repeats
+    on several pages (page numbers normalized).
+    """
+    counts = Counter()
+    for _, lines in pages:
+        edges = lines[:edge_lines] + lines[-edge_lines:]
+        counts.update({_norm_repeat(line["text"]) for line in edges})
+    return {text for text, n in counts.items() if n >= min_pages}
+
+
+def is_heading(line: dict, body_size: float) -> bool:
+    text = line["text"].strip()
+    if not text or line["bullet"] or not body_size:
+        return False
+    if len(text.split()) > HEADING_MAX_WORDS or text.endswith((".", ",", ";")):
+        return False
+    if WARNING_RE.match(text) or text.isdigit() or text.lower() in ("or", "and"):
+        return False
+    return line["size"] >= body_size * HEADING_SIZE_RATIO or (line["bold"] and line["size"] >= body_size)
+
+
+def iter_blocks(pages: list[tuple[int, list[dict]]]):
+    """
+    Turns page lines into ("heading" | "para", text, page, kind) blocks.
+    Paragraphs break on vertical gaps, column jumps and bullets; consecutive
+    heading lines of the same size are one heading.
+    """
+    body_size = body_font_size(pages)
+    repeated = running_lines(pages)
+
+    for page_number, lines in pages:
+        para: list[str] = []
+        para_kind = "text"
+        heading: list[str] = []
+        heading_size = 0.0
+        prev = None
+
+        def flush_para():
+            nonlocal para, para_kind
+            if para:
+                yield ("para", " ".join(para), page_number, para_kind)
+            para, para_kind = [], "text"
+
+        def flush_heading():
+            nonlocal heading
+            if heading:
+                yield ("heading", " ".join(heading), page_number, "heading")
+            heading = []
+
+        edges = {id(line) for line in lines[:2] + lines[-2:]}
+        for line in lines:
+            text = line["text"].strip()
+            if not text or (id(line) in edges and _norm_repeat(text) in repeated):
+                continue
+
+            if is_heading(line, body_size):
+                yield from flush_para()
+                if heading and abs(line["size"] - heading_size) > 0.1:
+                    yield from flush_heading()
+                heading.append(text)
+                heading_size = line["size"]
+                prev = line
+                continue
+            yield from flush_heading()
+
+            line_height = max(line["y1"] - line["y0"], 1.0)
+            gap_break = prev is not None and (
+                line["y0"] - prev["y1"] > 0.6 * line_height or line["y0"] < prev["y0"] - line_height
+            )
+            starts_step = line["bullet"] or bool(STEP_RE.match(text))
+            if para and (gap_break or starts_step or WARNING_RE.match(text)):
+                yield from flush_para()
+
+            if not para:
+                if starts_step:
+                    para_kind = "step"
+                elif WARNING_RE.match(text):
+                    para_kind = "warning"
+            para.append(f"- {text}" if line["bullet"] else text)
+            prev = line
+
+        yield from flush_para()
+        yield from flush_heading()
+
+
+def iter_units(pages: list[tuple[int, list[dict]]]):
+    """
+    Groups paragraphs into units that must not be split:
+      - consecutive steps form one procedure (with the line introducing it),
+      - a short warning label stays with the text it introduces.
+    Yields ("heading" | "unit", text, first_page, last_page).
+    """
+    unit: list[str] = []
+    unit_kind = None
+    first_page = last_page = None
+
+    def flush():
+        nonlocal unit, unit_kind, first_page
+        if unit:
+            yield ("unit", "\n".join(unit), first_page, last_page)
+        unit, unit_kind, first_page = [], None, None
+
+    for block_type, text, page, kind in iter_blocks(pages):
+        if block_type == "heading":
+            yield from flush()
+            yield ("heading", text, page, page)
+            continue
+
+        joins_unit = (
+            (kind == "step" and unit_kind in ("step", "intro"))
+            or (unit_kind == "warning_label")
+        )
+        if unit and not joins_unit:
+            yield from flush()
+
+        if not unit:
+            first_page = page
+        unit.append(text)
+        last_page = page
+
+        if kind == "step":
+            unit_kind = "step"
+        elif kind == "warning" and len(text.split()) <= 3:
+            unit_kind = "warning_label"
+        elif text.endswith(":"):
+            unit_kind = "intro"
+        elif unit_kind != "step":
+            unit_kind = kind
+
+    yield from flush()
+
+
+def _split_oversized(text: str, max_tokens: int) -> list[str]:
+    """Splits a unit larger than the budget on sentence boundaries."""
+    pieces, current = [], ""
+    for sentence in SENTENCE_RE.split(text):
+        candidate = f"{current} {sentence}".strip()
+        if current and count_tokens(candidate, TOKEN_MODEL) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+
+    # A single sentence can still be too long (tables); fall back to word windows.
+    out = []
+    for piece in pieces:
+        words = piece.split()
+        while count_tokens(" ".join(words), TOKEN_MODEL) > max_tokens and len(words) > 1:
+            cut = max(1, len(words) * max_tokens // count_tokens(" ".join(words), TOKEN_MODEL))
+            out.append(" ".join(words[:cut]))
+            words = words[cut:]
+        if words:
+            out.append(" ".join(words))
+    return out
+
+
+def chunk_structured(pages: list[tuple[int, list[dict]]], max_tokens: int = CHUNK_MAX_TOKENS) -> list[dict]:
+    """
+    Section-aware chunks packed up to `max_tokens` (model tokenizer):
+        [{"text", "page", "page_end", "section"}, ...]
+    Chunks never cross a heading, procedures and warnings are kept whole
+    unless a single one exceeds the budget, and each chunk starts with its
+    section title so the retrieved text is self-explanatory. Sections too
+    small to stand alone are folded into the following chunk.
+    """
+    chunks = []
+    section = ""
+    parts: list[str] = []
+    tokens = 0
+    page = page_end = None
+    # A section too small to stand alone, waiting to be prepended to the first
+    # chunk of the next section. It keeps its own pages and section title.
+    carry: dict | None = None
+    prefix: dict | None = None
+
+    def emit(text: str, first: int, last: int, title: str):
+        chunks.append({"text": text, "page": first, "page_end": last, "section": title})
+
+    def flush_carry():
+        nonlocal carry
+        if carry:
+            emit(carry["text"], carry["page"], carry["page_end"], carry["section"])
+        carry = None
+
+    def flush(at_heading: bool = False):
+        nonlocal parts, tokens, page, page_end, carry, prefix
+        if parts:
+            body = "\n".join(parts)
+            text = f"{section}\n{body}" if section else body
+            if prefix:
+                text = f"{prefix['text']}\n{text}"
+                first, title = prefix["page"], " / ".join(t for t in (prefix["section"], section) if t)
+            else:
+                first, title = page, section
+            if at_heading and not prefix and tokens < CHUNK_MIN_TOKENS:
+                # Too small to stand alone: prepend it to the next section's first chunk.
+                carry = {"text": text, "page": first, "page_end": page_end, "section": title,
+                         "tokens": count_tokens(text, TOKEN_MODEL)}
+            else:
+                emit(text, first, page_end, title)
+        parts, tokens, page, page_end, prefix = [], 0, None, None, None
+
+    header_tokens = 0
+    for kind, text, first_page, last_page in iter_units(pages):
+        if kind == "heading":
+            # A carry the section that just ended did not take stands alone.
+            flush_carry()
+            flush(at_heading=True)
+            section = text
+            header_tokens = count_tokens(section, TOKEN_MODEL) + 1
+            continue
+
+        budget = max_tokens - header_tokens
+        unit_tokens = count_tokens(text, TOKEN_MODEL)
+
+        if unit_tokens > budget:
+            flush()
+            flush_carry()
+            for piece in _split_oversized(text, budget):
+                parts, tokens, page, page_end = [piece], count_tokens(piece, TOKEN_MODEL), first_page, last_page
+                flush()
+            continue
+
+        if parts and tokens + unit_tokens + 1 > budget:
+            flush()
+
+        if carry and not parts:
+            if carry["tokens"] + unit_tokens + 1 > budget:
+                flush_carry()
+            else:
+                prefix, carry = carry, None
+                tokens += prefix["tokens"] + 1
+        if page is None:
+            page = first_page
+        page_end = last_page
+        parts.append(text)
+        tokens += unit_tokens + 1
+
+    flush()
+    flush_carry()
+    return chunks
@@ -1,12 +1,31 @@
-from fastapi import FastAPI, Form, File, UploadFile
+from fastapi import FastAPI, Form, File, UploadFile, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from agents.car_agent import run_car_agent_rag
-from agent import select_vehicle_via_llm
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from agents.car_agent import (
+    run_car_agent_rag, stream_car_agent_rag, manual_catalog, prompt_cache_stats, find_best_manual_key,
+)
+from agent import select_vehicle_via_llm, resolver_cache
+from rag.manual_search import embedding_stats, get_embedding_function, manual_usage, retrieval_stats
+from rag.context_compression import context_stats
+from utils.stream_text import StreamReplacer
+from agents.answer_cache import answer_cache
+from customer.quantum_api import get_customer_data, start_client, close_client, vehicle_cache
+from utils.session_store import SESSION_TTL_SECONDS, make_session_store
+from utils import metrics
+from utils.metrics import span
+from warmup import readiness, start_warm_up
+from utils.images import (
+    ImageTooLarge, InvalidImage, image_processor, read_upload,
+    save_pending_image, load_pending_image, discard_pending_image,
+)
+from contextlib import asynccontextmanager
+from pydantic import BaseModel
 from dotenv import load_dotenv
-import httpx
-import json
+import asyncio
 import base64
+import json
 import os
+import secrets
 import uuid
 import time
 import traceback
@@ -14,7 +33,23 @@ from typing import Optional, Dict, List
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_client()
+    await session_store.start()
+    await manual_usage.start()
+    # Vector store, catalog and the most searched manuals load in the
+    # background; /readyz turns ready when they are done.
+    warm_up_task = start_warm_up()
+    yield
+    warm_up_task.cancel()
+    await manual_usage.close()
+    await session_store.close()
+    await close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -23,127 +58,128 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+# ------------------------------------------------------------------------------------
+# TIMING
+# ------------------------------------------------------------------------------------
+# Stages wrapped in `span(...)` are collected per request: they feed the
+# histograms behind GET /metrics and the Server-Timing header. For streamed
+# responses the header only covers the stages before the first byte.
+@app.middleware("http")
+async def record_timings(request, call_next):
+    spans = metrics.start_request()
+    profiler = metrics.StackSampler.maybe_start()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.request_seconds.observe(elapsed, path=path)
+        metrics.requests_total.inc(path=path, status=status)
+        if profiler is not None:
+            # Joins the sampler thread and may write a profile: keep it off the event loop.
+            await asyncio.to_thread(profiler.stop, elapsed, f"{request.method} {path}")
+
+    if metrics.SERVER_TIMING_ENABLED and spans:
+        response.headers["Server-Timing"] = metrics.server_timing(spans, elapsed)
+    return response
+
 # ------------------------------------------------------------------------------------
 # SESSION MEMORY
 # ------------------------------------------------------------------------------------
-SESSION_DATA: Dict[str, Dict] = {}
-SESSION_TTL_SECONDS = 600
+# Conversations live in a session store (utils/session_store.py): in-process by
+# default, or a shared SQLite file (SESSION_STORE=sqlite) when running several workers.
+session_store = make_session_store()
+
+
+def new_session(now: float) -> Dict:
+    return {
+        "created_at": now,
+        "vehicle": None,
+        "history": [],
+        "customerId": None,
+        "first_greeting_sent": False,
+        "pending_query": None,
+        "pending_image": None
+    }
 
-def get_session(session_id: Optional[str]):
+
+async def get_session(session_id: Optional[str]):
     now = time.time()
     if not session_id or session_id == "" or session_id == "null":
         session_id = str(uuid.uuid4())
 
-    session = SESSION_DATA.get(session_id)
-
-    if not session:
-        SESSION_DATA[session_id] = {
-            "created_at": now,
-            "vehicle": None,
-            "history": [],
-            "customerId": None,
-            "first_greeting_sent": False,
-            "pending_query": None,
-            "pending_image": None
-        }
-        return session_id, SESSION_DATA[session_id]
-
-    if now - session["created_at"] > SESSION_TTL_SECONDS:
-        SESSION_DATA[session_id] = {
-            "created_at": now,
-            "vehicle": None,
-            "history": [],
-            "customerId": None,
-            "first_greeting_sent": False,
-            "pending_query": None,
-            "pending_image": None
-        }
-
-    return session_id, SESSION_DATA[session_id]
+    session = await session_store.load(session_id)
+
+    if not session or now - session["created_at"] > SESSION_TTL_SECONDS:
+        if session and session.get("pending_image"):
+            discard_pending_image(session["pending_image"])
+        session = new_session(now)
+
+    return session_id, session
 
 # ------------------------------------------------------------------------------------
 # AUTH & DATA
 # ------------------------------------------------------------------------------------
-API_BASE = os.getenv("CUSTOMER_API_BASE")
-if API_BASE.endswith("/"):
-    API_BASE = API_BASE[:-1]
+# Token caching and the pooled HTTP client live in customer/quantum_api.py.
 
-AUTH_URL = f"{API_BASE}/api/auth/login"
-CUSTOMER_URL = f"{API_BASE}/api/Quantum/customervehicles"
+def first_name(name: str):
+    if not name: return "there"
+    return name.split(" ")[0].strip()
 
-async def fetch_auth_token():
-    def clean(val):
-        return str(val).strip().replace('"', '').replace("'", "")
 
-    payload = {
-        "strDomain": clean(os.getenv("AUTH_DOMAIN")),
-        "strUsername": clean(os.getenv("AUTH_USER")),
-        "strPassword": clean(os.getenv("AUTH_PASS")),
-    }
-    
-    async with httpx.AsyncClient(timeout=15, verify=False) as client:
-        r = await client.post(AUTH_URL, json=payload)
-        r.raise_for_status()
-        return r.json()["accessToken"]
-
-async def get_customer_data(customerId: str):
-    token = await fetch_auth_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    customerId = customerId.zfill(10)
-
-    async with httpx.AsyncClient(timeout=15, verify=False) as client:
-        r = await client.get(CUSTOMER_URL, headers=headers, params={"customerId": customerId})
-        r.raise_for_status()
-        data = r.json()
-
-    vehicles = []
-    for idx, v in enumerate(data.get("vehicles", [])):
-        raw_year = v.get("Vehicle_Model_Year", "")
-        if raw_year and str(raw_year).strip().lower() != "null":
-            year_val = str(raw_year).strip()
-        else:
-            year_val = "" 
-
-        vehicles.append({
-            "vehicleId": v.get("Vehicle_ID") or f"TMP_{idx}",
-            "brand": v.get("Vehicle_Brand", ""),
-            "model": v.get("Vehicle_Model_Description", ""),
-            "year": year_val,
-            "vin": v.get("Vehicle_Chassis_Number", "")
-        })
+def promo_code_for(customer_id) -> str:
+    cid_str = str(customer_id)
+    short_id = cid_str[-5:] if len(cid_str) > 5 else cid_str
+    return f"AS-{short_id}-VIP"
+
+# ------------------------------------------------------------------------------------
+# BOOKING MARKER
+# ------------------------------------------------------------------------------------
+BOOK_MARKER = "[ACTION:BOOK]"
 
-    return {
-        "customerId": data.get("customerId"),
-        "customerName": data.get("customerName"),
-        "vehicles": vehicles
-    }
 
-def first_name(name: str):
-    if not name: return "there"
-    return name.split(" ")[0].strip()
 
 # ------------------------------------------------------------------------------------
-# MAIN ENDPOINT
+# TURN HANDLING (shared by /detect and /detect/stream)
 # ------------------------------------------------------------------------------------
-@app.post("/detect")
-async def detect_issue(
-    customerId: str = Form(...),
-    message: str = Form(""),
-    image: Optional[UploadFile] = File(None),
-    language: str = Form("en"),
-    session_id: Optional[str] = Form(None)
+async def prepare_turn(
+    customerId: str,
+    message: str,
+    image: Optional[UploadFile],
+    language: str,
+    session_id: Optional[str],
 ):
-    session_id, session = get_session(session_id)
-    
+    """
+    Runs everything before the agent call.
+    Returns (reply, turn): `reply` is a finished response when no agent call is
+    needed (errors, vehicle clarification), otherwise `turn` holds the context.
+    """
+    with span("session_load"):
+        session_id, session = await get_session(session_id)
+    try:
+        return await _prepare_turn(customerId, message, image, language, session_id, session)
+    finally:
+        with span("session_save"):
+            await session_store.save(session_id, session)
+
+
+async def _prepare_turn(customerId, message, image, language, session_id, session):
     try:
-        data = await get_customer_data(customerId)
+        with span("customer"):
+            data = await get_customer_data(customerId)
     except Exception as e:
         print("\n\n!!!!!!!!!! API CONNECTION FAILED !!!!!!!!!!")
         print(f"Error: {str(e)}")
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n\n")
-        return {"answer": f"System Error: Could not fetch customer data. ({str(e)})", "session_id": session_id}
+        return {"answer": f"System Error: Could not fetch customer data. ({str(e)})", "session_id": session_id}, None
 
     vehicles = data["vehicles"]
     fname = first_name(data["customerName"])
@@ -154,26 +190,37 @@ async def detect_issue(
         session["history"] = []
         session["first_greeting_sent"] = False
         session["pending_query"] = None
+        if session.get("pending_image"):
+            discard_pending_image(session["pending_image"])
         session["pending_image"] = None
         session["customerId"] = data["customerId"]
 
-    image_base64 = None
+    # Uploads are size-capped, downscaled and re-encoded without EXIF before
+    # they are parked or sent to the vision model.
+    image_data = None
     if image is not None and image.filename:
-        image_bytes = await image.read()
-        if image_bytes:
-            image_base64 = base64.b64encode(image_bytes).decode()
+        try:
+            image_bytes = await read_upload(image)
+            if image_bytes:
+                with span("image"):
+                    image_data = await asyncio.to_thread(image_processor.process, image_bytes)
+        except ImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidImage as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     # -------------------------------------------------------------------------------
     # VEHICLE SELECTION
     # -------------------------------------------------------------------------------
     if len(vehicles) == 0:
-        return {"answer": f"Hello {fname}. No vehicles found for ID {customerId}.", "session_id": session_id}
+        return {"answer": f"Hello {fname}. No vehicles found for ID {customerId}.", "session_id": session_id}, None
 
     if len(vehicles) == 1:
         session["vehicle"] = vehicles[0]
 
     elif session["vehicle"] is None:
-        selection = await select_vehicle_via_llm(message, vehicles)
+        with span("vehicle_select"):
+            selection = await select_vehicle_via_llm(message, vehicles)
 
         if selection.get("needClarification"):
             # 1. Define Chit-Chat Greetings
@@ -187,8 +234,10 @@ async def detect_issue(
             if len(message.strip()) > 1 and user_input_lower not in greetings and "202" not in message:
                 session["pending_query"] = message
             
-            if image_base64:
-                session["pending_image"] = image_base64
+            if image_data:
+                if session.get("pending_image"):
+                    discard_pending_image(session["pending_image"])
+                session["pending_image"] = save_pending_image(image_data, session_id)
 
             # 4. Dynamic Response (Greeting vs Issue)
             if user_input_lower in greetings:
@@ -208,7 +257,7 @@ async def detect_issue(
                 "customerName": data["customerName"], 
                 "customerId": data["customerId"],
                 "vehicles": vehicles
-            }
+            }, None
 
         selected_id = selection["vehicleId"]
         session["vehicle"] = next(v for v in vehicles if str(v["vehicleId"]) == str(selected_id))
@@ -217,8 +266,9 @@ async def detect_issue(
             message = session["pending_query"]
             session["pending_query"] = None
         
-        if session.get("pending_image") and image_base64 is None:
-            image_base64 = session["pending_image"]
+        if session.get("pending_image") and image_data is None:
+            image_data = load_pending_image(session["pending_image"])
+            discard_pending_image(session["pending_image"])
             session["pending_image"] = None
         
         session["first_greeting_sent"] = True
@@ -231,17 +281,13 @@ async def detect_issue(
     # -------------------------------------------------------------------------------
     # GENERATE PROMO
     # -------------------------------------------------------------------------------
-    cid_str = str(data["customerId"])
-    short_id = cid_str[-5:] if len(cid_str) > 5 else cid_str
-    promo_code = f"AS-{short_id}-VIP"
+    promo_code = promo_code_for(data["customerId"])
 
-    # -------------------------------------------------------------------------------
-    # RUN AGENT
-    # -------------------------------------------------------------------------------
-    answer = await run_car_agent_rag(
+    agent_kwargs = dict(
         message=message,
         vehicle_data=vehicle,
-        image_base64=image_base64,
+        image_base64=base64.b64encode(image_data["bytes"]).decode() if image_data else None,
+        image_mime=image_data["mime"] if image_data else "image/jpeg",
         language=language,
         first_name=fname,
         session_id=session_id,
@@ -250,21 +296,362 @@ async def detect_issue(
         promo_code=promo_code
     )
 
-    session["history"].append({"role": "user", "content": message})
+    return None, {
+        "session_id": session_id,
+        "session": session,
+        "data": data,
+        "vehicle": vehicle,
+        "message": message,
+        "agent_kwargs": agent_kwargs,
+    }
+
+
+async def finish_turn(turn: dict, answer: str):
+    """
+    Records the raw answer in history and builds the final response.
+    """
+    session = turn["session"]
+    data = turn["data"]
+
+    session["history"].append({"role": "user", "content": turn["message"]})
     session["history"].append({"role": "assistant", "content": answer})
     session["history"] = session["history"][-20:]
+    with span("session_save"):
+        await session_store.save(turn["session_id"], session)
 
     show_booking_btn = False
-    if "[ACTION:BOOK]" in answer:
+    if BOOK_MARKER in answer:
         show_booking_btn = True
-        answer = answer.replace("[ACTION:BOOK]", "").strip()
+        answer = answer.replace(BOOK_MARKER, "").strip()
 
     return {
         "answer": answer,
-        "vehicle_info": vehicle,
+        "vehicle_info": turn["vehicle"],
         "customerName": data["customerName"], 
         "customerId": data["customerId"],
-        "vehicles": vehicles,
-        "session_id": session_id,
+        "vehicles": data["vehicles"],
+        "session_id": turn["session_id"],
         "show_booking_button": show_booking_btn
     }
+
+
+# ------------------------------------------------------------------------------------
+# MAIN ENDPOINT
+# ------------------------------------------------------------------------------------
+@app.post("/detect")
+async def detect_issue(
+    customerId: str = Form(...),
+    message: str = Form(""),
+    image: Optional[UploadFile] = File(None),
+    language: str = Form("en"),
+    session_id: Optional[str] = Form(None)
+):
+    reply, turn = await prepare_turn(customerId, message, image, language, session_id)
+    if reply is not None:
+        return reply
+
+    with span("agent"):
+        answer = await run_car_agent_rag(**turn["agent_kwargs"])
+    return await finish_turn(turn, answer)
+
+
+# ------------------------------------------------------------------------------------
+# STREAMING ENDPOINT
+# ------------------------------------------------------------------------------------
+def ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@app.post("/detect/stream")
+async def detect_issue_stream(
+    customerId: str = Form(...),
+    message: str = Form(""),
+    image: Optional[UploadFile] = File(None),
+    language: str = Form("en"),
+    session_id: Optional[str] = Form(None)
+):
+    """
+    Streaming variant of /detect (NDJSON, one event per line):
+      {"type": "token", "text": "..."}  - answer text as it is generated
+      {"type": "done", ...}             - same payload as /detect
+      {"type": "error", "answer": "..."}
+    """
+    reply, turn = await prepare_turn(customerId, message, image, language, session_id)
+
+    async def events():
+        if reply is not None:
+            yield ndjson({"type": "done", **reply})
+            return
+
+        # Strips the marker even when it arrives split across chunks.
+        marker = StreamReplacer({BOOK_MARKER: ""})
+        parts = []
+        try:
+            async for chunk in stream_car_agent_rag(**turn["agent_kwargs"]):
+                parts.append(chunk)
+                text = marker.feed(chunk)
+                if text:
+                    yield ndjson({"type": "token", "text": text})
+        except Exception as e:
+            traceback.print_exc()
+            yield ndjson({"type": "error", "answer": f"System Error: {str(e)}", "session_id": turn["session_id"]})
+            return
+
+        tail = marker.flush()
+        if tail:
+            yield ndjson({"type": "token", "text": tail})
+
+        yield ndjson({"type": "done", **(await finish_turn(turn, "".join(parts)))})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+# ------------------------------------------------------------------------------------
+# BATCH ENDPOINT
+# ------------------------------------------------------------------------------------
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+
+class BatchItem(BaseModel):
+    customerId: str
+    message: str
+    vehicleId: Optional[str] = None
+    language: str = "en"
+    id: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+
+class BatchItemError(Exception):
+    pass
+
+
+async def fetch_batch_customers(customer_ids: List[str]) -> Dict[str, object]:
+    """Each distinct customer fetched once; failures are kept as the exception."""
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def fetch(cid):
+        async with limit:
+            try:
+                return await get_customer_data(cid)
+            except Exception as e:
+                return e
+
+    results = await asyncio.gather(*(fetch(cid) for cid in customer_ids))
+    return dict(zip(customer_ids, results))
+
+
+async def resolve_batch_item(item: BatchItem, data) -> Dict:
+    """Agent arguments for one item; raises BatchItemError when it cannot be answered."""
+    if isinstance(data, Exception):
+        raise BatchItemError(f"Could not fetch customer data. ({data})")
+    vehicles = data["vehicles"]
+    if not vehicles:
+        raise BatchItemError(f"No vehicles found for ID {item.customerId}.")
+
+    if item.vehicleId:
+        vehicle = next(
+            (v for v in vehicles if item.vehicleId in (str(v["vehicleId"]), str(v.get("vin") or ""))), None
+        )
+        if vehicle is None:
+            raise BatchItemError(f"Vehicle {item.vehicleId} does not belong to customer {item.customerId}.")
+    elif len(vehicles) == 1:
+        vehicle = vehicles[0]
+    else:
+        selection = await select_vehicle_via_llm(item.message, vehicles)
+        if selection.get("needClarification"):
+            choices = ", ".join(f"{v['vehicleId']} ({v['year']} {v['brand']} {v['model']})" for v in vehicles)
+            raise BatchItemError(f"vehicleId is required; the customer has several vehicles: {choices}")
+        vehicle = next((v for v in vehicles if str(v["vehicleId"]) == str(selection.get("vehicleId"))), None)
+        if vehicle is None:
+            raise BatchItemError(f"Selected vehicle {selection.get('vehicleId')} does not belong to customer {item.customerId}.")
+
+    return dict(
+        message=item.message,
+        vehicle_data=vehicle,
+        language=item.language,
+        first_name=first_name(data["customerName"]),
+        promo_code=promo_code_for(data["customerId"]),
+    )
+
+
+@app.post("/detect/batch")
+async def detect_batch(batch: BatchRequest):
+    """
+    Answers many (customerId, vehicleId, message) items in one request.
+    Customers are fetched once each, query embeddings for all items go out
+    in one batched call, and completions run BATCH_CONCURRENCY at a time.
+    Streams NDJSON as items finish (in completion order):
+      {"type": "result", "index": i, "id": ..., "answer": ..., ...}
+      {"type": "error", "index": i, "id": ..., "error": "..."}
+      {"type": "done", "items": n, "succeeded": n, "failed": n, "seconds": s}
+    """
+    items = batch.items
+    if not items:
+        raise HTTPException(status_code=400, detail="No items")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+    async def events():
+        started = time.perf_counter()
+        with span("batch_customers"):
+            customers = await fetch_batch_customers(list(dict.fromkeys(item.customerId for item in items)))
+
+        resolved: Dict[int, Dict] = {}
+        failed = 0
+        for index, item in enumerate(items):
+            try:
+                resolved[index] = await resolve_batch_item(item, customers[item.customerId])
+            except BatchItemError as e:
+                failed += 1
+                yield ndjson({"type": "error", "index": index, "id": item.id, "customerId": item.customerId, "error": str(e)})
+            except Exception as e:
+                # One bad item must not end the stream for the others.
+                traceback.print_exc()
+                failed += 1
+                yield ndjson({"type": "error", "index": index, "id": item.id, "customerId": item.customerId, "error": f"System Error: {e}"})
+
+        # One embedding request for every item that will search a manual; the
+        # per-item searches below are then served from the embedding cache.
+        manual_keys: Dict[tuple, Optional[str]] = {}
+        queries = []
+        for kwargs in resolved.values():
+            v = kwargs["vehicle_data"]
+            vehicle = (v["brand"], v["model"], v["year"])
+            if vehicle not in manual_keys:
+                manual_keys[vehicle] = find_best_manual_key(*vehicle)
+            if manual_keys[vehicle] and len(kwargs["message"].strip()) > 2:
+                queries.append(kwargs["message"])
+        queries = list(dict.fromkeys(queries))
+        if queries:
+            try:
+                with span("batch_embeddings"):
+                    await asyncio.to_thread(lambda: get_embedding_function().embed_query(input=queries))
+            except Exception as e:
+                print(f"⚠️ Batch embedding failed, items will embed one by one: {e}")
+
+        limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def answer(index: int, kwargs: Dict):
+            async with limit:
+                try:
+                    reply = await run_car_agent_rag(**kwargs)
+                except Exception as e:
+                    traceback.print_exc()
+                    return index, None, e
+            return index, reply, None
+
+        tasks = [asyncio.create_task(answer(index, kwargs)) for index, kwargs in resolved.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, reply, error = await next_done
+                item = items[index]
+                if error is not None:
+                    failed += 1
+                    yield ndjson({"type": "error", "index": index, "id": item.id, "customerId": item.customerId, "error": f"System Error: {error}"})
+                    continue
+                show_booking_btn = BOOK_MARKER in reply
+                yield ndjson({
+                    "type": "result",
+                    "index": index,
+                    "id": item.id,
+                    "customerId": item.customerId,
+                    "answer": reply.replace(BOOK_MARKER, "").strip(),
+                    "vehicle_info": resolved[index]["vehicle_data"],
+                    "show_booking_button": show_booking_btn,
+                })
+        finally:
+            # Client went away: stop the completions still queued.
+            for task in tasks:
+                task.cancel()
+
+        yield ndjson({
+            "type": "done",
+            "items": len(items),
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "seconds": round(time.perf_counter() - started, 3),
+        })
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+# ------------------------------------------------------------------------------------
+# HEALTH
+# ------------------------------------------------------------------------------------
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop responds."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the startup warm-up has finished, 503 before that or if a step failed."""
+    body = {"status": "ready" if readiness.ready else "not_ready", **readiness.stats()}
+    return JSONResponse(body, status_code=200 if readiness.ready else 503)
+
+
+# ------------------------------------------------------------------------------------
+# CACHE STATS
+# ------------------------------------------------------------------------------------
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "customer_vehicles": vehicle_cache.stats(),
+        "vehicle_resolver": resolver_cache.stats(),
+        "manual_catalog": manual_catalog.stats(),
+        "embeddings": embedding_stats(),
+        "answers": answer_cache.stats(),
+        "retrieval": retrieval_stats.stats(),
+        "sessions": await session_store.stats(),
+        "images": image_processor.stats(),
+        "prompt_cache": prompt_cache_stats.stats(),
+        "context": context_stats.stats(),
+    }
+
+
+# ------------------------------------------------------------------------------------
+# METRICS (Prometheus text format)
+# ------------------------------------------------------------------------------------
+@app.get("/metrics")
+async def prometheus_metrics():
+    hit_ratio = metrics.Gauge("cache_hit_ratio", "Hit ratio per cache.")
+    hit_ratio.set(vehicle_cache.stats()["hit_ratio"], cache="customer_vehicles")
+    hit_ratio.set(embedding_stats().get("hit_ratio"), cache="embeddings")
+    hit_ratio.set(answer_cache.stats()["hit_ratio"], cache="answers")
+    hit_ratio.set(prompt_cache_stats.stats()["cached_ratio"], cache="prompt_tokens")
+
+    retrieval = metrics.Gauge("retrieval_searches", "Manual searches per retrieval path.")
+    retrieval_counts = retrieval_stats.stats()
+    for path in retrieval_stats.PATHS:
+        retrieval.set(retrieval_counts[path], path=path)
+
+    sessions = metrics.Gauge("active_sessions", "Conversations held by the session store.")
+    sessions.set((await session_store.stats())["sessions"])
+
+    ready = metrics.Gauge("ready", "1 once the startup warm-up has finished.")
+    ready.set(1 if readiness.ready else 0)
+
+    return PlainTextResponse(
+        metrics.render([hit_ratio, retrieval, sessions, ready]),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+# ------------------------------------------------------------------------------------
+# ADMIN
+# ------------------------------------------------------------------------------------
+# Admin endpoints are closed unless a token is configured.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+@app.post("/admin/catalog/reload")
+async def reload_manual_catalog(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    manual_catalog.reload()
+    return {"status": "reloaded", **manual_catalog.stats()}
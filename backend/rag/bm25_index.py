@@ -0,0 +1,194 @@
+"""
+Per-manual BM25 inverted index, stored next to the Chroma database.
+
+Layout (one directory per manual):
+    {BM25_INDEX_DIR}/{collection_name}/{vehicle_key}/
+        meta.json      k1, b, avgdl, vocabulary (term -> [postings offset, df])
+        postings.npy   int32 chunk positions, grouped by term
+        tfs.npy        float32 term frequencies, aligned with postings
+        doc_len.npy    float32 chunk lengths in terms
+        ids.json       chunk ids, in chunk position order
+
+Chunk texts are read from the manual's chunk table (rag/index_files.py).
+Indexes are written at ingestion time and memory-mapped at query time, so
+looking up a manual does not load every posting list into memory.
+
+Rebuild every index from the existing Chroma collections:
+    python backend/rag/bm25_index.py --rebuild
+"""
+import math
+import os
+import re
+import shutil
+import sys
+from collections import Counter
+
+import numpy as np
+
+if __name__ == "__main__":
+    # Make the backend packages importable when run as a script.
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag.index_files import DB_DIR, IndexStore, ManualIndex, has_chunks, read_json, replace_dir, write_chunks, write_ids
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", os.path.join(DB_DIR, "bm25"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TERM_RE = re.compile(r"[a-z0-9]+(?:[-/][a-z0-9]+)*")
+# Question words that carry no meaning for manual lookup. Short technical
+# terms ("on", "off", "psm", "abs") are kept on purpose.
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it my of or "
+    "should the this to what when where which why will with you your me".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TERM_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def index_dir(collection_name: str, vehicle_key: str) -> str:
+    return os.path.join(BM25_INDEX_DIR, collection_name, vehicle_key)
+
+
+# ----------------------------------------------------------------------
+# BUILD
+# ----------------------------------------------------------------------
+def build_index(
+    collection_name: str,
+    vehicle_key: str,
+    ids: list[str],
+    documents: list[str],
+) -> str:
+    """
+    Writes the BM25 index for one manual and returns its directory.
+    The directory is replaced atomically, so readers never see a half-written
+    index. The chunk texts go to the chunk table (`write_chunks`).
+    """
+    doc_terms = [Counter(tokenize(doc)) for doc in documents]
+    postings: dict[str, list[tuple[int, int]]] = {}
+    for position, terms in enumerate(doc_terms):
+        for term, tf in terms.items():
+            postings.setdefault(term, []).append((position, tf))
+
+    vocabulary = {}
+    flat_docs, flat_tfs = [], []
+    for term in sorted(postings):
+        entries = postings[term]
+        vocabulary[term] = [len(flat_docs), len(entries)]
+        flat_docs.extend(p for p, _ in entries)
+        flat_tfs.extend(tf for _, tf in entries)
+
+    doc_len = np.array([sum(t.values()) for t in doc_terms], dtype=np.float32)
+    meta = {
+        "k1": BM25_K1,
+        "b": BM25_B,
+        "doc_count": len(documents),
+        "avgdl": float(doc_len.mean()) if len(doc_len) else 0.0,
+        "vocabulary": vocabulary,
+    }
+
+    def write_files(tmp: str):
+        np.save(os.path.join(tmp, "postings.npy"), np.array(flat_docs, dtype=np.int32))
+        np.save(os.path.join(tmp, "tfs.npy"), np.array(flat_tfs, dtype=np.float32))
+        np.save(os.path.join(tmp, "doc_len.npy"), doc_len)
+        write_ids(tmp, ids)
+
+    return replace_dir(index_dir(collection_name, vehicle_key), write_files, meta)
+
+
+def has_index(collection_name: str, vehicle_key: str) -> bool:
+    # Indexes written before the chunk table existed have no ids.json.
+    path = index_dir(collection_name, vehicle_key)
+    return (
+        os.path.exists(os.path.join(path, "meta.json"))
+        and os.path.exists(os.path.join(path, "ids.json"))
+        and has_chunks(collection_name, vehicle_key)
+    )
+
+
+def remove_index(collection_name: str, vehicle_key: str):
+    shutil.rmtree(index_dir(collection_name, vehicle_key), ignore_errors=True)
+
+
+# ----------------------------------------------------------------------
+# QUERY
+# ----------------------------------------------------------------------
+class BM25Index(ManualIndex):
+    def __init__(self, path: str):
+        super().__init__(path)
+        meta = read_json(path, "meta.json")
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.doc_count = meta["doc_count"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.vocabulary = meta["vocabulary"]
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.doc_len = np.load(os.path.join(path, "doc_len.npy"), mmap_mode="r")
+
+    def search(self, question: str, top_k: int) -> list[tuple[int, float]]:
+        """(chunk position, score) pairs, best first; empty when no term matches."""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(question)):
+            entry = self.vocabulary.get(term)
+            if entry is None:
+                continue
+            matched = True
+            start, df = entry
+            docs = self.postings[start:start + df]
+            tf = self.tfs[start:start + df]
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if not matched:
+            return []
+        k = min(top_k, self.doc_count)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best if scores[i] > 0]
+
+class BM25Store(IndexStore):
+    """Open BM25 indexes, reloaded when a manual is re-ingested."""
+
+    def __init__(self, root: str = BM25_INDEX_DIR):
+        super().__init__(root, BM25Index, "loaded_indexes")
+
+
+def rebuild_from_chroma():
+    """Builds an index for every manual already stored in Chroma."""
+    import chromadb
+    from rag.vector_collections import brand_collection_of
+
+    client = chromadb.PersistentClient(path=DB_DIR)
+    for collection in client.list_collections():
+        name = collection if isinstance(collection, str) else collection.name
+        col = client.get_collection(name)
+        # Indexes are keyed by the brand collection in both storage layouts.
+        name = brand_collection_of(col)
+        data = col.get(include=["documents", "metadatas"])
+        by_source: dict[str, list[int]] = {}
+        for i, meta in enumerate(data["metadatas"]):
+            by_source.setdefault((meta or {}).get("source", ""), []).append(i)
+        for source, positions in by_source.items():
+            ids = [data["ids"][i] for i in positions]
+            documents = [data["documents"][i] for i in positions]
+            metadatas = [data["metadatas"][i] for i in positions]
+            write_chunks(name, source, ids, documents, metadatas)
+            build_index(name, source, ids, documents)
+            print(f"   ✅ BM25 index: {name}/{source} ({len(positions)} chunks)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild all indexes from the Chroma collections")
+    args = parser.parse_args()
+    if args.rebuild:
+        rebuild_from_chroma()
+    else:
+        parser.print_help()
@@ -0,0 +1,233 @@
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from utils.tokens import count_tokens, decode, encode
+
+# Post-retrieval compression of the manual context:
+#   1. merge chunks of one manual whose pages overlap or touch and whose
+#      text overlaps (the word chunker repeats 50 words between chunks)
+#   2. drop near-duplicates (MinHash estimate of word-shingle Jaccard)
+#   3. MMR rerank: retrieval rank vs. similarity to already chosen chunks
+#   4. pack into CONTEXT_TOKEN_BUDGET tokens
+CONTEXT_COMPRESSION_ENABLED = os.getenv("CONTEXT_COMPRESSION_ENABLED", "1") != "0"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.8"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+
+SHINGLE_WORDS = 5
+MINHASH_PERMUTATIONS = 64
+MIN_OVERLAP_WORDS = 8
+MAX_OVERLAP_WORDS = 120
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, (1 << 31) - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 31) - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def page_label(chunk: dict) -> str:
+    page, page_end = chunk.get("page"), chunk.get("page_end")
+    if not page:
+        return "?"
+    return f"{page}-{page_end}" if page_end and page_end != page else str(page)
+
+
+def format_chunk(chunk: dict) -> str:
+    return f"[Page {page_label(chunk)}] {chunk.get('text', '')}"
+
+
+def format_context(chunks: list[dict]) -> str:
+    return "\n\n".join(format_chunk(ch) for ch in chunks)
+
+
+# ----------------------------------------------------------------------
+# 1. MERGE
+# ----------------------------------------------------------------------
+def _page_span(chunk: dict) -> tuple[int, int] | None:
+    try:
+        start = int(chunk.get("page"))
+    except (TypeError, ValueError):
+        return None
+    try:
+        end = int(chunk.get("page_end") or start)
+    except (TypeError, ValueError):
+        end = start
+    return start, end
+
+
+def _pages_touch(a: dict, b: dict) -> bool:
+    sa, sb = _page_span(a), _page_span(b)
+    if sa is None or sb is None:
+        return False
+    return sa[0] <= sb[1] + 1 and sb[0] <= sa[1] + 1
+
+
+def _overlap(first: list[str], second: list[str]) -> int:
+    """Words at the end of `first` that repeat at the start of `second`."""
+    for n in range(min(len(first), len(second), MAX_OVERLAP_WORDS), MIN_OVERLAP_WORDS - 1, -1):
+        if first[-n:] == second[:n]:
+            return n
+    return 0
+
+
+def _join(a: dict, b: dict) -> dict | None:
+    """`a` and `b` as one passage, or None when their text does not overlap."""
+    wa, wb = a["text"].split(), b["text"].split()
+    if " ".join(wb) in " ".join(wa):
+        text = a["text"]
+    elif " ".join(wa) in " ".join(wb):
+        text = b["text"]
+    elif n := _overlap(wa, wb):
+        text = " ".join(wa + wb[n:])
+    elif n := _overlap(wb, wa):
+        text = " ".join(wb + wa[n:])
+    else:
+        return None
+    sa, sb = _page_span(a), _page_span(b)
+    return {
+        **a,
+        "id": f"{a['id']}+{b['id']}",
+        "text": text,
+        "page": min(sa[0], sb[0]),
+        "page_end": max(sa[1], sb[1]),
+    }
+
+
+def merge_overlapping(chunks: list[dict]) -> list[dict]:
+    """Merges overlapping passages of one manual; keeps the rank of the better one."""
+    merged: list[dict] = []
+    for chunk in chunks:
+        for i, kept in enumerate(merged):
+            if kept.get("source") == chunk.get("source") and _pages_touch(kept, chunk):
+                joined = _join(kept, chunk)
+                if joined is not None:
+                    merged[i] = joined
+                    break
+        else:
+            merged.append(chunk)
+    return merged
+
+
+# ----------------------------------------------------------------------
+# 2. NEAR-DUPLICATES (MinHash over word shingles)
+# ----------------------------------------------------------------------
+def minhash(text: str) -> np.ndarray:
+    words = text.lower().split()
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p for every permutation, minimum over the shingles.
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def drop_near_duplicates(chunks: list[dict], signatures: list[np.ndarray], threshold: float):
+    kept, kept_sigs = [], []
+    for chunk, sig in zip(chunks, signatures):
+        if any(similarity(sig, other) >= threshold for other in kept_sigs):
+            continue
+        kept.append(chunk)
+        kept_sigs.append(sig)
+    return kept, kept_sigs
+
+
+# ----------------------------------------------------------------------
+# 3. MMR
+# ----------------------------------------------------------------------
+def mmr_order(signatures: list[np.ndarray], lam: float) -> list[int]:
+    """
+    Maximal marginal relevance over retrieval rank (chunks arrive best first)
+    and lexical similarity, so a second passage saying the same thing waits
+    behind one that adds something new.
+    """
+    relevance = [1.0 / (rank + 1) for rank in range(len(signatures))]
+    remaining = list(range(len(signatures)))
+    order = []
+    while remaining:
+        best = max(
+            remaining,
+            key=lambda i: lam * relevance[i]
+            - (1 - lam) * max((similarity(signatures[i], signatures[j]) for j in order), default=0.0),
+        )
+        order.append(best)
+        remaining.remove(best)
+    return order
+
+
+# ----------------------------------------------------------------------
+# 4. PACK
+# ----------------------------------------------------------------------
+def pack(chunks: list[dict], budget: int, model: str) -> list[dict]:
+    """Chunks in order while they fit; the first one is truncated if it alone is too long."""
+    packed, used = [], 0
+    for chunk in chunks:
+        tokens = count_tokens(format_chunk(chunk), model)
+        if used + tokens <= budget:
+            packed.append(chunk)
+            used += tokens
+        elif not packed:
+            ids = encode(chunk["text"], model)
+            keep = max(1, budget - (tokens - len(ids))) if ids is not None else None
+            text = decode(ids[:keep], model) if ids is not None else chunk["text"][:4 * budget]
+            packed.append({**chunk, "text": text})
+            used = budget
+    return packed
+
+
+class ContextStats:
+    """Context tokens before and after compression."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, before: int, after: int):
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += before
+            self.tokens_after += after
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CONTEXT_COMPRESSION_ENABLED,
+            "token_budget": CONTEXT_TOKEN_BUDGET,
+            "requests": self.requests,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "saved_ratio": round(1 - self.tokens_after / self.tokens_before, 4) if self.tokens_before else 0.0,
+        }
+
+
+context_stats = ContextStats()
+
+
+def compress_context(
+    chunks: list[dict],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    model: str = "gpt-4o-mini",
+    dedupe_threshold: float = CONTEXT_DEDUPE_THRESHOLD,
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+) -> list[dict]:
+    """Retrieved chunks (best first) -> merged, deduplicated, reranked chunks within `budget` tokens."""
+    if not chunks:
+        return chunks
+    before = count_tokens(format_context(chunks), model)
+
+    merged = merge_overlapping(chunks)
+    signatures = [minhash(ch.get("text", "")) for ch in merged]
+    unique, signatures = drop_near_duplicates(merged, signatures, dedupe_threshold)
+    ordered = [unique[i] for i in mmr_order(signatures, mmr_lambda)]
+    packed = pack(ordered, budget, model)
+
+    after = count_tokens(format_context(packed), model)
+    context_stats.record(before, after)
+    print(f"🗜️ Context: {before} -> {after} tokens ({len(chunks)} chunks -> {len(packed)})")
+    return packed
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from utils.metrics import span
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join("backend", "embedding_cache", "embeddings.sqlite3")
+)
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "20000"))
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """'  How do I pair Bluetooth?? ' -> 'how do i pair bluetooth'"""
+    text = _WS.sub(" ", str(text)).strip().lower()
+    return text.rstrip("?!. ")
+
+
+def normalize_document(text: str) -> str:
+    # Documents keep their wording; only whitespace is canonicalized.
+    return _WS.sub(" ", str(text)).strip()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function that puts two cache layers in front of another one:
+
+        in-memory LRU  ->  on-disk SQLite store  ->  wrapped embedding function (API)
+
+    Queries (`embed_query`) are normalized so near-identical questions share one
+    vector; documents (`__call__`) are only whitespace-normalized. Vectors are
+    keyed by (model, sha1(text)) so switching models never returns stale vectors.
+    The wrapper reports the wrapped function's name/config, so existing
+    collections keep validating against it.
+    """
+
+    def __init__(
+        self,
+        inner: EmbeddingFunction,
+        model_name: str,
+        path: str = EMBEDDING_CACHE_PATH,
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+    ):
+        self.inner = inner
+        self.model_name = model_name
+        self.path = path
+        self.memory_items = memory_items
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # CHROMA INTERFACE
+    # ------------------------------------------------------------------
+    def __call__(self, input: Documents) -> Embeddings:
+        return self._embed([normalize_document(t) for t in input], is_query=False)
+
+    def embed_query(self, input: Documents) -> Embeddings:
+        return self._embed([normalize_query(t) for t in input], is_query=True)
+
+    def name(self) -> str:
+        return self.inner.name()
+
+    def get_config(self):
+        return self.inner.get_config()
+
+    def is_legacy(self) -> bool:
+        return self.inner.is_legacy()
+
+    def default_space(self):
+        return self.inner.default_space()
+
+    def supported_spaces(self):
+        return self.inner.supported_spaces()
+
+    # ------------------------------------------------------------------
+    # CACHE
+    # ------------------------------------------------------------------
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vec BLOB NOT NULL)"
+            )
+            self._db = db
+        return self._db
+
+    def _remember(self, key: str, vec: np.ndarray):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = vec
+        self._memory_bytes += vec.nbytes
+        while len(self._memory) > self.memory_items:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= old.nbytes
+
+    def _embed(self, texts: list[str], is_query: bool) -> Embeddings:
+        keys = [self._key(t) for t in texts]
+        found: dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+                    self.memory_hits += 1
+
+            lookup = [k for k in dict.fromkeys(keys) if k not in found]
+            if lookup:
+                db = self._connect()
+                for start in range(0, len(lookup), 500):
+                    batch = lookup[start:start + 500]
+                    rows = db.execute(
+                        f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vec
+                        self._remember(key, vec)
+                        self.disk_hits += 1
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            self.misses += len(missing)
+            miss_texts = list(missing.values())
+            with span("embedding"):
+                if is_query and hasattr(self.inner, "embed_query"):
+                    vectors = self.inner.embed_query(input=miss_texts)
+                else:
+                    vectors = self.inner(miss_texts)
+
+            rows = []
+            with self._lock:
+                for key, vec in zip(missing, vectors):
+                    vec = np.asarray(vec, dtype=np.float32)
+                    found[key] = vec
+                    self._remember(key, vec)
+                    rows.append((key, self.model_name, int(vec.shape[0]), vec.tobytes()))
+                db = self._connect()
+                db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+                db.commit()
+
+        return [found[k] for k in keys]
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        disk_bytes = 0
+        for suffix in ("", "-wal"):
+            try:
+                disk_bytes += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return {
+            "model": self.model_name,
+            "memory_items": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,274 @@
+"""
+Embedding provider selection shared by the API and ingestion.
+
+    EMBEDDING_PROVIDER=openai   OpenAI API (default, text-embedding-3-small)
+    EMBEDDING_PROVIDER=local    ONNX sentence-embedding model on the CPU
+                                (all-MiniLM-L6-v2 by default), no network needed
+
+Every collection records the model that produced its vectors in its metadata
+(`embedding_model`); opening a collection with a different model raises
+EmbeddingModelMismatch instead of mixing vectors from two models.
+
+Fetch the default local model once (e.g. while building an offline image):
+    python backend/rag/embedding_provider.py --download
+"""
+import os
+import sys
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils import embedding_functions
+from chromadb.utils.embedding_functions import register_embedding_function
+
+# Make the backend packages importable when run as a script.
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from rag.embedding_cache import CachedEmbeddingFunction
+from utils.tokens import count_tokens
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+DEFAULT_MODELS = {"openai": "text-embedding-3-small", "local": "all-MiniLM-L6-v2"}
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL") or DEFAULT_MODELS.get(EMBEDDING_PROVIDER, "")
+
+# The directory Chroma's own ONNX helper downloads all-MiniLM-L6-v2 into.
+LOCAL_EMBEDDING_MODEL_DIR = os.getenv(
+    "LOCAL_EMBEDDING_MODEL_DIR",
+    str(Path.home() / ".cache" / "chroma" / "onnx_models" / "all-MiniLM-L6-v2" / "onnx"),
+)
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))  # 0 = onnxruntime default
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+LOCAL_EMBEDDING_MAX_LENGTH = 256
+
+# Tokens per input text and per embedding request. Longer inputs are
+# rejected (OpenAI) or truncated (local); the local model has no request limit.
+PROVIDER_LIMITS = {
+    "openai": {"max_input_tokens": 8191, "max_batch_tokens": 300_000},
+    "local": {"max_input_tokens": LOCAL_EMBEDDING_MAX_LENGTH, "max_batch_tokens": None},
+}
+
+MODEL_METADATA_KEY = "embedding_model"
+# Collections created before models were recorded were all embedded with this one.
+LEGACY_MODEL_ID = "text-embedding-3-small"
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    pass
+
+
+@register_embedding_function
+class LocalONNXEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Sentence embeddings from an ONNX model directory (model.onnx + tokenizer.json):
+    batched inference, mean pooling over the attention mask, L2-normalized.
+    Batches are padded to their longest text rather than the maximum length,
+    so short questions are cheap.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = LOCAL_EMBEDDING_MODEL_DIR,
+        threads: int = LOCAL_EMBEDDING_THREADS,
+        batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+        max_length: int = LOCAL_EMBEDDING_MAX_LENGTH,
+    ):
+        self.model_dir = model_dir
+        self.threads = threads
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+        self._lock = threading.Lock()
+        self._session = None
+        self._tokenizer = None
+
+    def _load(self):
+        if self._session is not None:
+            return
+        with self._lock:
+            if self._session is not None:
+                return
+            model_path = os.path.join(self.model_dir, "model.onnx")
+            tokenizer_path = os.path.join(self.model_dir, "tokenizer.json")
+            if not (os.path.exists(model_path) and os.path.exists(tokenizer_path)):
+                raise RuntimeError(
+                    f"Local embedding model not found in {self.model_dir}. "
+                    "Run `python backend/rag/embedding_provider.py --download` or set LOCAL_EMBEDDING_MODEL_DIR."
+                )
+
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(tokenizer_path)
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+            options = ort.SessionOptions()
+            options.log_severity_level = 3
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.threads:
+                options.intra_op_num_threads = self.threads
+            session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+            self._input_names = {i.name for i in session.get_inputs()}
+            self._tokenizer = tokenizer
+            self._session = session
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self._load()
+        vectors = []
+        for start in range(0, len(input), self.batch_size):
+            encoded = self._tokenizer.encode_batch(list(input[start:start + self.batch_size]))
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self._session.run(None, feeds)[0]
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            norms[norms == 0] = 1e-12
+            vectors.extend((pooled / norms).astype(np.float32))
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "local_onnx"
+
+    def default_space(self):
+        return "cosine"
+
+    def supported_spaces(self):
+        return ["cosine", "l2", "ip"]
+
+    @staticmethod
+    def build_from_config(config: dict) -> "LocalONNXEmbeddingFunction":
+        return LocalONNXEmbeddingFunction(
+            model_dir=config.get("model_dir", LOCAL_EMBEDDING_MODEL_DIR),
+            threads=config.get("threads", LOCAL_EMBEDDING_THREADS),
+            batch_size=config.get("batch_size", LOCAL_EMBEDDING_BATCH_SIZE),
+        )
+
+    def get_config(self) -> dict:
+        return {"model_dir": self.model_dir, "threads": self.threads, "batch_size": self.batch_size}
+
+    def validate_config_update(self, old_config: dict, new_config: dict) -> None:
+        # Paths and thread counts may differ between machines.
+        return None
+
+
+def model_id(provider: str = EMBEDDING_PROVIDER, model: str = EMBEDDING_MODEL) -> str:
+    """
+    Identifier recorded per collection and used as the embedding-cache key.
+    OpenAI models keep their bare name so existing caches stay valid.
+    """
+    return model if provider == "openai" else f"{provider}/{model}"
+
+
+def embedding_limits(provider: str = EMBEDDING_PROVIDER) -> dict:
+    """{"max_input_tokens", "max_batch_tokens"} for the provider (None: no limit)."""
+    if provider not in PROVIDER_LIMITS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider!r} (expected 'openai' or 'local')")
+    return PROVIDER_LIMITS[provider]
+
+
+@lru_cache(maxsize=4)
+def _local_tokenizer(model_dir: str):
+    path = os.path.join(model_dir, "tokenizer.json")
+    if not os.path.exists(path):
+        return None
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(path)
+    # Count what would be cut off, too.
+    tokenizer.no_truncation()
+    return tokenizer
+
+
+def count_embedding_tokens(text: str, provider: str = EMBEDDING_PROVIDER, model: str = EMBEDDING_MODEL) -> int:
+    """
+    Tokens `text` takes up in the embedding model: tiktoken for OpenAI, the
+    ONNX model's own tokenizer (special tokens included) for local. Falls
+    back to the tiktoken count while the local model is not downloaded.
+    """
+    if provider == "local":
+        tokenizer = _local_tokenizer(LOCAL_EMBEDDING_MODEL_DIR)
+        if tokenizer is not None:
+            return len(tokenizer.encode(text).ids)
+        return count_tokens(text)
+    return count_tokens(text, model)
+
+
+def make_embedding_function(provider: str = EMBEDDING_PROVIDER, model: str = EMBEDDING_MODEL):
+    """The configured provider behind the shared embedding cache."""
+    if provider == "openai":
+        inner = embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            model_name=model,
+        )
+    elif provider == "local":
+        inner = LocalONNXEmbeddingFunction()
+    else:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider!r} (expected 'openai' or 'local')")
+    return CachedEmbeddingFunction(inner, model_name=model_id(provider, model))
+
+
+def recorded_model(collection) -> str | None:
+    """Model stored on the collection; None for an empty, unrecorded collection."""
+    recorded = (collection.metadata or {}).get(MODEL_METADATA_KEY)
+    if recorded is None and collection.count() > 0:
+        return LEGACY_MODEL_ID
+    return recorded
+
+
+def ensure_collection_model(collection, expected: str):
+    """
+    Records `expected` on a collection that has no model yet, and raises
+    EmbeddingModelMismatch when its vectors came from another model.
+    """
+    recorded = recorded_model(collection)
+    if recorded is not None and recorded != expected:
+        raise EmbeddingModelMismatch(
+            f"Collection `{collection.name}` holds {recorded} vectors but the configured model is {expected}. "
+            "Re-ingest it into a new vector store or switch EMBEDDING_PROVIDER / EMBEDDING_MODEL back."
+        )
+    if (collection.metadata or {}).get(MODEL_METADATA_KEY) != expected:
+        collection.modify(metadata={**(collection.metadata or {}), MODEL_METADATA_KEY: expected})
+
+
+def verify_collection_models(client, expected: str) -> dict[str, str]:
+    """
+    Startup check over every collection in the store: {collection: model}.
+    Raises EmbeddingModelMismatch listing every collection built with another model.
+    """
+    models, mismatched = {}, []
+    for collection in client.list_collections():
+        col = client.get_collection(collection) if isinstance(collection, str) else collection
+        name = col.name
+        models[name] = recorded_model(col)
+        if models[name] is not None and models[name] != expected:
+            mismatched.append(f"{name} ({models[name]})")
+    if mismatched:
+        raise EmbeddingModelMismatch(
+            f"Configured embedding model is {expected}, but these collections were built with another model: "
+            + ", ".join(mismatched)
+        )
+    return models
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--download", action="store_true", help="Download the default local ONNX model")
+    args = parser.parse_args()
+    if args.download:
+        # Chroma ships a verified downloader for all-MiniLM-L6-v2.
+        embedding_functions.ONNXMiniLM_L6_V2()._download_model_if_not_exists()
+        print(f"✅ Model ready in {LOCAL_EMBEDDING_MODEL_DIR}")
+    else:
+        parser.print_help()
@@ -0,0 +1,166 @@
+"""
+Files shared by the per-manual indexes (rag/bm25_index.py, rag/vector_index.py).
+
+Every index is a directory per manual, {root}/{collection_name}/{vehicle_key}/,
+whose meta.json is written last: its mtime marks the index version. The
+indexes only store chunk ids (ids.json, in row order); the chunk texts and
+metadatas live once per manual in the chunk table:
+
+    {CHUNK_STORE_DIR}/{collection_name}/{vehicle_key}/
+        meta.json      chunk count
+        chunks.json    {chunk id: [document, metadata]}
+"""
+import json
+import os
+import shutil
+import threading
+from typing import Callable
+
+DB_DIR = os.path.join("backend", "vector_db")
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR", os.path.join(DB_DIR, "chunks"))
+
+
+def replace_dir(target: str, write_files: Callable[[str], None], meta: dict) -> str:
+    """
+    Writes an index into a temporary directory (`write_files(tmp)`, then
+    meta.json) and swaps it in, so readers never see a half-written index.
+    """
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    write_files(tmp)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    old = target + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(target):
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def write_ids(directory: str, ids: list[str]):
+    with open(os.path.join(directory, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+
+
+def read_json(directory: str, name: str):
+    with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ----------------------------------------------------------------------
+# CHUNK TABLE
+# ----------------------------------------------------------------------
+def chunk_dir(collection_name: str, vehicle_key: str) -> str:
+    return os.path.join(CHUNK_STORE_DIR, collection_name, vehicle_key)
+
+
+def write_chunks(collection_name: str, vehicle_key: str, ids: list[str], documents: list[str], metadatas: list[dict]) -> str:
+    """Writes the manual's chunk table; the indexes look their chunks up in it by id."""
+    table = {cid: [doc, meta] for cid, doc, meta in zip(ids, documents, metadatas)}
+
+    def write_files(tmp: str):
+        with open(os.path.join(tmp, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False)
+
+    return replace_dir(chunk_dir(collection_name, vehicle_key), write_files, {"count": len(table)})
+
+
+def has_chunks(collection_name: str, vehicle_key: str) -> bool:
+    return os.path.exists(os.path.join(chunk_dir(collection_name, vehicle_key), "meta.json"))
+
+
+def remove_chunks(collection_name: str, vehicle_key: str):
+    shutil.rmtree(chunk_dir(collection_name, vehicle_key), ignore_errors=True)
+
+
+class ChunkTable:
+    def __init__(self, path: str):
+        self.path = path
+        self._chunks: dict[str, list] = read_json(path, "chunks.json")
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def get(self, chunk_id: str) -> dict | None:
+        """The chunk as search results carry it; None for an id no longer in the manual."""
+        entry = self._chunks.get(chunk_id)
+        if entry is None:
+            return None
+        doc, meta = entry
+        meta = meta or {}
+        return {
+            "id": chunk_id,
+            "text": doc,
+            "source": meta.get("source", ""),
+            "page": meta.get("page"),
+            "page_end": meta.get("page_end"),
+        }
+
+
+# ----------------------------------------------------------------------
+# STORE
+# ----------------------------------------------------------------------
+class IndexStore:
+    """
+    Loads per-manual index directories lazily and keeps them open; one is
+    reloaded when its meta.json changes (re-ingestion). Thread-safe, since
+    searches run on the RAG thread pool.
+    """
+
+    def __init__(self, root: str, load: Callable[[str], object], stats_key: str):
+        self.root = root
+        self.load = load
+        self.stats_key = stats_key
+        self._lock = threading.Lock()
+        self._indexes: dict[tuple[str, str], tuple[float, object]] = {}
+
+    def get(self, collection_name: str, vehicle_key: str):
+        path = os.path.join(self.root, collection_name, vehicle_key)
+        try:
+            mtime = os.stat(os.path.join(path, "meta.json")).st_mtime
+        except OSError:
+            return None
+
+        key = (collection_name, vehicle_key)
+        cached = self._indexes.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            try:
+                index = self.load(path)
+            except FileNotFoundError:
+                # Written by an older version (no ids.json): treated as missing until rebuilt.
+                return None
+            self._indexes[key] = (mtime, index)
+            return index
+
+    def stats(self) -> dict:
+        return {self.stats_key: len(self._indexes)}
+
+
+chunk_tables = IndexStore(CHUNK_STORE_DIR, ChunkTable, "loaded_chunk_tables")
+
+
+class ManualIndex:
+    """Base of the per-manual indexes: row position -> chunk id -> chunk."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.collection_name = os.path.basename(os.path.dirname(path))
+        self.vehicle_key = os.path.basename(path)
+        self.ids: list[str] = read_json(path, "ids.json")
+
+    def chunks(self, positions) -> list[dict]:
+        """Chunks at `positions`, in order; ids dropped by a re-ingestion in progress are skipped."""
+        table = chunk_tables.get(self.collection_name, self.vehicle_key)
+        if table is None:
+            return []
+        found = (table.get(self.ids[p]) for p in positions)
+        return [chunk for chunk in found if chunk is not None]
@@ -1,51 +1,282 @@
 import os
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import chromadb
-from chromadb.utils import embedding_functions
+from chromadb.errors import NotFoundError
+from rag.bm25_index import BM25Store
+from rag.index_files import chunk_tables
+from rag.manual_usage import ManualUsage
+from rag.vector_collections import CollectionCache, physical_collection, source_filter
+from rag.vector_index import VECTOR_BACKEND, VectorIndexStore
+from rag.embedding_provider import make_embedding_function, model_id, verify_collection_models
+from utils.metrics import span
 
 DB_DIR = os.path.join("backend", "vector_db")
 
-client = chromadb.PersistentClient(path=DB_DIR)
+# Chroma queries and the embedding call are blocking; they run on this pool so
+# the event loop keeps serving other users while one search is in flight.
+RAG_MAX_WORKERS = int(os.getenv("RAG_MAX_WORKERS", "8"))
+_executor = ThreadPoolExecutor(max_workers=RAG_MAX_WORKERS, thread_name_prefix="rag")
 
-embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    model_name="text-embedding-3-small",
-)
+# The Chroma client, the embedding function and the collection handles are
+# created on first use (normally by the startup warm-up, see warmup.py), so
+# importing this module opens nothing and needs no API key.
+_client = None
+_embedding_function = None
+_collection_cache: CollectionCache | None = None
+_init_lock = threading.Lock()
 
-def get_collection(collection_name: str):
-    try:
-        return client.get_collection(
-            name=collection_name,
-            embedding_function=embedding_function,
-        )
-    except Exception:
-        return None
 
-def search_manual(brand: str, vehicle_key: str, question: str, top_k: int = 5):
+def open_retrieval():
     """
-    Searches inside a specific manual for relevant chunks.
+    Opens the vector store and the embedding function once. Refuses to serve
+    collections built with a different embedding model (EmbeddingModelMismatch).
     """
-    collection_name = f"{brand}_manuals"
-    col = get_collection(collection_name)
+    global _client, _embedding_function, _collection_cache
+    if _collection_cache is not None:
+        return
+    with _init_lock:
+        if _collection_cache is not None:
+            return
+        client = chromadb.PersistentClient(path=DB_DIR)
+        # Query embeddings come from the configured provider (EMBEDDING_PROVIDER) and
+        # are cached in memory and on disk; only misses reach the model.
+        embedding_function = make_embedding_function()
+        verify_collection_models(client, model_id())
+        _client, _embedding_function = client, embedding_function
+        # Collection handles are looked up once and reused for every query.
+        _collection_cache = CollectionCache(client, embedding_function)
 
-    if col is None:
-        return []
 
-    result = col.query(
-        query_texts=[question],
-        n_results=top_k,
-        where={"source": vehicle_key},
-    )
+def get_client():
+    open_retrieval()
+    return _client
+
+
+def get_embedding_function():
+    open_retrieval()
+    return _embedding_function
+
+
+def get_collection_cache() -> CollectionCache:
+    open_retrieval()
+    return _collection_cache
+
+
+def embedding_stats() -> dict:
+    return _embedding_function.stats() if _embedding_function is not None else {"loaded": False}
+
+
+# Hybrid retrieval: the manual's BM25 index is queried first. When its best
+# hit clearly beats the runner-up, the embedding call and Chroma query are
+# skipped; otherwise BM25 and vector results are fused with reciprocal rank fusion.
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "1") != "0"
+BM25_FAST_PATH_MIN_SCORE = float(os.getenv("BM25_FAST_PATH_MIN_SCORE", "10.0"))
+BM25_FAST_PATH_MARGIN = float(os.getenv("BM25_FAST_PATH_MARGIN", "1.25"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = 60
+
+bm25_store = BM25Store()
+vector_index_store = VectorIndexStore()
+manual_usage = ManualUsage()
+
+
+class RetrievalStats:
+    """
+    Counts and latency per retrieval path: fast_path, hybrid, vector_only,
+    and bm25_only for manuals that have no vectors.
+    """
+
+    PATHS = ("fast_path", "hybrid", "vector_only", "bm25_only")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {path: 0 for path in self.PATHS}
+        self.seconds = {path: 0.0 for path in self.PATHS}
+
+    def record(self, path: str, started: float):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.counts[path] += 1
+            self.seconds[path] += elapsed
+
+    def stats(self) -> dict:
+        total = sum(self.counts.values())
+        return {
+            "searches": total,
+            **self.counts,
+            "fast_path_ratio": round(self.counts["fast_path"] / total, 3) if total else 0.0,
+            "avg_ms": {
+                path: round(1000 * self.seconds[path] / self.counts[path], 2) if self.counts[path] else None
+                for path in self.PATHS
+            },
+            **bm25_store.stats(),
+            **chunk_tables.stats(),
+            **(_collection_cache.stats() if _collection_cache is not None else {}),
+            "vector_backend": VECTOR_BACKEND,
+            **vector_index_store.stats(),
+            **manual_usage.stats(),
+        }
+
+
+retrieval_stats = RetrievalStats()
+
+
+def is_decisive(lexical: list[tuple[int, float]]) -> bool:
+    """True when the best BM25 hit is strong and clearly ahead of the next one."""
+    if not lexical or lexical[0][1] < BM25_FAST_PATH_MIN_SCORE:
+        return False
+    return len(lexical) == 1 or lexical[0][1] >= BM25_FAST_PATH_MARGIN * lexical[1][1]
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], top_k: int) -> list[dict]:
+    """Merges ranked chunk lists by sum of 1 / (RRF_K + rank)."""
+    scores: dict[str, float] = {}
+    chunks: dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking):
+            scores[chunk["id"]] = scores.get(chunk["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+            chunks.setdefault(chunk["id"], chunk)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [chunks[cid] for cid in best]
+
+
+def get_collection(collection_name: str):
+    return get_collection_cache().get(collection_name)
+
 
+def vector_search(col, vehicle_key: str, question: str, n_results: int):
+    with span("vector_query"):
+        result = col.query(
+            query_texts=[question],
+            n_results=n_results,
+            where=source_filter(vehicle_key),
+        )
+
+    ids = result.get("ids", [[]])[0]
     docs = result.get("documents", [[]])[0]
     metadatas = result.get("metadatas", [[]])[0]
 
     combined = []
-    for doc, meta in zip(docs, metadatas):
+    for chunk_id, doc, meta in zip(ids, docs, metadatas):
         combined.append(
             {
+                "id": chunk_id,
                 "text": doc,
                 "source": meta.get("source", ""),
+                "page": meta.get("page"),
+                "page_end": meta.get("page_end"),
             }
         )
 
     return combined
+
+
+def numpy_search(index, question: str, n_results: int):
+    with span("vector_query"):
+        query = get_embedding_function().embed_query(input=[question])[0]
+        hits = index.search(query, n_results)
+    return index.chunks([position for position, _ in hits])
+
+
+def vector_candidates(collection_name: str, vehicle_key: str, question: str, n_results: int):
+    """Nearest chunks from the configured backend; None when the manual has no vectors."""
+    if VECTOR_BACKEND == "numpy":
+        index = vector_index_store.get(collection_name, vehicle_key)
+        if index is not None and index.model in (None, model_id()):
+            return numpy_search(index, question, n_results)
+        # Not exported yet (or exported with another model): Chroma still has it.
+
+    col_name = physical_collection(collection_name, vehicle_key)
+    col = get_collection(col_name)
+    if col is None:
+        return None
+    try:
+        return vector_search(col, vehicle_key, question, n_results)
+    except NotFoundError:
+        # The collection was deleted or re-created (re-ingest, migration)
+        # since its handle was cached: look it up again once.
+        get_collection_cache().invalidate(col_name)
+        col = get_collection(col_name)
+        if col is None:
+            return None
+        return vector_search(col, vehicle_key, question, n_results)
+
+
+def search_manual(brand: str, vehicle_key: str, question: str, top_k: int = 5):
+    """
+    Searches inside a specific manual for relevant chunks: BM25 fast path
+    when decisive, otherwise BM25 + vector results fused with RRF. Manuals
+    without a BM25 index use the vector search alone. Vectors come from
+    Chroma or, with VECTOR_BACKEND=numpy, from the manual's exact index.
+    """
+    started = time.perf_counter()
+    collection_name = f"{brand}_manuals"
+    manual_usage.record(collection_name, vehicle_key)
+
+    with span("bm25"):
+        index = bm25_store.get(collection_name, vehicle_key) if HYBRID_SEARCH_ENABLED else None
+        lexical = index.search(question, max(top_k, HYBRID_CANDIDATES)) if index else []
+    if is_decisive(lexical):
+        retrieval_stats.record("fast_path", started)
+        return index.chunks([position for position, _ in lexical[:top_k]])
+
+    vector = vector_candidates(collection_name, vehicle_key, question, HYBRID_CANDIDATES if lexical else top_k)
+    if vector is None:
+        retrieval_stats.record("bm25_only", started)
+        return index.chunks([position for position, _ in lexical[:top_k]])
+
+    if not lexical:
+        retrieval_stats.record("vector_only", started)
+        return vector
+
+    combined = reciprocal_rank_fusion([index.chunks([p for p, _ in lexical]), vector], top_k)
+    retrieval_stats.record("hybrid", started)
+    return combined
+
+
+def preload_manual(collection_name: str, vehicle_key: str) -> list[str]:
+    """
+    Loads what a search of this manual touches, so its first search does
+    not read indexes from disk: the BM25 index, the chunk table, the
+    exported vector index (its pages pulled into the page cache) and the
+    Chroma collection, whose HNSW segment is loaded by one query with a
+    stored vector. Returns what was loaded.
+    """
+    loaded = []
+    if bm25_store.get(collection_name, vehicle_key) is not None:
+        loaded.append("bm25")
+    if chunk_tables.get(collection_name, vehicle_key) is not None:
+        loaded.append("chunks")
+    if VECTOR_BACKEND == "numpy":
+        index = vector_index_store.get(collection_name, vehicle_key)
+        if index is not None:
+            index.vectors.sum()
+            loaded.append("vector_index")
+            return loaded
+
+    col = get_collection(physical_collection(collection_name, vehicle_key))
+    if col is not None:
+        where = source_filter(vehicle_key)
+        sample = col.get(where=where, limit=1, include=["embeddings"])
+        if sample["ids"]:
+            col.query(query_embeddings=[sample["embeddings"][0]], n_results=1, where=where)
+            loaded.append("chroma")
+    return loaded
+
+
+async def search_manual_async(brand: str, vehicle_key: str, question: str, top_k: int = 5):
+    """
+    Non-blocking `search_manual` for request handlers.
+    """
+    loop = asyncio.get_running_loop()
+    # Copy the context so timing spans inside the search land on this request.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor,
+        partial(context.run, search_manual, brand, vehicle_key, question, top_k),
+    )
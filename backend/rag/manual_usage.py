@@ -0,0 +1,106 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+from collections import Counter
+
+# Searches per manual, kept across restarts so the startup warm-up can
+# preload the manuals customers ask about most. Every worker adds its own
+# searches to the shared file, every MANUAL_USAGE_SAVE_INTERVAL seconds and
+# at shutdown.
+MANUAL_USAGE_PATH = os.getenv("MANUAL_USAGE_PATH", os.path.join("backend", "state", "manual_usage.json"))
+MANUAL_USAGE_SAVE_INTERVAL = float(os.getenv("MANUAL_USAGE_SAVE_INTERVAL", "300"))
+
+
+class ManualUsage:
+    """
+    Search counts per (collection, manual key); saved as JSON. A save adds
+    the searches recorded since the previous one to the counts on disk,
+    under a file lock, so workers sharing the file do not overwrite each
+    other.
+    """
+
+    def __init__(self, path: str = MANUAL_USAGE_PATH, save_interval: float = MANUAL_USAGE_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+        # Searches recorded by this process and not saved yet.
+        self._pending: Counter = Counter()
+        self._saver: asyncio.Task | None = None
+        self.load()
+
+    def _read(self) -> Counter:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return Counter()
+        return Counter({(row["collection"], row["vehicle_key"]): int(row["searches"]) for row in rows})
+
+    def load(self):
+        counts = self._read()
+        with self._lock:
+            self._counts = counts + self._pending
+
+    def record(self, collection_name: str, vehicle_key: str):
+        with self._lock:
+            self._counts[(collection_name, vehicle_key)] += 1
+            self._pending[(collection_name, vehicle_key)] += 1
+
+    def top(self, n: int) -> list[tuple[str, str]]:
+        """The `n` most searched (collection, manual key) pairs, most searched first."""
+        with self._lock:
+            return [key for key, _ in self._counts.most_common(n)]
+
+    def save(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, Counter()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        try:
+            with open(self.path + ".lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                counts = self._read() + pending
+                rows = [
+                    {"collection": collection, "vehicle_key": key, "searches": count}
+                    for (collection, key), count in counts.most_common()
+                ]
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(rows, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        # The file now holds every worker's searches: rank by those.
+        with self._lock:
+            self._counts = counts + self._pending
+
+    async def _save_loop(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            try:
+                await asyncio.to_thread(self.save)
+            except Exception as e:
+                print(f"⚠️ Saving manual usage failed: {e}")
+
+    async def start(self):
+        if self._saver is None and self.save_interval > 0:
+            self._saver = asyncio.create_task(self._save_loop())
+
+    async def close(self):
+        if self._saver is not None:
+            self._saver.cancel()
+            try:
+                await self._saver
+            except asyncio.CancelledError:
+                pass
+            self._saver = None
+        self.save()
+
+    def stats(self) -> dict:
+        return {"tracked_manuals": len(self._counts), "unsaved_searches": sum(self._pending.values())}
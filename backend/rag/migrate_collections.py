@@ -0,0 +1,132 @@
+"""
+Moves stored manual chunks between vector store layouts (VECTOR_STORE_LAYOUT),
+copying the stored vectors, so nothing is re-embedded:
+
+    brand   one `{brand}_manuals` collection per brand, filtered by `source`
+    manual  one collection per manual key
+
+Run from the repo root with the API stopped, then set VECTOR_STORE_LAYOUT to
+the new layout before starting it again:
+    python backend/rag/migrate_collections.py --to manual --dry-run
+    python backend/rag/migrate_collections.py --to manual
+    python backend/rag/migrate_collections.py --to brand --keep-source
+
+Each source collection is deleted only after every chunk has been copied and
+the target counts match. BM25 indexes are keyed by manual, not by collection,
+and need no migration.
+"""
+import argparse
+import os
+import sys
+
+# Make the backend packages importable when run as a script.
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+import chromadb
+
+from rag.embedding_provider import MODEL_METADATA_KEY, make_embedding_function, recorded_model
+from rag.vector_collections import (
+    BRAND_COLLECTION_KEY, LAYOUTS, brand_collection_of, collection_metadata, physical_collection,
+)
+
+DB_DIR = os.path.join("backend", "vector_db")
+PAGE_SIZE = 1000
+
+
+def source_collections(client, target_layout: str) -> list:
+    """Collections still in the other layout."""
+    found = []
+    for collection in client.list_collections():
+        col = client.get_collection(collection) if isinstance(collection, str) else collection
+        is_manual = BRAND_COLLECTION_KEY in (col.metadata or {})
+        if (target_layout == "manual") != is_manual:
+            found.append(col)
+    return found
+
+
+def read_pages(col, page_size: int = PAGE_SIZE):
+    offset = 0
+    while True:
+        page = col.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def migrate_collection(client, embedding_function, col, target_layout: str, dry_run: bool) -> dict[str, int]:
+    """Copies `col` into the `target_layout` collections; returns {target: chunks copied}."""
+    brand_collection = brand_collection_of(col)
+    model = recorded_model(col)
+    batch_size = min(PAGE_SIZE, client.get_max_batch_size())
+    targets: dict[str, object] = {}
+    copied: dict[str, int] = {}
+
+    for page in read_pages(col, batch_size):
+        by_target: dict[str, list[int]] = {}
+        for i, meta in enumerate(page["metadatas"]):
+            source = (meta or {}).get("source", "")
+            by_target.setdefault(physical_collection(brand_collection, source, target_layout), []).append(i)
+
+        for name, positions in by_target.items():
+            copied[name] = copied.get(name, 0) + len(positions)
+            if dry_run:
+                continue
+            target = targets.get(name)
+            if target is None:
+                source = page["metadatas"][positions[0]]["source"]
+                metadata = collection_metadata(brand_collection, source, target_layout)
+                if model:
+                    metadata[MODEL_METADATA_KEY] = model
+                target = targets[name] = client.get_or_create_collection(
+                    name=name, embedding_function=embedding_function, metadata=metadata or None
+                )
+            target.upsert(
+                ids=[page["ids"][i] for i in positions],
+                embeddings=[page["embeddings"][i] for i in positions],
+                documents=[page["documents"][i] for i in positions],
+                metadatas=[page["metadatas"][i] for i in positions],
+            )
+    return copied
+
+
+def migrate(target_layout: str, dry_run: bool = False, keep_source: bool = False):
+    client = chromadb.PersistentClient(path=DB_DIR)
+    embedding_function = make_embedding_function()
+
+    sources = source_collections(client, target_layout)
+    if not sources:
+        print(f"✅ Every collection already uses the `{target_layout}` layout.")
+        return
+
+    for col in sources:
+        total = col.count()
+        print(f"📦 {col.name}: {total} chunks -> {target_layout} layout")
+        copied = migrate_collection(client, embedding_function, col, target_layout, dry_run)
+        for name, count in sorted(copied.items()):
+            print(f"   {'would copy' if dry_run else 'copied'} {count:>6} -> {name}")
+        if dry_run:
+            continue
+
+        short = [name for name, count in copied.items() if client.get_collection(name).count() < count]
+        if sum(copied.values()) != total or short:
+            print(f"   ❌ Copy incomplete ({', '.join(short) or 'chunk count differs'}); keeping `{col.name}`.")
+            continue
+        if keep_source:
+            continue
+        client.delete_collection(col.name)
+        print(f"   🗑️  Deleted `{col.name}`")
+
+    if not dry_run:
+        print(f"✅ Done. Set VECTOR_STORE_LAYOUT={target_layout} and restart the API.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--to", choices=LAYOUTS, required=True, help="Target layout")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be copied")
+    parser.add_argument("--keep-source", action="store_true", help="Keep the old collections after copying")
+    args = parser.parse_args()
+    migrate(args.to, dry_run=args.dry_run, keep_source=args.keep_source)
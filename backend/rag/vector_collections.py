@@ -0,0 +1,100 @@
+import hashlib
+import os
+import re
+import threading
+
+# How manual chunks are laid out in Chroma:
+#   brand   one `{brand}_manuals` collection, queries filter on `source`
+#   manual  one collection per manual key, so the HNSW search only visits
+#           that manual's vectors (python backend/rag/migrate_collections.py)
+VECTOR_STORE_LAYOUT = os.getenv("VECTOR_STORE_LAYOUT", "brand").lower()
+LAYOUTS = ("brand", "manual")
+if VECTOR_STORE_LAYOUT not in LAYOUTS:
+    raise ValueError(f"Unsupported VECTOR_STORE_LAYOUT: {VECTOR_STORE_LAYOUT!r} (expected brand or manual)")
+
+# Metadata recorded on per-manual collections, so tools can map them back.
+BRAND_COLLECTION_KEY = "brand_collection"
+VEHICLE_KEY_KEY = "vehicle_key"
+
+_UNSAFE = re.compile(r"[^a-zA-Z0-9_-]+")
+
+
+def manual_collection_name(brand_collection: str, vehicle_key: str) -> str:
+    """
+    'porsche_manuals', 'Porsche_911 (2023)' -> 'porsche_manuals__Porsche_911_2023_-1a2b3c4d'.
+    The hash keeps keys distinct that only differ in characters Chroma rejects.
+    """
+    slug = _UNSAFE.sub("_", vehicle_key).strip("_-")[:180]
+    digest = hashlib.sha1(vehicle_key.encode("utf-8")).hexdigest()[:8]
+    return f"{brand_collection}__{slug}-{digest}"
+
+
+def physical_collection(brand_collection: str, vehicle_key: str, layout: str = VECTOR_STORE_LAYOUT) -> str:
+    """Name of the Chroma collection holding `vehicle_key`'s chunks."""
+    if layout == "manual":
+        return manual_collection_name(brand_collection, vehicle_key)
+    return brand_collection
+
+
+def source_filter(vehicle_key: str, layout: str = VECTOR_STORE_LAYOUT) -> dict | None:
+    """`where` clause for queries; per-manual collections need none."""
+    return None if layout == "manual" else {"source": vehicle_key}
+
+
+def collection_metadata(brand_collection: str, vehicle_key: str, layout: str = VECTOR_STORE_LAYOUT) -> dict:
+    if layout == "manual":
+        return {BRAND_COLLECTION_KEY: brand_collection, VEHICLE_KEY_KEY: vehicle_key}
+    return {}
+
+
+def brand_collection_of(collection) -> str:
+    """Logical `{brand}_manuals` name of a brand or per-manual collection."""
+    return (collection.metadata or {}).get(BRAND_COLLECTION_KEY) or collection.name
+
+
+class CollectionCache:
+    """
+    Collection handles kept for the life of the process, so queries skip the
+    `get_collection` round trip. Missing collections are not cached (ingestion
+    may create them later); `invalidate` drops handles after a collection was
+    deleted or re-created.
+    """
+
+    def __init__(self, client, embedding_function):
+        self.client = client
+        self.embedding_function = embedding_function
+        self._handles: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str):
+        col = self._handles.get(name)
+        if col is not None:
+            self.hits += 1
+            return col
+        with self._lock:
+            col = self._handles.get(name)
+            if col is None:
+                try:
+                    col = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+                except Exception:
+                    return None
+                self._handles[name] = col
+            self.misses += 1
+            return col
+
+    def invalidate(self, name: str | None = None):
+        with self._lock:
+            if name is None:
+                self._handles.clear()
+            else:
+                self._handles.pop(name, None)
+
+    def stats(self) -> dict:
+        return {
+            "layout": VECTOR_STORE_LAYOUT,
+            "cached_collections": len(self._handles),
+            "handle_hits": self.hits,
+            "handle_misses": self.misses,
+        }
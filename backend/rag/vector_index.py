@@ -0,0 +1,204 @@
+"""
+Per-manual exact vector index: the manual's chunk embeddings as one
+contiguous, L2-normalized matrix in a .npy file, memory-mapped at query time.
+
+Layout (one directory per manual):
+    {VECTOR_INDEX_DIR}/{collection_name}/{vehicle_key}/
+        meta.json      count, dim, dtype, embedding model
+        vectors.npy    (count, dim) float32, float16 or int8
+        scales.npy     float32 per-row scale (int8 only)
+        ids.json       chunk ids, in row order
+
+Chunk texts are read from the manual's chunk table (rag/index_files.py).
+
+A query is one matrix-vector product plus `argpartition`, so results are
+exact (no HNSW recall loss). The files are opened read-only with mmap, so
+every uvicorn worker on the host shares one copy in the OS page cache.
+
+Export every manual already stored in Chroma (VECTOR_BACKEND=numpy then
+serves queries from these files):
+    python backend/rag/vector_index.py --export --dtype float16
+"""
+import os
+import shutil
+import sys
+
+import numpy as np
+
+if __name__ == "__main__":
+    # Make the backend packages importable when run as a script.
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag.index_files import DB_DIR, IndexStore, ManualIndex, has_chunks, read_json, replace_dir, write_chunks, write_ids
+
+# chroma: query the Chroma collections. numpy: query the exported .npy
+# indexes (manuals without one fall back to Chroma).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(DB_DIR, "vectors"))
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+DTYPES = ("float32", "float16", "int8")
+# Rows scored per matrix product; bounds the temporary float32 copy made
+# for float16/int8 matrices.
+BLOCK_ROWS = 1024
+
+
+def index_dir(collection_name: str, vehicle_key: str) -> str:
+    return os.path.join(VECTOR_INDEX_DIR, collection_name, vehicle_key)
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# ----------------------------------------------------------------------
+# BUILD
+# ----------------------------------------------------------------------
+def build_index(
+    collection_name: str,
+    vehicle_key: str,
+    ids: list[str],
+    embeddings,
+    dtype: str = VECTOR_INDEX_DTYPE,
+    model: str | None = None,
+) -> str:
+    """
+    Writes the vector index for one manual and returns its directory.
+    The directory is replaced atomically, so readers never see a half-written index.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported vector index dtype: {dtype!r} (expected one of {', '.join(DTYPES)})")
+    vectors = normalize(embeddings).reshape(len(ids), -1)
+
+    def write_files(tmp: str):
+        if dtype == "int8":
+            # Symmetric per-row quantization: row ~= int8 row * scale.
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            np.save(os.path.join(tmp, "vectors.npy"), np.round(vectors / scales[:, None]).astype(np.int8))
+            np.save(os.path.join(tmp, "scales.npy"), scales.astype(np.float32))
+        else:
+            np.save(os.path.join(tmp, "vectors.npy"), vectors.astype(dtype))
+        write_ids(tmp, ids)
+
+    meta = {"count": len(ids), "dim": int(vectors.shape[1]) if len(ids) else 0, "dtype": dtype, "model": model}
+    return replace_dir(index_dir(collection_name, vehicle_key), write_files, meta)
+
+
+def has_index(collection_name: str, vehicle_key: str) -> bool:
+    # Indexes written before the chunk table existed have no ids.json.
+    path = index_dir(collection_name, vehicle_key)
+    return (
+        os.path.exists(os.path.join(path, "meta.json"))
+        and os.path.exists(os.path.join(path, "ids.json"))
+        and has_chunks(collection_name, vehicle_key)
+    )
+
+
+def remove_index(collection_name: str, vehicle_key: str):
+    shutil.rmtree(index_dir(collection_name, vehicle_key), ignore_errors=True)
+
+
+def export_manual(col, collection_name: str, vehicle_key: str, ids: list[str] | None = None, **kwargs) -> str:
+    """
+    Builds the index for one manual from the vectors already stored in Chroma;
+    writes the chunk table too when the manual has none yet.
+    """
+    from rag.vector_collections import source_filter
+
+    if ids is None:
+        data = col.get(where=source_filter(vehicle_key), include=["embeddings", "documents", "metadatas"])
+        ids = data["ids"]
+        rows = range(len(ids))
+    else:
+        data = col.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+        # Chroma does not keep the requested order.
+        position = {cid: i for i, cid in enumerate(data["ids"])}
+        ids = [cid for cid in ids if cid in position]
+        rows = [position[cid] for cid in ids]
+    if not has_chunks(collection_name, vehicle_key):
+        write_chunks(
+            collection_name, vehicle_key, ids, [data["documents"][i] for i in rows], [data["metadatas"][i] for i in rows]
+        )
+    return build_index(
+        collection_name,
+        vehicle_key,
+        ids,
+        np.asarray([data["embeddings"][i] for i in rows], dtype=np.float32),
+        **kwargs,
+    )
+
+
+# ----------------------------------------------------------------------
+# QUERY
+# ----------------------------------------------------------------------
+class VectorIndex(ManualIndex):
+    def __init__(self, path: str):
+        super().__init__(path)
+        meta = read_json(path, "meta.json")
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.dtype = meta["dtype"]
+        self.model = meta.get("model")
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if self.dtype == "int8" else None
+
+    def scores(self, query) -> np.ndarray:
+        """Cosine similarity of `query` with every chunk."""
+        query = normalize(query).reshape(-1)
+        if self.dtype == "float32" and self.count <= BLOCK_ROWS:
+            return self.vectors @ query
+        out = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def search(self, query, top_k: int) -> list[tuple[int, float]]:
+        """(chunk position, cosine similarity) pairs, best first."""
+        if not self.count:
+            return []
+        scores = self.scores(query)
+        k = min(top_k, self.count)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+class VectorIndexStore(IndexStore):
+    """Open vector indexes, reloaded when a manual is re-ingested or re-exported."""
+
+    def __init__(self, root: str = VECTOR_INDEX_DIR):
+        super().__init__(root, VectorIndex, "loaded_vector_indexes")
+
+
+def export_from_chroma(dtype: str = VECTOR_INDEX_DTYPE):
+    """Builds an index for every manual already stored in Chroma."""
+    import chromadb
+    from rag.embedding_provider import recorded_model
+    from rag.vector_collections import brand_collection_of
+
+    client = chromadb.PersistentClient(path=DB_DIR)
+    for collection in client.list_collections():
+        name = collection if isinstance(collection, str) else collection.name
+        col = client.get_collection(name)
+        brand_collection = brand_collection_of(col)
+        sources = {(meta or {}).get("source", "") for meta in col.get(include=["metadatas"])["metadatas"]}
+        for source in sorted(sources):
+            path = export_manual(col, brand_collection, source, dtype=dtype, model=recorded_model(col))
+            size = os.path.getsize(os.path.join(path, "vectors.npy"))
+            print(f"   ✅ Vector index: {brand_collection}/{source} ({dtype}, {size / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--export", action="store_true", help="Export every manual from the Chroma collections")
+    parser.add_argument("--dtype", choices=DTYPES, default=VECTOR_INDEX_DTYPE)
+    args = parser.parse_args()
+    if args.export:
+        export_from_chroma(args.dtype)
+    else:
+        parser.print_help()
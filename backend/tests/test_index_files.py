@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag import bm25_index, index_files, vector_index
+from rag.index_files import ChunkTable, IndexStore
+
+IDS = ["911_a", "911_b", "911_c"]
+DOCS = ["Tire pressure is 2.5 bar", "Oil change every 15000 km", "Press PSM off to disable traction"]
+METAS = [{"source": "911", "page": 10}, {"source": "911", "page": 42}, {"source": "911", "page": 77}]
+
+
+def use_tmp_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_files, "CHUNK_STORE_DIR", str(tmp_path / "chunks"))
+    monkeypatch.setattr(index_files, "chunk_tables", IndexStore(str(tmp_path / "chunks"), ChunkTable, "loaded_chunk_tables"))
+    monkeypatch.setattr(bm25_index, "BM25_INDEX_DIR", str(tmp_path / "bm25"))
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_DIR", str(tmp_path / "vectors"))
+
+
+def test_both_indexes_read_chunks_from_the_chunk_table(tmp_path, monkeypatch):
+    use_tmp_dirs(tmp_path, monkeypatch)
+    index_files.write_chunks("porsche_manuals", "911", IDS, DOCS, METAS)
+    bm25 = bm25_index.BM25Index(bm25_index.build_index("porsche_manuals", "911", IDS, DOCS))
+    vectors = vector_index.VectorIndex(vector_index.build_index("porsche_manuals", "911", IDS, np.eye(3)))
+
+    lexical = bm25.chunks([p for p, _ in bm25.search("oil change", 1)])
+    nearest = vectors.chunks([p for p, _ in vectors.search([0, 0, 1], 1)])
+    assert lexical == [{"id": "911_b", "text": DOCS[1], "source": "911", "page": 42, "page_end": None}]
+    assert nearest[0]["text"] == DOCS[2]
+    assert not os.path.exists(os.path.join(bm25.path, "chunks.json"))
+    assert bm25_index.has_index("porsche_manuals", "911") and vector_index.has_index("porsche_manuals", "911")
+
+
+def test_chunks_dropped_by_a_reingestion_are_skipped(tmp_path, monkeypatch):
+    use_tmp_dirs(tmp_path, monkeypatch)
+    index_files.write_chunks("porsche_manuals", "911", IDS, DOCS, METAS)
+    bm25 = bm25_index.BM25Index(bm25_index.build_index("porsche_manuals", "911", IDS, DOCS))
+    index_files.write_chunks("porsche_manuals", "911", IDS[1:], DOCS[1:], METAS[1:])
+    assert [chunk["id"] for chunk in bm25.chunks([0, 1, 2])] == ["911_b", "911_c"]
+
+
+def test_index_without_ids_counts_as_missing(tmp_path, monkeypatch):
+    use_tmp_dirs(tmp_path, monkeypatch)
+    path = bm25_index.build_index("porsche_manuals", "911", IDS, DOCS)
+    os.remove(os.path.join(path, "ids.json"))
+    assert bm25_index.BM25Store(str(tmp_path / "bm25")).get("porsche_manuals", "911") is None
+    assert not bm25_index.has_index("porsche_manuals", "911")
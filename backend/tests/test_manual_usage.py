@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag.manual_usage import ManualUsage
+
+
+def test_workers_add_their_searches_to_the_shared_file(tmp_path):
+    path = str(tmp_path / "manual_usage.json")
+    first, second = ManualUsage(path, save_interval=0), ManualUsage(path, save_interval=0)
+    first.record("porsche_manuals", "911")
+    first.record("porsche_manuals", "911")
+    second.record("porsche_manuals", "911")
+    second.record("porsche_manuals", "taycan")
+
+    first.save()
+    second.save()
+    second.save()
+
+    with open(path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    assert rows == [
+        {"collection": "porsche_manuals", "vehicle_key": "911", "searches": 3},
+        {"collection": "porsche_manuals", "vehicle_key": "taycan", "searches": 1},
+    ]
+    assert second.top(1) == [("porsche_manuals", "911")]
+    assert ManualUsage(path).stats() == {"tracked_manuals": 2, "unsaved_searches": 0}
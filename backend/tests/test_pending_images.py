@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import images
+
+PHOTO = {"bytes": b"jpeg bytes", "mime": "image/jpeg", "sha256": "abc123"}
+
+
+def test_sessions_parking_the_same_photo_get_their_own_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "PENDING_IMAGE_DIR", str(tmp_path))
+    first = images.save_pending_image(PHOTO, "session-1")
+    second = images.save_pending_image(PHOTO, "session-2")
+    assert first["path"] != second["path"]
+
+    images.discard_pending_image(first)
+    assert images.load_pending_image(first) is None
+    assert images.load_pending_image(second)["bytes"] == PHOTO["bytes"]
+
+
+def test_session_id_cannot_escape_the_image_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "PENDING_IMAGE_DIR", str(tmp_path))
+    ref = images.save_pending_image(PHOTO, "../../etc/passwd")
+    assert os.path.dirname(ref["path"]) == str(tmp_path)
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.session_store import MemorySessionStore, SessionStore
+
+
+def parked(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"jpeg")
+    return {"pending_image": {"path": str(path), "mime": "image/jpeg", "sha256": name, "bytes": 4}}
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_evicted_session_discards_its_image(tmp_path):
+    async def scenario():
+        store = MemorySessionStore(max_entries=1, sweep_interval=0)
+        first = parked(tmp_path, "a")
+        await store.save("a", first)
+        await store.save("a", first)
+        assert os.path.exists(first["pending_image"]["path"])
+
+        await store.save("b", parked(tmp_path, "b"))
+        assert not os.path.exists(first["pending_image"]["path"])
+        assert store.evictions == 1
+
+    asyncio.run(scenario())
+
+
+def test_expired_session_discards_its_image(tmp_path):
+    async def scenario():
+        store = MemorySessionStore(ttl=-1, sweep_interval=0)
+        swept, loaded = parked(tmp_path, "a"), parked(tmp_path, "b")
+        await store.save("a", swept)
+        await store.save("b", loaded)
+
+        assert await store.load("b") is None
+        assert not os.path.exists(loaded["pending_image"]["path"])
+        assert await store.sweep() == 1
+        assert not os.path.exists(swept["pending_image"]["path"])
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data_ingestion", "manual_ingest")))
+
+from structured_chunker import chunk_structured
+
+
+def line(text, y, size=10.0):
+    return {"text": text, "size": size, "bold": False, "bullet": False, "y0": y, "y1": y + size}
+
+
+def page(number, heading, paragraph):
+    return (number, [line(heading, 50, size=14.0), line(paragraph, 80)])
+
+
+def long_paragraph(sentences):
+    return " ".join(f"Sentence {i} explains how the adaptive air suspension levels the body." for i in range(sentences))
+
+
+def chunk_for(chunks, marker):
+    return next(ch for ch in chunks if marker in ch["text"])
+
+
+def test_small_section_before_oversized_keeps_its_page_and_section():
+    pages = [
+        page(5, "Big Heading", "Small note on page five."),
+        page(6, "Huge Section", long_paragraph(80)),
+        page(7, "Tail Heading", long_paragraph(3)),
+    ]
+    chunks = chunk_structured(pages, max_tokens=300)
+
+    small = chunk_for(chunks, "Small note on page five.")
+    assert (small["page"], small["page_end"], small["section"]) == (5, 5, "Big Heading")
+    assert "Tail Heading" not in small["text"]
+    assert all(ch["page"] == 6 for ch in chunks if "Huge Section" in ch["text"])
+    assert chunk_for(chunks, "Tail Heading")["page"] == 7
+
+
+def test_small_section_is_prepended_to_the_next_section_with_its_pages():
+    pages = [
+        page(5, "Big Heading", "Small note on page five."),
+        page(7, "Tail Heading", long_paragraph(3)),
+    ]
+    chunks = chunk_structured(pages, max_tokens=300)
+
+    assert len(chunks) == 1
+    assert chunks[0]["text"].startswith("Big Heading\nSmall note on page five.\nTail Heading\n")
+    assert (chunks[0]["page"], chunks[0]["page_end"]) == (5, 7)
+    assert chunks[0]["section"] == "Big Heading / Tail Heading"
+
+
+def test_trailing_small_section_keeps_its_page():
+    pages = [
+        page(4, "Long Section", long_paragraph(5)),
+        page(9, "Last Heading", "Short closing note."),
+    ]
+    chunks = chunk_structured(pages, max_tokens=300)
+
+    last = chunk_for(chunks, "Short closing note.")
+    assert (last["page"], last["page_end"], last["section"]) == (9, 9, "Last Heading")
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.ttl_cache import AsyncTTLCache
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60, max_entries=10)
+        release = asyncio.Event()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "value"
+
+        leader = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await waiter == "value"
+        assert leader.cancelled()
+        assert calls == 1
+        assert cache.get("k") == "value"
+
+    asyncio.run(scenario())
+
+
+def test_waiters_get_the_loader_exception():
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60, max_entries=10)
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            raise ValueError("upstream down")
+
+        leader = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(ValueError, match="upstream down"):
+            await waiter
+        assert cache.get("k") is None
+
+    asyncio.run(scenario())
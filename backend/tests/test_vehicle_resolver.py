@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from agent import VehicleResolver
+
+FLEET = [
+    {"vehicleId": "60039", "brand": "Porsche", "model": "Cayenne", "year": "2011", "vin": "WP1ZZZ92ZBLA234821"},
+    {"vehicleId": "60040", "brand": "Skoda", "model": "Octavia", "year": "2019", "vin": "TMBJJ7NE5K0117733"},
+    {"vehicleId": "60041", "brand": "Audi", "model": "Q7", "year": "2023", "vin": "WAUZZZ4M0PD009152"},
+]
+
+
+def picked(message):
+    return VehicleResolver(FLEET).resolve(message).get("vehicleId")
+
+
+def test_baseline_steps_win_over_vin_tails():
+    assert picked("older 117733") == "60039"
+    assert picked("the 2023 one, vin ending 234821") == "60041"
+    assert picked("234821 octavia") == "60040"
+
+
+def test_first_and_second_still_match_inside_words():
+    assert picked("secondhand one") == "60040"
+    assert picked("firstly, the tyres") == "60039"
+
+
+def test_vins_and_later_ordinals_resolve_when_nothing_else_does():
+    assert picked("vin wauzzz4m0pd009152") == "60041"
+    assert picked("the one ending 117733") == "60040"
+    assert picked("the third one") == "60041"
+    assert picked("the last one") == "60041"
+    assert picked("hello") is None
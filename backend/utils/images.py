@@ -0,0 +1,193 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1536"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+PENDING_IMAGE_DIR = os.getenv("PENDING_IMAGE_DIR", os.path.join(tempfile.gettempdir(), "car-assistant-images"))
+PENDING_IMAGE_TTL_SECONDS = int(os.getenv("PENDING_IMAGE_TTL_SECONDS", "900"))
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+READ_CHUNK = 64 * 1024
+# Recently processed uploads, keyed by the hash of the original bytes, so a
+# re-sent photo is not decoded and re-encoded again.
+RECENT_IMAGES = 64
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+async def read_upload(upload, max_bytes: int = IMAGE_MAX_UPLOAD_BYTES) -> bytes:
+    """Reads an UploadFile in chunks, stopping as soon as it exceeds `max_bytes`."""
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLarge(f"Image is larger than {max_bytes / (1024 * 1024):.1f} MB")
+    parts, total = [], 0
+    while chunk := await upload.read(READ_CHUNK):
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImageTooLarge(f"Image is larger than {max_bytes / (1024 * 1024):.1f} MB")
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+class ImageProcessor:
+    """
+    Decode -> apply EXIF orientation -> downscale to `max_edge` -> re-encode
+    without metadata at `quality`. Results are dicts:
+        {"bytes", "mime", "sha256", "width", "height", "original_bytes"}
+    `sha256` is the hash of the processed bytes (dedupe key for pending images).
+    """
+
+    def __init__(self, max_edge: int = IMAGE_MAX_EDGE, fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY):
+        if fmt not in MIME_TYPES:
+            raise ValueError(f"Unsupported IMAGE_FORMAT: {fmt!r} (expected JPEG or WEBP)")
+        self.max_edge = max_edge
+        self.fmt = fmt
+        self.quality = quality
+        self._recent: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.images = 0
+        self.deduplicated = 0
+        self.original_bytes = 0
+        self.processed_bytes = 0
+
+    def process(self, data: bytes) -> dict:
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            cached = self._recent.get(key)
+            if cached is not None:
+                self._recent.move_to_end(key)
+                self.deduplicated += 1
+                return cached
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            image = ImageOps.exif_transpose(image)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            raise InvalidImage(f"Could not read image: {e}")
+
+        if image.mode not in ("RGB", "L"):
+            # JPEG has no alpha channel: flatten transparent images onto white.
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        image.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS)
+
+        out = io.BytesIO()
+        # Saving without exif=... drops EXIF (GPS, device) metadata.
+        image.save(out, format=self.fmt, quality=self.quality, optimize=True)
+        encoded = out.getvalue()
+
+        result = {
+            "bytes": encoded,
+            "mime": MIME_TYPES[self.fmt],
+            "sha256": hashlib.sha256(encoded).hexdigest(),
+            "width": image.width,
+            "height": image.height,
+            "original_bytes": len(data),
+        }
+        with self._lock:
+            self.images += 1
+            self.original_bytes += len(data)
+            self.processed_bytes += len(encoded)
+            self._recent[key] = result
+            while len(self._recent) > RECENT_IMAGES:
+                self._recent.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "images": self.images,
+            "deduplicated": self.deduplicated,
+            "original_bytes": self.original_bytes,
+            "processed_bytes": self.processed_bytes,
+            "bytes_saved": self.original_bytes - self.processed_bytes,
+            "max_edge": self.max_edge,
+            "format": self.fmt,
+            "quality": self.quality,
+        }
+
+
+image_processor = ImageProcessor()
+
+
+# ----------------------------------------------------------------------
+# PENDING IMAGES (parked while the customer picks a vehicle)
+# ----------------------------------------------------------------------
+_last_sweep = 0.0
+
+
+def sweep_pending_images(max_age: float = PENDING_IMAGE_TTL_SECONDS) -> int:
+    """Deletes parked images older than `max_age`; returns how many were removed."""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(PENDING_IMAGE_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def save_pending_image(image: dict, session_id: str) -> dict:
+    """
+    Writes processed image bytes to a temp file named by session and content
+    hash and returns a small JSON-serializable reference for the session.
+    Two sessions parking the same photo get separate files, so one
+    discarding its copy never removes the other's.
+    """
+    global _last_sweep
+    os.makedirs(PENDING_IMAGE_DIR, exist_ok=True)
+    ext = "webp" if image["mime"] == "image/webp" else "jpg"
+    # Session ids come from the client; hash them into a safe file name.
+    owner = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(PENDING_IMAGE_DIR, f"{owner}-{image['sha256']}.{ext}")
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(image["bytes"])
+        os.replace(tmp, path)
+    else:
+        os.utime(path)
+
+    if time.time() - _last_sweep > PENDING_IMAGE_TTL_SECONDS / 4:
+        _last_sweep = time.time()
+        sweep_pending_images()
+
+    return {"path": path, "mime": image["mime"], "sha256": image["sha256"], "bytes": len(image["bytes"])}
+
+
+def load_pending_image(ref: dict) -> dict | None:
+    """Reads a parked image back; None when it has been swept or the ref is stale."""
+    try:
+        with open(ref["path"], "rb") as f:
+            data = f.read()
+    except (OSError, KeyError, TypeError):
+        return None
+    return {"bytes": data, "mime": ref["mime"], "sha256": ref["sha256"]}
+
+
+def discard_pending_image(ref: dict):
+    try:
+        os.remove(ref["path"])
+    except (OSError, KeyError, TypeError):
+        pass
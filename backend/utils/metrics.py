@@ -0,0 +1,246 @@
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+# Per-stage timings for /detect. Stages are timed with `span("name")`; each
+# span feeds a Prometheus histogram (GET /metrics) and, for the request it
+# ran in, the Server-Timing response header.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "1") != "0"
+
+# Sampled profiler: PROFILE_SAMPLE_RATE of requests are stack-sampled; the
+# profile is kept only when the request took longer than PROFILE_THRESHOLD_MS.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", "2000"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("backend", "profiles"))
+
+PREFIX = "car_assistant"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# ----------------------------------------------------------------------
+# METRIC TYPES (Prometheus text format, no client library needed)
+# ----------------------------------------------------------------------
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., sum, count]
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            labels = dict(key)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+            lines.append(f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(dict(key))} {_number(value)}" for key, value in items]
+        return lines
+
+
+class Gauge:
+    """Point-in-time values, filled in at scrape time from the stats() helpers."""
+
+    def __init__(self, name: str, help: str):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self._values: list[tuple[dict, float]] = []
+
+    def set(self, value: float, **labels):
+        self._values.append((labels, value))
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_labels(labels)} {_number(value or 0)}" for labels, value in self._values]
+        return lines
+
+
+stage_seconds = Histogram("stage_seconds", "Time spent per request stage.")
+request_seconds = Histogram("request_seconds", "Time until the response starts, per endpoint.")
+llm_seconds = Histogram("llm_seconds", "Chat completion latency per model.")
+llm_tokens = Counter("llm_tokens_total", "Chat completion tokens per model and kind (prompt, cached, completion).")
+requests_total = Counter("requests_total", "Requests per endpoint and status code.")
+
+
+def render(gauges: list[Gauge] = ()) -> str:
+    lines = []
+    for metric in (request_seconds, stage_seconds, llm_seconds, llm_tokens, requests_total, *gauges):
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+# SPANS
+# ----------------------------------------------------------------------
+# (stage, seconds) pairs of the request being handled; shared with the
+# threads that run its blocking work (contextvars are copied into them).
+_request_spans: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_spans", default=None)
+
+
+def start_request() -> list:
+    spans = []
+    _request_spans.set(spans)
+    return spans
+
+
+def record_stage(stage: str, seconds: float):
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_llm(model: str, seconds: float, usage=None):
+    """Completion latency plus prompt/cached/completion token counts."""
+    if not METRICS_ENABLED:
+        return
+    llm_seconds.observe(seconds, model=model)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    llm_tokens.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    llm_tokens.inc((getattr(details, "cached_tokens", 0) or 0) if details else 0, model=model, kind="cached")
+    llm_tokens.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
+
+def server_timing(spans: list, total_seconds: float) -> str:
+    """'customer;dur=12.1, retrieval;dur=80.4, ..., total;dur=912.3' (stages summed by name)."""
+    totals: dict[str, float] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={1000 * seconds:.1f}" for stage, seconds in totals.items()]
+    parts.append(f"total;dur={1000 * total_seconds:.1f}")
+    return ", ".join(parts)
+
+
+# ----------------------------------------------------------------------
+# SAMPLED PROFILER
+# ----------------------------------------------------------------------
+class StackSampler:
+    """
+    Samples the Python stacks of every thread every `interval` seconds and
+    writes them in folded format ("frame;frame;frame count"), the input of
+    flamegraph.pl and speedscope. One profile runs at a time; concurrent
+    requests on the event loop show up in the same profile.
+    """
+
+    _active = threading.Lock()
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.samples: _Tally[str] = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def maybe_start(cls, rate: float = PROFILE_SAMPLE_RATE):
+        if rate <= 0 or random.random() >= rate or not cls._active.acquire(blocking=False):
+            return None
+        sampler = cls()
+        sampler._thread = threading.Thread(target=sampler._run, name="stack-sampler", daemon=True)
+        sampler._thread.start()
+        return sampler
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self, elapsed_seconds: float, label: str, threshold_ms: float = PROFILE_THRESHOLD_MS) -> str | None:
+        """Stops sampling; returns the profile path when the request was slow enough to keep."""
+        self._stop.set()
+        self._thread.join()
+        StackSampler._active.release()
+        if 1000 * elapsed_seconds < threshold_ms or not self.samples:
+            return None
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^a-z0-9]+", "-", label.lower()).strip("-") or "request"
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{int(1000 * elapsed_seconds)}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"🔥 Slow request ({1000 * elapsed_seconds:.0f} ms), profile written to {path}")
+        return path
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from utils.images import discard_pending_image
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "600"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join("backend", "session_store", "sessions.sqlite3"))
+
+
+class SessionStore(ABC):
+    """
+    Where conversation state lives between requests.
+
+    Sessions are plain JSON-serializable dicts. Callers `load` a session,
+    change it and `save` it back; a session not saved within `ttl` seconds
+    expires. A background sweeper (started with `start()`) drops expired
+    sessions so memory and disk stay bounded.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, sweep_interval: float = SESSION_SWEEP_INTERVAL):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.expired = 0
+        self._sweeper: asyncio.Task | None = None
+
+    @abstractmethod
+    async def load(self, session_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    async def save(self, session_id: str, session: dict):
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Removes expired sessions; returns how many were dropped."""
+
+    @abstractmethod
+    async def stats(self) -> dict:
+        ...
+
+    # ------------------------------------------------------------------
+    # SWEEPER
+    # ------------------------------------------------------------------
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"⚠️ Session sweep failed: {e}")
+
+    async def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store: LRU bounded to `max_entries` sessions plus TTL.
+    Only correct with a single worker process. An evicted or expired
+    session's parked image is deleted with it.
+    """
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        # session_id -> (expires_at, size_bytes, session)
+        self._data: "OrderedDict[str, tuple[float, int, dict]]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def _drop(self, session_id: str, discard_image: bool = False):
+        _, size, session = self._data.pop(session_id)
+        self._bytes -= size
+        if discard_image and session.get("pending_image"):
+            discard_pending_image(session["pending_image"])
+
+    async def load(self, session_id: str) -> dict | None:
+        entry = self._data.get(session_id)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            self._drop(session_id, discard_image=True)
+            self.expired += 1
+            return None
+        self._data.move_to_end(session_id)
+        return entry[2]
+
+    async def save(self, session_id: str, session: dict):
+        if session_id in self._data:
+            self._drop(session_id)
+        size = len(json.dumps(session, default=str))
+        self._data[session_id] = (time.time() + self.ttl, size, session)
+        self._bytes += size
+        while len(self._data) > self.max_entries:
+            self._drop(next(iter(self._data)), discard_image=True)
+            self.evictions += 1
+
+    async def delete(self, session_id: str):
+        if session_id in self._data:
+            self._drop(session_id)
+
+    async def sweep(self) -> int:
+        now = time.time()
+        expired = [sid for sid, (expires_at, _, _) in self._data.items() if expires_at < now]
+        for sid in expired:
+            self._drop(sid, discard_image=True)
+        self.expired += len(expired)
+        return len(expired)
+
+    async def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "sessions": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Shared store in a SQLite file (WAL mode), so every uvicorn worker on the
+    host sees the same conversations. Blocking SQLite calls run in a thread.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)")
+            self._db = db
+        return self._db
+
+    def _run(self, sql: str, params: tuple = (), fetch: bool = False):
+        with self._lock:
+            db = self._connect()
+            cursor = db.execute(sql, params)
+            rows = cursor.fetchall() if fetch else cursor.rowcount
+            db.commit()
+            return rows
+
+    async def load(self, session_id: str) -> dict | None:
+        rows = await asyncio.to_thread(
+            self._run, "SELECT data FROM sessions WHERE id = ? AND expires_at >= ?", (session_id, time.time()), True
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    async def save(self, session_id: str, session: dict):
+        data = json.dumps(session, default=str)
+        await asyncio.to_thread(
+            self._run,
+            "INSERT OR REPLACE INTO sessions (id, data, expires_at, size) VALUES (?, ?, ?, ?)",
+            (session_id, data, time.time() + self.ttl, len(data)),
+        )
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._run, "DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    async def sweep(self) -> int:
+        removed = await asyncio.to_thread(self._run, "DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+        self.expired += removed
+        return removed
+
+    async def stats(self) -> dict:
+        rows = await asyncio.to_thread(
+            self._run, "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions WHERE expires_at >= ?", (time.time(),), True
+        )
+        disk_bytes = 0
+        for suffix in ("", "-wal"):
+            try:
+                disk_bytes += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return {
+            "backend": "sqlite",
+            "sessions": rows[0][0],
+            "bytes": rows[0][1],
+            "disk_bytes": disk_bytes,
+            "expired": self.expired,
+        }
+
+    async def close(self):
+        await super().close()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def make_session_store(backend: str = SESSION_STORE) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {backend!r} (expected 'memory' or 'sqlite')")
@@ -0,0 +1,37 @@
+class StreamReplacer:
+    """
+    Applies string replacements to a stream of text chunks.
+
+    A chunk tail that could be the start of one of the search strings is held
+    back until the next chunk shows whether it really is a match, so markers
+    split across chunks (e.g. "[ACTION:" + "BOOK]") are still replaced.
+    `seen` records which search strings occurred.
+    """
+
+    def __init__(self, replacements: dict[str, str]):
+        self.replacements = replacements
+        self.seen: set[str] = set()
+        self._pending = ""
+        self._max_hold = max(len(k) for k in replacements) - 1
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + chunk
+        for old, new in self.replacements.items():
+            if old in text:
+                self.seen.add(old)
+                text = text.replace(old, new)
+
+        # Hold back the longest suffix that is a prefix of a search string.
+        hold = 0
+        for size in range(min(len(text), self._max_hold), 0, -1):
+            tail = text[-size:]
+            if any(old.startswith(tail) for old in self.replacements):
+                hold = size
+                break
+
+        self._pending = text[len(text) - hold:] if hold else ""
+        return text[:len(text) - hold]
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return text
@@ -0,0 +1,42 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # e.g. the encoding file cannot be downloaded in an offline build
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Token count with the model's tokenizer, or ~4 characters per token
+    when tiktoken (or its encoding file) is unavailable.
+    """
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def encode(text: str, model: str = "gpt-4o-mini") -> list[int] | None:
+    """Token ids for `text`, or None when no tokenizer is available."""
+    enc = _encoding(model)
+    return enc.encode(text, disallowed_special=()) if enc is not None else None
+
+
+def decode(tokens: list[int], model: str = "gpt-4o-mini") -> str:
+    return _encoding(model).decode(tokens)
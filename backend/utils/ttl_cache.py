@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+
+class AsyncTTLCache:
+    """
+    In-process async cache with TTL, LRU eviction and stale-while-revalidate.
+
+    - Fresh entry (age < ttl)                 -> served from memory.
+    - Stale entry (age < ttl + stale_ttl)     -> served from memory, ONE background refresh started.
+    - Missing / too old                       -> loaded; concurrent misses for the same key share one load.
+
+    Values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, stale_ttl: float = 0, name: str = "cache"):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.name = name
+
+        self._data: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._refreshing: Set[Hashable] = set()
+        self._background: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    # ------------------------------------------------------------------
+    # PUBLIC API
+    # ------------------------------------------------------------------
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+
+            if age < self.ttl:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return value
+
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._data.move_to_end(key)
+                if key not in self._inflight and key not in self._refreshing:
+                    self._start_refresh(key, loader)
+                return value
+
+            del self._data[key]
+
+        self.misses += 1
+        return await self._load(key, loader)
+
+    def get(self, key: Hashable):
+        """Returns a fresh cached value or None, without loading."""
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            return None
+        self._data.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # INTERNALS
+    # ------------------------------------------------------------------
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        # The load runs in its own task, so a caller that is cancelled (client
+        # disconnect, timeout) only stops waiting: the others still get the
+        # value or the loader's exception.
+        task: Optional[asyncio.Task] = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self._run_loader(key, loader))
+            # Mark a failure as retrieved even if every caller has gone.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _run_loader(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        try:
+            value = await loader()
+        finally:
+            self._inflight.pop(key, None)
+        self.set(key, value)
+        return value
+
+    def _start_refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        async def refresh():
+            try:
+                await self._load(key, loader)
+            except Exception as e:
+                # The stale value keeps being served until the window closes.
+                print(f"⚠️ {self.name}: background refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        self.refreshes += 1
+        self._refreshing.add(key)
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
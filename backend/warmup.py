@@ -0,0 +1,129 @@
+# warmup.py
+"""
+Startup warm-up, started in the background by the app lifespan so the
+process accepts connections (and answers /healthz) right away:
+
+  1. open the vector store and the embedding function (and check that the
+     collections were built with the configured embedding model)
+  2. build the manual catalog
+  3. create the OpenAI client and check the customer API is configured
+  4. preload the WARMUP_MANUALS most searched manuals (BM25 index, vector
+     index / Chroma HNSW segment), so their first question does not pay
+     for reading them from disk
+
+/readyz reports ready once steps 1-3 succeeded and step 4 finished.
+"""
+import asyncio
+import os
+import time
+
+from agents.car_agent import get_openai_client, manual_catalog
+from customer.quantum_api import get_api_base
+from rag.embedding_provider import EMBEDDING_PROVIDER
+from rag.manual_search import get_embedding_function, manual_usage, open_retrieval, preload_manual
+
+WARMUP_MANUALS = int(os.getenv("WARMUP_MANUALS", "10"))
+
+
+class Readiness:
+    """Outcome of each warm-up step; the app is ready when all of them passed."""
+
+    STEPS = ("retrieval", "manual_catalog", "openai_client", "customer_api", "manuals")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ready_seconds: float | None = None
+        self.checks: dict[str, dict] = {step: {"ok": False, "detail": "pending"} for step in self.STEPS}
+        self.preloaded: list[str] = []
+
+    @property
+    def ready(self) -> bool:
+        return all(check["ok"] for check in self.checks.values())
+
+    def record(self, step: str, ok: bool, detail: str, seconds: float):
+        self.checks[step] = {"ok": ok, "detail": detail, "seconds": round(seconds, 3)}
+        if self.ready and self.ready_seconds is None:
+            self.ready_seconds = round(time.monotonic() - self.started, 3)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_seconds": self.ready_seconds,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "checks": self.checks,
+            "preloaded_manuals": self.preloaded,
+        }
+
+
+readiness = Readiness()
+
+
+def _step(step: str, fn) -> bool:
+    started = time.perf_counter()
+    try:
+        detail = fn() or "ok"
+    except Exception as e:
+        readiness.record(step, False, f"{type(e).__name__}: {e}", time.perf_counter() - started)
+        print(f"❌ Warm-up: {step} failed: {e}")
+        return False
+    readiness.record(step, True, detail, time.perf_counter() - started)
+    return True
+
+
+def _open_retrieval():
+    open_retrieval()
+    if EMBEDDING_PROVIDER == "local":
+        # Loads the ONNX model now instead of on the first question.
+        get_embedding_function().embed_query(input=["warm up"])
+
+
+def _load_catalog() -> str:
+    manual_catalog.reload()
+    return f"{manual_catalog.stats()['manuals']} manuals"
+
+
+def _open_openai_client():
+    client = get_openai_client()
+    # The SDK imports each resource module on first access (~0.7 s for
+    # embeddings); do it now instead of inside the first question.
+    client.chat.completions
+    client.embeddings
+
+
+def _check_customer_api() -> str:
+    # Raises when CUSTOMER_API_BASE is not set.
+    get_api_base()
+    return "configured"
+
+
+def _preload_manuals() -> str:
+    for collection_name, vehicle_key in manual_usage.top(WARMUP_MANUALS):
+        try:
+            loaded = preload_manual(collection_name, vehicle_key)
+        except Exception as e:
+            print(f"⚠️ Warm-up: could not preload {collection_name}/{vehicle_key}: {e}")
+            continue
+        if loaded:
+            readiness.preloaded.append(f"{collection_name}/{vehicle_key}")
+            print(f"   🔥 Preloaded {collection_name}/{vehicle_key} ({', '.join(loaded)})")
+    return f"{len(readiness.preloaded)} preloaded"
+
+
+def warm_up():
+    """Runs every step; a failed step is reported by /readyz and the rest still run."""
+    retrieval_ok = _step("retrieval", _open_retrieval)
+    _step("manual_catalog", _load_catalog)
+    _step("openai_client", _open_openai_client)
+    _step("customer_api", _check_customer_api)
+    if retrieval_ok:
+        _step("manuals", _preload_manuals)
+    else:
+        readiness.record("manuals", False, "skipped: retrieval unavailable", 0.0)
+
+    if readiness.ready:
+        print(f"✅ Ready in {readiness.ready_seconds:.2f}s ({len(readiness.preloaded)} manuals preloaded)")
+
+
+def start_warm_up() -> asyncio.Task:
+    """Runs `warm_up` on a worker thread; the event loop keeps serving meanwhile."""
+    return asyncio.create_task(asyncio.to_thread(warm_up))